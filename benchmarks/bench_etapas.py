@@ -0,0 +1,382 @@
+"""Tempo e pico de memória de cada etapa do dashboard, comparados com uma baseline.
+
+Uso:
+    python benchmarks/bench_etapas.py [--linhas 100k] [--csv ESFT0100.csv] [--repeticoes 3]
+    python benchmarks/bench_etapas.py --linhas 1m --gravar-baseline
+
+Sem `--csv`, gera um export sintético (`gerar_esft.py`, semente fixa) com o
+número de linhas pedido. Mede, numa base temporária: leitura do CSV,
+`processar_dados_upload`, gravação do Parquet (base, itens e cubo), leitura
+das linhas de faturamento e de devolução, recorte do período e cada bloco de
+agregação das duas páginas. Cada etapa guarda o melhor tempo das repetições
+e o pico de memória (RSS acima do início da etapa, amostrado em paralelo).
+
+Os resultados são comparados com `baseline_etapas.json`, por número de
+linhas: uma etapa mais lenta que a baseline além da tolerância (ou com pico
+de memória acima dela) faz o script sair com código 1. `--gravar-baseline`
+grava as medições atuais como nova baseline desse tamanho.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from gerar_esft import gerar_csv, linhas  # noqa: E402
+from logistica.abc import CurvaABC  # noqa: E402
+from logistica.armazenamento import gravar_dataset, limites_datas  # noqa: E402
+from logistica.calendario import CALENDARIO  # noqa: E402
+from logistica.categorias import maiusculas  # noqa: E402
+from logistica.consulta import TIPO_DEVOLUCAO, Consulta, carregar  # noqa: E402
+from logistica.cubo import agregar, gravar_cubo  # noqa: E402
+from logistica.faturamento import (  # noqa: E402
+    CUTOFF_PADRAO,
+    MARCAS_DESEJADAS,
+    MARCAS_EXCLUIDAS,
+    calcular_faturamento_liquido,
+    cubo_devolucao,
+    cubo_faturamento,
+    notas_faturamento,
+)
+from logistica.ingestao import (  # noqa: E402
+    MOTOR_PANDAS,
+    MOTORES_CSV,
+    _para_tabela,
+    ler_csv,
+    processar_dados_upload,
+)
+from logistica.itens import descricoes_itens, gravar_itens, separar_itens  # noqa: E402
+from logistica.metricas import METRICAS  # noqa: E402
+from logistica.periodo import fatiar_periodo  # noqa: E402
+from logistica.produtividade import comparar_periodos, produtividade_diaria  # noqa: E402
+from logistica.ranking import top_itens  # noqa: E402
+
+ARQUIVO_BASELINE = Path(__file__).resolve().parent / "baseline_etapas.json"
+
+# Regressão: acima de baseline × (1 + tolerância) + folga (a folga absorve o
+# ruído das etapas de poucos milissegundos / poucos MB)
+TOLERANCIA = 0.25
+FOLGA_SEGUNDOS = 0.05
+FOLGA_MB = 32
+
+INTERVALO_AMOSTRA = 0.002
+
+TAMANHO_PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss():
+    """Memória residente do processo em bytes (lida de /proc, no Linux), ou None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * TAMANHO_PAGINA
+    except OSError:
+        return None
+
+
+class PicoMemoria:
+    """Pico de RSS acima do valor inicial enquanto o bloco `with` roda"""
+
+    def __init__(self):
+        self.pico = None
+
+    def _amostrar(self):
+        while not self._parar.wait(INTERVALO_AMOSTRA):
+            self._maximo = max(self._maximo, _rss())
+
+    def __enter__(self):
+        self._inicial = _rss()
+        if self._inicial is not None:
+            self._maximo = self._inicial
+            self._parar = threading.Event()
+            self._thread = threading.Thread(target=self._amostrar, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        if self._inicial is not None:
+            self._parar.set()
+            self._thread.join()
+            self.pico = max(self._maximo, _rss()) - self._inicial
+        return False
+
+
+def medir(funcao, repeticoes):
+    """(melhor tempo em segundos, maior pico de memória em MB, resultado da última execução)"""
+    tempos, picos = [], []
+    for _ in range(repeticoes):
+        gc.collect()
+        pa.default_memory_pool().release_unused()
+        with PicoMemoria() as memoria:
+            inicio = time.perf_counter()
+            resultado = funcao()
+            tempos.append(time.perf_counter() - inicio)
+        if memoria.pico is not None:
+            picos.append(memoria.pico / 1024**2)
+    return min(tempos), max(picos) if picos else None, resultado
+
+
+def etapas(csv, destino, motor):
+    """Etapas em ordem: (nome, função sem argumentos); cada uma usa o resultado das anteriores"""
+    estado = {}
+
+    def leitura_csv():
+        return ler_csv(csv, motor)
+
+    def tratamento():
+        return processar_dados_upload(estado["leitura_csv"].copy())
+
+    def gravacao_parquet():
+        tabela, dimensao = separar_itens(_para_tabela(estado["processar_dados_upload"].copy()))
+        gravar_itens(dimensao, destino)
+        gravar_dataset([tabela], tabela.schema, destino)
+        gravar_cubo(agregar(tabela), destino)
+
+    def carregar_faturamento():
+        df = carregar(notas_faturamento(), destino)
+        df["marca"] = maiusculas(df["marca"])
+        return df
+
+    def carregar_devolucao():
+        df = carregar(
+            Consulta(
+                colunas=[
+                    "dt_emis_nf",
+                    "marca",
+                    "canal_venda_cliente",
+                    "item",
+                    "quantidade",
+                    "vl_net_livro",
+                ],
+                tipos_oper=[TIPO_DEVOLUCAO],
+                marcas_excluidas=MARCAS_EXCLUIDAS,
+            ),
+            destino,
+        )
+        df["marca"] = maiusculas(df["marca"])
+        return df
+
+    def carregar_cubo():
+        cubos = {
+            "faturamento": carregar(cubo_faturamento(*estado["periodo"]), destino),
+            "devolucao": carregar(cubo_devolucao(*estado["periodo"]), destino),
+            "devolucao_historico": carregar(cubo_devolucao(), destino),
+        }
+        for df in cubos.values():
+            df["marca"] = maiusculas(df["marca"])
+        return cubos
+
+    def filtro_periodo():
+        return (
+            fatiar_periodo(estado["carregar_faturamento"], *estado["periodo"]),
+            fatiar_periodo(estado["carregar_devolucao"], *estado["periodo"]),
+        )
+
+    def faturamento_liquido():
+        cubos = estado["carregar_cubo"]
+        faturamento_marca = METRICAS["soma_por_marca"](cubos["faturamento"])
+        devolucao_marca = METRICAS["soma_por_marca"](cubos["devolucao"])
+        return calcular_faturamento_liquido(faturamento_marca, devolucao_marca, CUTOFF_PADRAO)
+
+    def faturamento_diario():
+        cubo = estado["carregar_cubo"]["faturamento"]
+        return METRICAS["soma_diaria"](cubo), METRICAS["soma_diaria_marca"](cubo)
+
+    def faturamento_canais():
+        cubos = estado["carregar_cubo"]
+        return (
+            METRICAS["soma_canal_marca"](cubos["faturamento"]),
+            METRICAS["soma_canal_marca"](cubos["devolucao"]),
+        )
+
+    def resumo_marcas():
+        df = estado["filtro_periodo"][0]
+        return df.groupby("marca", observed=True).agg(
+            Quantidade_NFs=("nota_fiscal", "nunique"),
+            Quantidade_SKUs=("item", "nunique"),
+            Quantidade_Pecas=("quantidade", "sum"),
+        )
+
+    def per_capita():
+        df = estado["filtro_periodo"][0]
+        desejadas = df[df["marca"].isin(MARCAS_DESEJADAS)]
+        return (
+            np.ceil(desejadas["quantidade"].sum() / 5),
+            np.ceil(desejadas["item"].nunique() / 5),
+            np.ceil(desejadas.groupby("nota_fiscal")["item"].nunique().mean()),
+            np.ceil(
+                df.groupby("marca", observed=True)["nota_fiscal"].nunique()
+                / max(CALENDARIO.dias_uteis(*estado["periodo"]), 1)
+                / 5
+            ),
+        )
+
+    def produtividade():
+        diaria = produtividade_diaria(estado["filtro_periodo"][0])
+        meses = pd.period_range(*estado["periodo"], freq="M")
+        periodos = [(mes.start_time, mes.end_time.normalize()) for mes in meses]
+        return comparar_periodos(diaria, periodos, 5)
+
+    def top_itens_faturamento():
+        df = estado["filtro_periodo"][0]
+        descricoes = descricoes_itens(destino)
+        return (
+            top_itens(df, 5, por="marca"),
+            top_itens(df, 10, descricoes=descricoes),
+            top_itens(df, 1, por="marca", descricoes=descricoes),
+        )
+
+    def curva_abc():
+        df = estado["filtro_periodo"][0]
+        desejadas = df[df["marca"].isin(MARCAS_DESEJADAS)]
+        return CurvaABC(desejadas, descricoes=descricoes_itens(destino)).tabela()
+
+    def devolucao_marca_canal():
+        cubo = estado["carregar_cubo"]["devolucao"]
+        return METRICAS["soma_por_marca"](cubo), METRICAS["soma_por_canal"](cubo)
+
+    def devolucao_mensal():
+        df = estado["carregar_cubo"]["devolucao_historico"]
+        mes = df["dt_emis_nf"].dt.to_period("M").astype(str)
+        return df.assign(mes=mes).groupby(["mes", "marca"], observed=True)["vl_net_livro"].sum()
+
+    def devolucao_diaria():
+        df = estado["filtro_periodo"][1]
+        return (
+            df.groupby(["dt_emis_nf", "marca"], observed=True)["vl_net_livro"].sum(),
+            df.groupby("marca", observed=True)["vl_net_livro"].sum(),
+        )
+
+    def top_itens_devolucao():
+        df = estado["filtro_periodo"][1]
+        return top_itens(df, 10, por="marca", descricoes=descricoes_itens(destino))
+
+    return estado, [
+        ("leitura_csv", leitura_csv),
+        ("processar_dados_upload", tratamento),
+        ("gravacao_parquet", gravacao_parquet),
+        ("carregar_faturamento", carregar_faturamento),
+        ("carregar_devolucao", carregar_devolucao),
+        ("carregar_cubo", carregar_cubo),
+        ("filtro_periodo", filtro_periodo),
+        ("faturamento_liquido", faturamento_liquido),
+        ("faturamento_diario", faturamento_diario),
+        ("faturamento_canais", faturamento_canais),
+        ("resumo_marcas", resumo_marcas),
+        ("per_capita", per_capita),
+        ("produtividade", produtividade),
+        ("top_itens_faturamento", top_itens_faturamento),
+        ("curva_abc", curva_abc),
+        ("devolucao_marca_canal", devolucao_marca_canal),
+        ("devolucao_mensal", devolucao_mensal),
+        ("devolucao_diaria", devolucao_diaria),
+        ("top_itens_devolucao", top_itens_devolucao),
+    ]
+
+
+def executar(csv, destino, motor, repeticoes):
+    """Mede todas as etapas; devolve {etapa: {"segundos", "pico_mb"}}"""
+    estado, lista = etapas(csv, destino, motor)
+    medicoes = {}
+    for nome, funcao in lista:
+        if nome == "carregar_faturamento":
+            # Período medido: os últimos três meses da base
+            data_min, data_max = limites_datas(destino)
+            estado["periodo"] = (
+                max(data_min, (data_max - pd.DateOffset(months=3)).to_period("M").start_time),
+                data_max,
+            )
+        segundos, pico, estado[nome] = medir(funcao, repeticoes)
+        pico = None if pico is None else round(pico, 1)
+        medicoes[nome] = {"segundos": round(segundos, 4), "pico_mb": pico}
+        memoria = "-" if pico is None else f"{pico:.1f}"
+        print(f"  {nome:<24} {segundos:8.3f}s {memoria:>8} MB", flush=True)
+    return medicoes
+
+
+def regressoes(medicoes, baseline, tolerancia, folga_segundos, folga_mb):
+    """Etapas acima da baseline: lista de (etapa, medida, valor atual, valor da baseline)"""
+    encontradas = []
+    for nome, referencia in baseline.items():
+        atual = medicoes.get(nome)
+        if atual is None:
+            continue
+        if atual["segundos"] > referencia["segundos"] * (1 + tolerancia) + folga_segundos:
+            encontradas.append((nome, "segundos", atual["segundos"], referencia["segundos"]))
+        if (
+            atual["pico_mb"] is not None
+            and referencia.get("pico_mb") is not None
+            and atual["pico_mb"] > referencia["pico_mb"] * (1 + tolerancia) + folga_mb
+        ):
+            encontradas.append((nome, "pico_mb", atual["pico_mb"], referencia["pico_mb"]))
+    return encontradas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", default="100k", help="CSV sintético: 100k, 1m, 10m ou 20m")
+    parser.add_argument("--csv", type=Path, help="usa um export existente em vez do sintético")
+    parser.add_argument("--motor", choices=MOTORES_CSV, default=MOTOR_PANDAS)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--baseline", type=Path, default=ARQUIVO_BASELINE)
+    parser.add_argument("--gravar-baseline", action="store_true")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    parser.add_argument("--folga-segundos", type=float, default=FOLGA_SEGUNDOS)
+    parser.add_argument("--folga-mb", type=float, default=FOLGA_MB)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporario:
+        temporario = Path(temporario)
+        if args.csv is not None:
+            csv, chave = args.csv, args.csv.name
+        else:
+            chave = f"{linhas(args.linhas)}_{args.motor}"
+            print(f"Gerando CSV sintético de {linhas(args.linhas):,} linhas...", flush=True)
+            csv = gerar_csv(temporario / "ESFT0100.csv", linhas(args.linhas))
+        print(f"Etapas ({csv.stat().st_size / 1024**2:,.1f} MB, motor {args.motor}):")
+        medicoes = executar(csv, temporario / "ESFT0100", args.motor, args.repeticoes)
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.gravar_baseline:
+        baselines[chave] = {
+            "ambiente": {
+                "python": platform.python_version(),
+                "pandas": pd.__version__,
+                "pyarrow": pa.__version__,
+                "maquina": platform.machine(),
+            },
+            "etapas": medicoes,
+        }
+        args.baseline.write_text(json.dumps(baselines, indent=2, ensure_ascii=False) + "\n")
+        print(f"Baseline '{chave}' gravada em {args.baseline}")
+        return 0
+
+    if chave not in baselines:
+        print(f"Sem baseline '{chave}' em {args.baseline}: rode com --gravar-baseline")
+        return 0
+
+    encontradas = regressoes(
+        medicoes, baselines[chave]["etapas"], args.tolerancia, args.folga_segundos, args.folga_mb
+    )
+    for nome, medida, atual, referencia in encontradas:
+        print(f"REGRESSÃO {nome} ({medida}): {atual} contra {referencia} na baseline")
+    if encontradas:
+        return 1
+    print(f"Nenhuma etapa acima da baseline '{chave}' (tolerância {args.tolerancia:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Compara os motores de leitura do ESFT0100.csv (pandas x pyarrow).
+
+Uso:
+    python benchmarks/bench_motor_csv.py caminho/ESFT0100.csv [--repeticoes 3]
+
+Mede a leitura do CSV e a leitura + `processar_dados_upload` para cada motor
+e mostra o ganho do pyarrow sobre o pandas.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from logistica.ingestao import (  # noqa: E402
+    MOTOR_PANDAS,
+    MOTORES_CSV,
+    ler_csv,
+    processar_dados_upload,
+)
+
+
+def medir(funcao, repeticoes):
+    """Executa a função N vezes e devolve o melhor tempo em segundos"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("csv", type=Path, help="Arquivo ESFT0100.csv")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    tamanho_mb = args.csv.stat().st_size / 1024 / 1024
+    print(f"Arquivo: {args.csv} ({tamanho_mb:,.1f} MB)")
+
+    resultados = {}
+    for motor in MOTORES_CSV:
+        linhas = len(ler_csv(args.csv, motor))
+        leitura = medir(lambda: ler_csv(args.csv, motor), args.repeticoes)
+        total = medir(
+            lambda: processar_dados_upload(ler_csv(args.csv, motor)), args.repeticoes
+        )
+        resultados[motor] = (leitura, total)
+        print(
+            f"{motor:>8}: leitura {leitura:7.2f}s | leitura + tratamento {total:7.2f}s"
+            f" | {linhas / total:,.0f} linhas/s"
+        )
+
+    base_leitura, base_total = resultados[MOTOR_PANDAS]
+    for motor, (leitura, total) in resultados.items():
+        if motor != MOTOR_PANDAS:
+            print(
+                f"Ganho {motor} x {MOTOR_PANDAS}: leitura {base_leitura / leitura:.1f}x"
+                f" | leitura + tratamento {base_total / total:.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
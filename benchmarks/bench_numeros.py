@@ -0,0 +1,88 @@
+"""Vazão do conversor de números pt-BR contra a cadeia antiga de str.replace.
+
+Uso:
+    python benchmarks/bench_numeros.py [--linhas 2000000] [--repeticoes 3]
+
+Gera valores no formato do export ("1234,56"), converte com a cadeia antiga
+de `processar_dados_upload` e com `converter_numeros_br`, e mostra linhas/s
+de cada um. A cadeia antiga não entende separador de milhar, então os dados
+do comparativo não têm milhar; a seguir o conversor novo é medido também
+com milhar ("1.234,56").
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from logistica.numeros import converter_numeros_br  # noqa: E402
+
+
+def cadeia_antiga(serie):
+    """Conversão usada antes em processar_dados_upload"""
+    return (
+        serie.astype(str)
+        .str.replace(",", ".", regex=False)
+        .str.replace("[^0-9.-]", "", regex=True)
+        .astype(float)
+        .abs()
+    )
+
+
+def gerar_valores(linhas, com_milhar=False, semente=0):
+    """Valores monetários em texto pt-BR, sem ou com separador de milhar"""
+    rng = np.random.default_rng(semente)
+    valores = pd.Series(np.round(rng.uniform(-50_000, 50_000, linhas), 2))
+    if com_milhar:
+        return valores.map(
+            lambda v: f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        )
+    return valores.astype(str).str.replace(".", ",", regex=False)
+
+
+def medir(funcao, serie, repeticoes):
+    """Melhor tempo em segundos entre as repetições"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(serie)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=2_000_000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    simples = gerar_valores(args.linhas)
+    antiga = medir(cadeia_antiga, simples, args.repeticoes)
+    nova = medir(converter_numeros_br, simples, args.repeticoes)
+
+    # Os dois caminhos precisam concordar nos dados sem milhar
+    esperado = cadeia_antiga(simples)
+    convertido, invalidos = converter_numeros_br(simples)
+    assert not invalidos.any()
+    np.testing.assert_allclose(convertido.abs(), esperado)
+
+    print(f"Linhas: {args.linhas:,}")
+    print(f"Cadeia antiga (str.replace): {antiga:6.2f}s | {args.linhas / antiga:>12,.0f} linhas/s")
+    print(f"converter_numeros_br:        {nova:6.2f}s | {args.linhas / nova:>12,.0f} linhas/s")
+    print(f"Ganho: {antiga / nova:.1f}x")
+
+    com_milhar = gerar_valores(args.linhas, com_milhar=True)
+    nova_milhar = medir(converter_numeros_br, com_milhar, args.repeticoes)
+    print(
+        f"converter_numeros_br com milhar: {nova_milhar:6.2f}s"
+        f" | {args.linhas / nova_milhar:>12,.0f} linhas/s (cadeia antiga falha nesses dados)"
+    )
+
+
+if __name__ == "__main__":
+    main()
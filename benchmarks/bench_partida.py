@@ -0,0 +1,188 @@
+"""Partida a frio das páginas: tempo do primeiro run e o que cada uma importa.
+
+Uso:
+    python benchmarks/bench_partida.py [--linhas 100k] [--csv ESFT0100.csv] [--top 12]
+
+Cada cenário roda num processo Python novo, com o Streamlit já importado
+(como no servidor, que importa o Streamlit antes da primeira sessão): a tela
+de login do Faturamento, o acesso negado de Devoluções e as duas páginas já
+logadas sobre uma base temporária (export sintético de `gerar_esft.py`, ou
+`--csv`). O processo filho roda com `-X importtime`, e o relatório lista as
+importações de primeiro nível mais caras feitas durante o run da página.
+
+Cada cenário tem um orçamento de tempo (`ORCAMENTOS`, medido com folga numa
+máquina de 1 CPU) e módulos que não podem ser carregados durante o run
+(`PROIBIDOS`: nada de pandas/pyarrow/Plotly antes do login, e nunca
+matplotlib, watchdog, plyer ou tqdm). Estourar um orçamento, carregar um
+módulo proibido ou a página levantar exceção faz o script sair com código 1.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+MARCADOR = "--- run da página ---"
+
+# Nunca usados pelas páginas
+SEMPRE_PROIBIDOS = ["matplotlib", "watchdog", "plyer", "tqdm"]
+
+# Antes do login nenhuma biblioteca de dados ou de gráficos é necessária
+# (o plotly.graph_objects já vem carregado pelo AppTest; o plotly.express não)
+PROIBIDOS_SEM_LOGIN = SEMPRE_PROIBIDOS + ["numpy", "pandas", "pyarrow", "plotly.express"]
+
+# (nome, página, logado)
+CENARIOS = [
+    ("login", "Faturamento.py", False),
+    ("acesso_negado", "pages/devoluções.py", False),
+    ("faturamento", "Faturamento.py", True),
+    ("devolucoes", "pages/devoluções.py", True),
+]
+
+# Segundos do primeiro run de cada cenário (medidos com a base de 100k linhas:
+# ~0,5 s sem login, ~3,5 s o Faturamento e ~2,7 s Devoluções; antes das
+# importações adiadas a tela de login levava ~2 s)
+ORCAMENTOS = {
+    "login": 1.0,
+    "acesso_negado": 1.0,
+    "faturamento": 6.0,
+    "devolucoes": 4.5,
+}
+
+PROIBIDOS = {
+    "login": PROIBIDOS_SEM_LOGIN,
+    "acesso_negado": PROIBIDOS_SEM_LOGIN,
+    "faturamento": SEMPRE_PROIBIDOS,
+    "devolucoes": SEMPRE_PROIBIDOS,
+}
+
+
+def _filho(pagina, logado):
+    """Roda a página uma vez (processo novo) e imprime tempo, módulos novos e exceções"""
+    sys.path.insert(0, str(RAIZ))
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(str(RAIZ / pagina), default_timeout=600)
+    if logado:
+        app.session_state["logado"] = True
+        app.session_state["usuario"] = "admin"
+    antes = set(sys.modules)
+    print(MARCADOR, file=sys.stderr, flush=True)
+    inicio = time.perf_counter()
+    app.run()
+    segundos = time.perf_counter() - inicio
+    print(
+        json.dumps(
+            {
+                "segundos": round(segundos, 3),
+                "modulos": sorted(set(sys.modules) - antes),
+                "excecoes": [str(e.value) for e in app.exception],
+            }
+        )
+    )
+
+
+def importacoes(stderr):
+    """Importações de primeiro nível feitas depois do marcador: [(módulo, ms acumulados)]"""
+    linhas = stderr.split(MARCADOR, 1)[-1].splitlines()
+    encontradas = []
+    for linha in linhas:
+        if not linha.startswith("import time:") or "|" not in linha:
+            continue
+        _, acumulado, nome = linha.split("|", 2)
+        # Nomes de primeiro nível vêm com um espaço só antes do módulo
+        if not acumulado.strip().isdigit() or nome.startswith("  "):
+            continue
+        encontradas.append((nome.strip(), int(acumulado) / 1000))
+    return sorted(encontradas, key=lambda item: -item[1])
+
+
+def medir_cenario(nome, pagina, logado, diretorio):
+    """Roda o cenário num processo novo; devolve o resultado do filho e as importações"""
+    comando = [sys.executable, "-X", "importtime", __file__, "--filho", pagina]
+    if logado:
+        comando.append("--logado")
+    processo = subprocess.run(
+        comando,
+        cwd=diretorio,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONWARNINGS": "ignore"},
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(f"cenário {nome} falhou:\n{processo.stderr[-2000:]}")
+    resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+    return resultado, importacoes(processo.stderr)
+
+
+def preparar_base(diretorio, csv, quantidade):
+    """Grava a base das páginas logadas em <diretorio>/Datasets/ESFT"""
+    sys.path.insert(0, str(RAIZ))
+    sys.path.insert(0, str(RAIZ / "benchmarks"))
+    from gerar_esft import gerar_csv
+    from logistica.armazenamento import DIRETORIO_DATASET
+    from logistica.ingestao import processar_csv
+
+    if csv is None:
+        print(f"Gerando CSV sintético de {quantidade:,} linhas...", flush=True)
+        csv = gerar_csv(diretorio / "ESFT0100.csv", quantidade)
+    processar_csv(csv, destino=diretorio / DIRETORIO_DATASET)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", default="100k", help="CSV sintético: 100k, 1m, 10m ou 20m")
+    parser.add_argument("--csv", type=Path, help="usa um export existente em vez do sintético")
+    parser.add_argument("--top", type=int, default=12, help="importações listadas por cenário")
+    parser.add_argument("--filho", help=argparse.SUPPRESS)
+    parser.add_argument("--logado", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho is not None:
+        _filho(args.filho, args.logado)
+        return 0
+
+    sys.path.insert(0, str(RAIZ / "benchmarks"))
+    from gerar_esft import linhas
+
+    problemas = []
+    with tempfile.TemporaryDirectory() as temporario:
+        temporario = Path(temporario)
+        csv = None if args.csv is None else args.csv.resolve()
+        preparar_base(temporario, csv, linhas(args.linhas))
+        for nome, pagina, logado in CENARIOS:
+            resultado, importadas = medir_cenario(nome, pagina, logado, temporario)
+            orcamento = ORCAMENTOS[nome]
+            print(
+                f"\n{nome}: {resultado['segundos']:.3f}s (orçamento {orcamento:.1f}s),"
+                f" {len(resultado['modulos'])} módulos carregados no run"
+            )
+            for modulo, ms in importadas[: args.top]:
+                print(f"  {ms:9.1f} ms  {modulo}")
+
+            if resultado["segundos"] > orcamento:
+                problemas.append(f"{nome}: {resultado['segundos']:.3f}s acima de {orcamento:.1f}s")
+            carregados = set(resultado["modulos"])
+            for modulo in PROIBIDOS[nome]:
+                if modulo in carregados:
+                    problemas.append(f"{nome}: importou {modulo}")
+            for excecao in resultado["excecoes"]:
+                problemas.append(f"{nome}: exceção na página: {excecao}")
+
+    print()
+    for problema in problemas:
+        print(f"REGRESSÃO {problema}")
+    if problemas:
+        return 1
+    print("Todos os cenários dentro do orçamento")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
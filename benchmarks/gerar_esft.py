@@ -0,0 +1,310 @@
+"""Gera exports ESFT0100.csv sintéticos para os benchmarks.
+
+Uso:
+    python benchmarks/gerar_esft.py Datasets/sinteticos [--tamanhos 100k 1m 10m 20m] [--semente 0]
+
+Cada tamanho vira `ESFT0100_<tamanho>.csv` no diretório, no formato do
+export do Datasul: as 25 colunas de `COLUNAS_FAT`, separador `;`,
+ISO-8859-1, datas dd/mm/aaaa e valores com vírgula decimal. Os dados imitam
+a base real: notas com várias linhas, mistura de tipos de operação (receitas,
+devoluções e operações que não entram no dashboard), marcas com os pesos do
+faturamento (inclusive as que a ingestão descarta), popularidade dos itens
+concentrada como numa curva ABC e datas concentradas nos dias úteis e no
+fechamento do mês. O arquivo é gravado em blocos, com memória constante, e a
+mesma semente gera sempre o mesmo arquivo.
+"""
+
+import argparse
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from logistica.calendario import CALENDARIO  # noqa: E402
+from logistica.consulta import TIPO_DEVOLUCAO  # noqa: E402
+from logistica.ingestao import COLUNAS_FAT, OPCOES_CSV  # noqa: E402
+
+TAMANHOS = ["100k", "1m", "10m", "20m"]
+
+LINHAS_POR_BLOCO = 500_000
+
+DATA_INICIAL = "2024-01-01"
+DATA_FINAL = "2025-12-31"
+
+# (marca, peso nas linhas)
+MARCAS = [
+    ("PAPAIZ", 0.34),
+    ("LA FONTE", 0.18),
+    ("SILVANA CDSP", 0.12),
+    ("SILVANA", 0.04),
+    ("VAULT", 0.10),
+    ("YALE", 0.08),
+    ("METALIKA", 0.04),
+    ("PORTO FELIZ", 0.04),
+    ("MTK CD SP", 0.02),
+    ("PAPAIZ SOR", 0.02),
+    ("?", 0.02),
+]
+
+# (tipo de operação, peso nas notas, é receita)
+TIPOS_OPER = [
+    ("1 - Receita", 0.66, True),
+    ("20 - Receita Revenda", 0.08, True),
+    ("2 - Receita Export", 0.02, True),
+    ("3 - Receita Rem Vend Futura", 0.02, True),
+    ("18 - Venda a ordem", 0.03, True),
+    ("5 - Dev Venda", 0.09, False),
+    ("7 - Remessa Conserto", 0.04, False),
+    ("10 - Transferencia", 0.06, False),
+]
+
+CANAIS = ["VAREJO", "DISTRIBUIDOR", "HOME CENTER", "CONSTRUTORA", "E-COMMERCE", "EXPORTACAO"]
+
+CIDADES = [
+    ("SAO PAULO", "SP"),
+    ("SOROCABA", "SP"),
+    ("CAMPINAS", "SP"),
+    ("RIBEIRAO PRETO", "SP"),
+    ("RIO DE JANEIRO", "RJ"),
+    ("BELO HORIZONTE", "MG"),
+    ("CURITIBA", "PR"),
+    ("PORTO ALEGRE", "RS"),
+    ("FLORIANOPOLIS", "SC"),
+    ("GOIANIA", "GO"),
+    ("SALVADOR", "BA"),
+    ("RECIFE", "PE"),
+    ("FORTALEZA", "CE"),
+    ("BRASILIA", "DF"),
+    ("MANAUS", "AM"),
+]
+
+PRODUTOS = [
+    "CADEADO CR",
+    "CADEADO LATAO",
+    "FECHADURA EXTERNA",
+    "FECHADURA INTERNA",
+    "FECHADURA DIGITAL",
+    "CILINDRO",
+    "DOBRADICA",
+    "PUXADOR",
+    "TRINCO",
+    "TORNEIRA",
+    "MISTURADOR",
+    "CHUVEIRO",
+    "VALVULA",
+    "COFRE",
+]
+
+ACABAMENTOS = ["CROMADO", "LATAO", "INOX", "PRETO FOSCO", "BRONZE", "BRANCO"]
+
+NUM_ITENS = 20_000
+NUM_CLIENTES = 5_000
+
+# Linhas por nota: geométrica com média 3, no máximo 40
+MEDIA_LINHAS_NOTA = 3
+MAX_LINHAS_NOTA = 40
+
+
+def linhas(texto):
+    """Quantidade de linhas de um tamanho ("100k", "1m", "20m" ou um número)"""
+    texto = str(texto).strip().lower()
+    multiplicador = {"k": 1_000, "m": 1_000_000}.get(texto[-1:], 1)
+    return int(float(texto.rstrip("km")) * multiplicador)
+
+
+def _pesos(valores):
+    pesos = np.array(valores, dtype=float)
+    return pesos / pesos.sum()
+
+
+class Catalogo:
+    """Itens, clientes e dias do período, sorteados uma vez por semente"""
+
+    def __init__(self, rng, data_inicial=DATA_INICIAL, data_final=DATA_FINAL):
+        # Itens: código, descrição, marca, preço e popularidade (Zipf dentro da marca)
+        self.marcas = np.array([marca for marca, _ in MARCAS])
+        self.marca_item = rng.choice(len(MARCAS), NUM_ITENS, p=_pesos([p for _, p in MARCAS]))
+        codigos = 1_000_000 + np.arange(NUM_ITENS) * 7 + rng.integers(0, 7, NUM_ITENS)
+        self.codigo_item = codigos.astype(str)
+        produto = np.array(PRODUTOS)[rng.integers(0, len(PRODUTOS), NUM_ITENS)]
+        modelo = rng.integers(10, 999, NUM_ITENS).astype(str)
+        acabamento = np.array(ACABAMENTOS)[rng.integers(0, len(ACABAMENTOS), NUM_ITENS)]
+        self.desc_item = np.char.add(
+            np.char.add(np.char.add(produto, " "), np.char.add(modelo, " ")), acabamento
+        )
+        self.preco_item = np.round(rng.lognormal(3.4, 0.9, NUM_ITENS), 2)
+        self.itens_marca = [np.flatnonzero(self.marca_item == m) for m in range(len(MARCAS))]
+        self.popularidade = [
+            _pesos(1 / np.arange(1, len(itens) + 1) ** 0.9) if len(itens) else None
+            for itens in self.itens_marca
+        ]
+
+        # Clientes: razão social, cidade/UF e canal
+        self.razao_social = np.char.add(
+            np.char.add("CLIENTE ", np.char.zfill(np.arange(NUM_CLIENTES).astype(str), 4)), " LTDA"
+        )
+        self.cidade_cliente = rng.integers(0, len(CIDADES), NUM_CLIENTES)
+        self.canal_cliente = rng.choice(
+            len(CANAIS), NUM_CLIENTES, p=_pesos([30, 25, 20, 10, 10, 5])
+        )
+
+        # Dias: úteis pesam mais, fim de semana e feriados quase nada, fechamento do mês mais
+        self.dias = pd.date_range(data_inicial, data_final, freq="D")
+        util = CALENDARIO.eh_util(self.dias)
+        peso = np.where(util, 1.0, np.where(self.dias.dayofweek == 5, 0.08, 0.01))
+        fechamento = util & (self.dias.days_in_month - self.dias.day < 4)
+        peso = peso * np.where(fechamento, 1.6, 1.0) * np.linspace(1.0, 1.3, len(self.dias))
+        self.peso_dias = _pesos(peso)
+        # Texto dd/mm/aaaa de cada dia da grade, com folga para as datas derivadas
+        self.deslocamento = 30
+        folga = pd.Timedelta(days=self.deslocamento)
+        grade = pd.date_range(self.dias[0] - folga, self.dias[-1] + folga)
+        self.texto_dias = np.array(grade.strftime("%d/%m/%Y"), dtype=object)
+
+
+def _texto_decimal(valores):
+    """Valores com vírgula decimal e sem milhar ("1234,56"), como no export"""
+    centavos = np.rint(np.asarray(valores) * 100).astype(np.int64)
+    inteiros = pc.cast(pa.array(centavos // 100), pa.string())
+    fracao = pc.utf8_lpad(pc.cast(pa.array(centavos % 100), pa.string()), 2, "0")
+    return pc.binary_join_element_wise(inteiros, fracao, ",")
+
+
+def _vazios(texto, mascara):
+    """Coluna de texto com as posições da máscara vazias"""
+    return pc.if_else(pa.array(mascara), "", texto)
+
+
+def gerar_bloco(catalogo, rng, quantidade, primeira_nota):
+    """`quantidade` linhas de notas numeradas a partir de `primeira_nota`.
+
+    Devolve a tabela (texto, colunas do export) e o número da próxima nota.
+    """
+    # Notas: cabeçalho sorteado uma vez e repetido nas linhas; com folga para os itens repetidos
+    num_notas = int(quantidade * 1.15 / MEDIA_LINHAS_NOTA) + 1
+    por_nota = np.minimum(rng.geometric(1 / MEDIA_LINHAS_NOTA, num_notas), MAX_LINHAS_NOTA)
+    nota = np.repeat(np.arange(num_notas), por_nota)
+
+    tipos = rng.choice(len(TIPOS_OPER), num_notas, p=_pesos([p for _, p, _ in TIPOS_OPER]))
+    marca_nota = rng.choice(len(MARCAS), num_notas, p=_pesos([p for _, p in MARCAS]))
+    cliente = rng.integers(0, NUM_CLIENTES, num_notas)
+    dia = rng.choice(len(catalogo.dias), num_notas, p=catalogo.peso_dias)
+
+    # Itens da marca da nota pela popularidade; a mesma nota não repete item
+    item = np.empty(len(nota), dtype=np.int64)
+    marca_linha = marca_nota[nota]
+    for m, itens in enumerate(catalogo.itens_marca):
+        linhas_marca = np.flatnonzero(marca_linha == m)
+        if len(linhas_marca) and len(itens):
+            sorteio = rng.choice(len(itens), len(linhas_marca), p=catalogo.popularidade[m])
+            item[linhas_marca] = itens[sorteio]
+    _, primeiras = np.unique(nota * NUM_ITENS + item, return_index=True)
+    manter = np.sort(primeiras)[:quantidade]
+    nota, item, marca_linha = nota[manter], item[manter], marca_linha[manter]
+    n = len(nota)
+
+    quantidade_item = np.clip(np.rint(rng.lognormal(1.6, 1.1, n)), 1, 5_000)
+    valor = quantidade_item * catalogo.preco_item[item] * rng.uniform(0.85, 1.0, n)
+
+    # Datas: emissão e as derivadas dela, como dias da grade
+    emissao = dia[nota] + catalogo.deslocamento
+    implantacao = emissao - rng.integers(0, 15, num_notas)[nota]
+    aprovacao = np.minimum(implantacao + rng.integers(0, 4, num_notas)[nota], emissao)
+    embarque = emissao + rng.integers(0, 3, num_notas)[nota]
+    entrega = embarque + rng.integers(1, 12, num_notas)[nota]
+    texto_dia = catalogo.texto_dias
+
+    tipo_linha = tipos[nota]
+    receita = np.array([e for _, _, e in TIPOS_OPER])[tipo_linha]
+    devolucao = np.array([t == TIPO_DEVOLUCAO for t, _, _ in TIPOS_OPER])[tipo_linha]
+    cliente_linha = cliente[nota]
+    cidade = catalogo.cidade_cliente[cliente_linha]
+    numero_nota = primeira_nota + nota
+    vazia_nota = rng.random(num_notas)
+
+    colunas = {
+        "Cod Estab": np.where(marca_linha == 0, "101", "102"),
+        "Razao Social": catalogo.razao_social[cliente_linha],
+        "Cidade": np.array([c for c, _ in CIDADES])[cidade],
+        "Estado": np.array([uf for _, uf in CIDADES])[cidade],
+        "Canal Venda Cliente": _vazios(
+            pa.array(np.array(CANAIS)[catalogo.canal_cliente[cliente_linha]]),
+            vazia_nota[nota] < 0.03,
+        ),
+        "Dt Implant Ped": texto_dia[implantacao],
+        "Ped Cliente": _vazios(
+            pc.cast(pa.array(rng.integers(1_000, 99_999, num_notas)[nota]), pa.string()),
+            vazia_nota[nota] > 0.9,
+        ),
+        "Ped Datasul": (300_000 + numero_nota // 2).astype(str),
+        "Tipo Oper": np.array([t for t, _, _ in TIPOS_OPER])[tipo_linha],
+        "Serie": np.full(n, "1"),
+        "Nota Fiscal": numero_nota.astype(str),
+        "Natureza": np.where(receita, "5.102", np.where(devolucao, "1.202", "5.949")),
+        "Dt Emis NF": _vazios(pa.array(texto_dia[emissao]), vazia_nota[nota] < 0.002),
+        "Dt Embarque": texto_dia[embarque],
+        "Dt Aprov. Credito": _vazios(pa.array(texto_dia[aprovacao]), rng.random(n) < 0.03),
+        "Receita": np.where(receita, "Sim", "Não"),
+        "Item": catalogo.codigo_item[item],
+        "Desc Item": catalogo.desc_item[item],
+        "Deposito": _vazios(
+            pa.array(np.array(["CD SP", "CD SOR", "FABRICA"])[marca_linha % 3]),
+            rng.random(n) < 0.01,
+        ),
+        "Quantidade": quantidade_item.astype(np.int64).astype(str),
+        "Vl Net Livro": _texto_decimal(valor),
+        "Nro Embarque": _vazios(
+            pc.cast(pa.array(500_000 + numero_nota // 3), pa.string()), vazia_nota[nota] > 0.98
+        ),
+        "Marca": catalogo.marcas[marca_linha],
+        "Dt Entrega": texto_dia[entrega],
+        "Situacao Ped": np.where(vazia_nota[nota] < 0.95, "Faturado", "Parcial"),
+    }
+    tabela = pa.table({col: pa.array(colunas[col], pa.string()) for col in COLUNAS_FAT})
+    return tabela, primeira_nota + num_notas
+
+
+def gerar_csv(arquivo, quantidade, semente=0, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """Grava um ESFT0100.csv sintético com `quantidade` linhas; devolve o caminho"""
+    arquivo = Path(arquivo)
+    arquivo.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(semente)
+    catalogo = Catalogo(rng)
+    opcoes = pacsv.WriteOptions(
+        include_header=False, delimiter=OPCOES_CSV["sep"], quoting_style="none"
+    )
+
+    proxima_nota = 100_000
+    with open(arquivo, "wb") as saida:
+        saida.write((OPCOES_CSV["sep"].join(COLUNAS_FAT) + "\n").encode(OPCOES_CSV["encoding"]))
+        for inicio in range(0, quantidade, linhas_por_bloco):
+            tabela, proxima_nota = gerar_bloco(
+                catalogo, rng, min(linhas_por_bloco, quantidade - inicio), proxima_nota
+            )
+            texto = io.BytesIO()
+            pacsv.write_csv(tabela, texto, opcoes)
+            saida.write(texto.getvalue().decode("utf-8").encode(OPCOES_CSV["encoding"]))
+    return arquivo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("destino", type=Path, help="Diretório dos CSVs gerados")
+    parser.add_argument("--tamanhos", nargs="+", default=TAMANHOS)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    for tamanho in args.tamanhos:
+        arquivo = gerar_csv(args.destino / f"ESFT0100_{tamanho}.csv", linhas(tamanho), args.semente)
+        print(f"{arquivo}: {linhas(tamanho):,} linhas ({arquivo.stat().st_size / 1024**2:,.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Funções compartilhadas entre as páginas do Dashboard de Logística."""
@@ -0,0 +1,115 @@
+"""Curva ABC de todas as marcas, calculada numa passada por período.
+
+Os itens de todas as marcas são somados num groupby só e ordenados por marca
+e quantidade decrescente; a participação acumulada de cada marca fica num
+bloco contíguo do array, que é crescente. Mudar os cortes das classes A/B é
+uma busca binária nesse bloco, sem reagrupar nem classificar linha a linha.
+A descrição dos itens só é juntada às linhas devolvidas.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+CLASSES_ABC = np.array(["A", "B", "C"])
+
+
+class CurvaABC:
+    """Itens de todas as marcas com quantidade, participação e participação acumulada por marca"""
+
+    def __init__(self, df, coluna="quantidade", descricoes=None):
+        itens = (
+            df.groupby(["marca", "item"], observed=True)[coluna]
+            .sum()
+            .reset_index()
+        )
+        itens["marca"] = itens["marca"].astype(str)
+        itens["item"] = itens["item"].astype(str)
+        itens = itens.sort_values(
+            ["marca", coluna], ascending=[True, False], kind="stable"
+        ).reset_index(drop=True)
+
+        # Início e fim do bloco de cada marca (a tabela está ordenada por marca)
+        marcas = itens["marca"].to_numpy()
+        inicios = np.flatnonzero(np.r_[True, marcas[1:] != marcas[:-1]]) if len(marcas) else []
+        fins = list(inicios[1:]) + [len(marcas)]
+        self._blocos = {marcas[i]: (i, f) for i, f in zip(inicios, fins)}
+
+        # Participação de cada item no total da marca e acumulados dentro da marca
+        valores = itens[coluna].to_numpy(dtype=float)
+        acumulada = np.empty_like(valores)
+        percentual = np.empty_like(valores)
+        percentual_acumulado = np.empty_like(valores)
+        for i, f in self._blocos.values():
+            acumulada[i:f] = np.cumsum(valores[i:f])
+            percentual[i:f] = valores[i:f] / valores[i:f].sum()
+            percentual_acumulado[i:f] = np.cumsum(percentual[i:f])
+        itens["quantidade_acumulada"] = acumulada
+        itens["percentual"] = percentual
+        itens["percentual_acumulado"] = percentual_acumulado
+
+        self.coluna = coluna
+        self.itens = itens
+        self.descricoes = descricoes
+        self._acumulado = itens["percentual_acumulado"].to_numpy()
+
+        # Com quantidades negativas (estornos) o acumulado pode decrescer e a
+        # busca binária não vale: essas marcas são classificadas por comparação
+        self._crescente = {
+            marca: bool(np.all(np.diff(self._acumulado[i:f]) >= 0))
+            for marca, (i, f) in self._blocos.items()
+        }
+
+    def com_descricoes(self, descricoes):
+        """Cópia rasa que junta `descricoes` às linhas devolvidas (a curva em cache fica intacta)"""
+        curva = copy.copy(self)
+        curva.descricoes = descricoes
+        return curva
+
+    @property
+    def marcas(self):
+        """Marcas presentes, em ordem alfabética"""
+        return list(self._blocos)
+
+    def _classes(self, marca, limite_a, limite_b, quantidade=None):
+        """Índice da classe (0=A, 1=B, 2=C) dos primeiros `quantidade` itens da marca"""
+        inicio, fim = self._blocos[marca]
+        if quantidade is not None:
+            fim = min(fim, inicio + quantidade)
+        if not self._crescente[marca]:
+            acumulado = self._acumulado[inicio:fim]
+            return np.where(acumulado <= limite_a, 0, np.where(acumulado <= limite_b, 1, 2))
+
+        # Os cortes são buscados no bloco inteiro; só os itens pedidos recebem rótulo
+        acumulado = self._acumulado[inicio:self._blocos[marca][1]]
+        fim_a = np.searchsorted(acumulado, limite_a, side="right")
+        fim_b = max(fim_a, np.searchsorted(acumulado, limite_b, side="right"))
+        posicoes = np.arange(fim - inicio)
+        return (posicoes >= fim_a).astype(np.int64) + (posicoes >= fim_b)
+
+    def _com_descricao(self, curva):
+        """Acrescenta `desc_item` (de `descricoes`, indexada pelo código) após o item"""
+        if self.descricoes is not None:
+            curva.insert(2, "desc_item", curva["item"].map(self.descricoes))
+        return curva
+
+    def marca(self, marca, limite_a=0.8, limite_b=0.95, top_n=None):
+        """Curva da marca com a coluna `classe_abc`, opcionalmente só os `top_n` primeiros itens"""
+        if marca not in self._blocos:
+            vazia = self.itens.iloc[0:0].copy()
+            return self._com_descricao(vazia).assign(classe_abc=pd.Series(dtype=object))
+        inicio, _ = self._blocos[marca]
+        classes = self._classes(marca, limite_a, limite_b, top_n)
+        curva = self.itens.iloc[inicio : inicio + len(classes)].copy()
+        curva["classe_abc"] = CLASSES_ABC[classes]
+        return self._com_descricao(curva)
+
+    def tabela(self, limite_a=0.8, limite_b=0.95):
+        """Curvas de todas as marcas numa tabela só, com a coluna `classe_abc` (para exportar)"""
+        classes = np.empty(len(self.itens), dtype=np.int64)
+        for marca, (inicio, fim) in self._blocos.items():
+            classes[inicio:fim] = self._classes(marca, limite_a, limite_b)
+        tabela = self.itens.copy()
+        tabela["classe_abc"] = CLASSES_ABC[classes]
+        return self._com_descricao(tabela)
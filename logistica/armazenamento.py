@@ -0,0 +1,411 @@
+"""Gravação e leitura da base tratada do ESFT0100.
+
+A base fica num dataset Parquet particionado por ano/mês de emissão da nota
+(`Datasets/ESFT/ESFT0100/ano=2025/mes=3/...`). Cada partição é a unidade de
+reescrita: um upload incremental só regrava os meses que aparecem no delta e
+os que já tinham alguma das chaves dele (nota reemitida com outra data).
+Para achar esses sem ler a base, cada partição guarda um índice com o hash
+da chave de cada linha (`_chaves-*.parquet`; o prefixo `_` o deixa fora da
+leitura do dataset).
+
+Cada ingestão grava uma geração nova e imutável da base (base, dimensão de
+itens e cubo em `Datasets/ESFT/ESFT0100_geracoes/<geração>/`, ver
+`logistica.publicacao`), e o arquivo de versão (`ESFT0100_versao.json`)
+aponta a geração vigente. As funções de leitura recebem o caminho lógico da
+base (e leem a geração vigente por `resolver`) ou o caminho de uma geração.
+As páginas pegam a geração uma vez por rerun (`base_publicada`), guardam na
+sessão e a passam como destino a todas as leituras, inclusive as dos
+fragmentos: o rerun lê a mesma geração do começo ao fim, mesmo que outra seja
+publicada no meio. Sem arquivo de versão (bases anteriores às gerações), a
+base é lida do próprio caminho lógico.
+"""
+
+import hashlib
+import shutil
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from logistica.gravacao import ler_json
+
+DIRETORIO_DATASET = Path("Datasets/ESFT/ESFT0100")
+
+# Arquivo único usado antes do particionamento, lido/migrado se ainda existir
+ARQUIVO_LEGADO = Path("Datasets/ESFT/ESFT0100_atual.parquet")
+
+# Identidade de uma linha de nota fiscal (o item pela chave da dimensão de itens)
+CHAVE_NOTA = ["nota_fiscal", "serie", "item_id", "tipo_oper"]
+
+COLUNAS_PARTICAO = ["ano", "mes"]
+PARTICIONAMENTO = ds.partitioning(
+    pa.schema([("ano", pa.int32()), ("mes", pa.int32())]), flavor="hive"
+)
+
+# Índice de chaves de cada partição (ignorado pelo dataset por começar com "_")
+PREFIXO_INDICE = "_chaves"
+
+
+def arquivo_versao(destino=DIRETORIO_DATASET):
+    """Arquivo de versão ao lado da base (`<base>_versao.json`)"""
+    destino = Path(destino)
+    return destino.with_name(f"{destino.name}_versao.json")
+
+
+def pasta_geracoes(destino=DIRETORIO_DATASET):
+    """Pasta das gerações publicadas da base (`<base>_geracoes`)"""
+    destino = Path(destino)
+    return destino.with_name(f"{destino.name}_geracoes")
+
+
+def versao_publicada(destino=DIRETORIO_DATASET):
+    """Registro da geração vigente (geração, versão, data de publicação), ou None"""
+    return ler_json(arquivo_versao(destino))
+
+
+def base_publicada(destino=DIRETORIO_DATASET):
+    """Caminho da geração vigente, ou o próprio destino se nenhuma foi publicada"""
+    destino = Path(destino)
+    registro = versao_publicada(destino)
+    if registro is None:
+        return destino
+    return pasta_geracoes(destino) / registro["geracao"] / destino.name
+
+
+def resolver(destino=DIRETORIO_DATASET):
+    """Caminho a ler da base: a geração vigente do caminho lógico, ou o próprio caminho de uma geração"""
+    return base_publicada(destino)
+
+
+def dataset_existe(destino=DIRETORIO_DATASET):
+    """Indica se há base gravada (particionada ou no arquivo legado)"""
+    return resolver(destino).is_dir() or ARQUIVO_LEGADO.exists()
+
+
+def versao_dataset(destino=DIRETORIO_DATASET):
+    """Versão da base: hash de caminho, tamanho e mtime de cada arquivo de dados.
+
+    Só faz `stat` nos arquivos, sem lê-los. Os caminhos entram relativos à
+    base, para a versão não depender da pasta da geração em que ela foi
+    gravada. Retorna None se não houver base.
+    """
+    destino = resolver(destino)
+    if destino.is_dir():
+        arquivos = sorted(a for a in destino.rglob("*.parquet") if not a.name.startswith("_"))
+        raiz = destino
+    elif ARQUIVO_LEGADO.exists():
+        arquivos = [ARQUIVO_LEGADO]
+        raiz = ARQUIVO_LEGADO.parent
+    else:
+        return None
+
+    assinatura = hashlib.blake2b(digest_size=8)
+    for arquivo in arquivos:
+        info = arquivo.stat()
+        relativo = arquivo.relative_to(raiz).as_posix()
+        assinatura.update(f"{relativo}|{info.st_size}|{info.st_mtime_ns}\n".encode())
+    return assinatura.hexdigest()
+
+
+def adicionar_particao(tabela):
+    """Acrescenta as colunas ano/mês derivadas de dt_emis_nf"""
+    datas = tabela.column("dt_emis_nf")
+    tabela = tabela.append_column("ano", pc.cast(pc.year(datas), pa.int32()))
+    return tabela.append_column("mes", pc.cast(pc.month(datas), pa.int32()))
+
+
+def _esquema_particionado(esquema):
+    campos = [esquema.field(nome) for nome in esquema.names if nome not in COLUNAS_PARTICAO]
+    return pa.schema(campos + [pa.field("ano", pa.int32()), pa.field("mes", pa.int32())])
+
+
+def _caminho_particao(destino, ano, mes):
+    ano = "__HIVE_DEFAULT_PARTITION__" if ano is None else ano
+    mes = "__HIVE_DEFAULT_PARTITION__" if mes is None else mes
+    return Path(destino) / f"ano={ano}" / f"mes={mes}"
+
+
+def gravar_dataset(tabelas, esquema, destino=DIRETORIO_DATASET):
+    """Grava a base inteira a partir de um iterável de tabelas Arrow.
+
+    As tabelas são consumidas uma a uma (modo streaming). A base nova é
+    montada num diretório temporário e só substitui a anterior no final, de
+    modo que um upload com erro não apaga os dados existentes.
+    """
+    destino = Path(destino)
+    temporario = destino.with_name(f"{destino.name}.tmp-{uuid.uuid4().hex[:8]}")
+    esquema = _esquema_particionado(esquema)
+
+    def lotes():
+        for tabela in tabelas:
+            yield from adicionar_particao(tabela).cast(esquema).to_batches()
+
+    try:
+        ds.write_dataset(
+            lotes(),
+            temporario,
+            schema=esquema,
+            format="parquet",
+            partitioning=PARTICIONAMENTO,
+            basename_template="parte-{i}.parquet",
+        )
+        if set(CHAVE_NOTA) <= set(esquema.names):
+            for pasta in _pastas_particao(temporario):
+                _indexar(pasta)
+        if destino.exists():
+            shutil.rmtree(destino)
+        temporario.rename(destino)
+    finally:
+        if temporario.exists():
+            shutil.rmtree(temporario, ignore_errors=True)
+
+
+def _chave(tabela):
+    """Chave textual da linha de nota (nota|série|item|tipo de operação)"""
+    partes = [pc.cast(tabela.column(col), pa.string()) for col in CHAVE_NOTA]
+    return pc.binary_join_element_wise(
+        *partes, "|", null_handling="replace", null_replacement=""
+    )
+
+
+def _hash_coluna(coluna):
+    """Hash de 64 bits de cada valor; textos passam por dicionário (cada valor distinto é hasheado uma vez)"""
+    if pa.types.is_integer(coluna.type):
+        return pd.util.hash_array(pc.fill_null(pc.cast(coluna, pa.int64()), -1).to_numpy())
+    coluna = pc.cast(coluna, pa.string())
+    if isinstance(coluna, pa.ChunkedArray):
+        coluna = coluna.combine_chunks()
+    codificada = pc.dictionary_encode(coluna)
+    hashes = pd.util.hash_array(
+        codificada.dictionary.to_numpy(zero_copy_only=False), categorize=False
+    )
+    # Nulo aponta para uma posição extra, de hash 0
+    posicoes = pc.fill_null(codificada.indices, len(hashes)).to_numpy()
+    return np.append(hashes, np.uint64(0))[posicoes]
+
+
+def _hash_chaves(tabela):
+    """Hash de 64 bits da chave de cada linha (o que vai para o índice das partições)"""
+    hashes = np.zeros(tabela.num_rows, np.uint64)
+    for col in CHAVE_NOTA:
+        hashes = hashes * np.uint64(0x100000001B3) ^ _hash_coluna(tabela.column(col))
+    return pa.array(hashes, pa.uint64())
+
+
+def _mesmo_valor(coluna, valor):
+    """Máscara de igualdade que trata a partição nula (data de emissão vazia)"""
+    return pc.is_null(coluna) if valor is None else pc.equal(coluna, valor)
+
+
+def _pastas_particao(destino):
+    """Pastas das partições (ano=/mes=) gravadas na base"""
+    return sorted(p for p in Path(destino).glob("ano=*/mes=*") if p.is_dir())
+
+
+def _arquivos_particao(pasta):
+    """Arquivos de dados da partição (sem o índice de chaves)"""
+    return sorted(p for p in pasta.glob("*.parquet") if not p.name.startswith("_"))
+
+
+def _indices_particao(pasta):
+    """Arquivos do índice de chaves da partição"""
+    return sorted(pasta.glob(f"{PREFIXO_INDICE}*.parquet"))
+
+
+def _indexar(pasta, tabela=None):
+    """Grava o índice de chaves de uma partição (lendo só as colunas da chave, se `tabela` não vier)"""
+    if tabela is None:
+        tabela = ds.dataset(_arquivos_particao(pasta), format="parquet").to_table(columns=CHAVE_NOTA)
+    antigos = _indices_particao(pasta)
+    pq.write_table(
+        pa.table({"hash": _hash_chaves(tabela)}),
+        pasta / f"{PREFIXO_INDICE}-{uuid.uuid4().hex[:8]}.parquet",
+        use_dictionary=False,  # hashes não se repetem: o dicionário só custaria tempo
+    )
+    for arquivo in antigos:
+        arquivo.unlink()
+
+
+def _particoes_com_chaves(destino, hashes):
+    """Partições da base com alguma linha cujo hash de chave está em `hashes`.
+
+    Lê só os índices (uma coluna de inteiros por partição); partições de
+    bases gravadas antes do índice são indexadas aqui, uma vez. Um hash
+    repetido por acaso só faz uma partição a mais ser lida.
+    """
+    pastas = _pastas_particao(destino)
+    for pasta in pastas:
+        if not _indices_particao(pasta):
+            _indexar(pasta)
+    if not pastas:
+        return []
+    indice = ds.dataset(
+        [str(arquivo) for pasta in pastas for arquivo in _indices_particao(pasta)],
+        format="parquet",
+        partitioning=PARTICIONAMENTO,
+        partition_base_dir=str(destino),
+    )
+    achadas = indice.to_table(columns=COLUNAS_PARTICAO, filter=ds.field("hash").isin(hashes))
+    return achadas.group_by(COLUNAS_PARTICAO).aggregate([]).to_pylist()
+
+
+def _migrar_legado(destino):
+    """Converte o arquivo único legado para o dataset particionado"""
+    tabela = pq.read_table(ARQUIVO_LEGADO)
+    gravar_dataset([tabela], tabela.schema, destino)
+
+
+def mesclar_delta(tabela_delta, destino=DIRETORIO_DATASET):
+    """Insere ou substitui as linhas do delta na base, pela chave da nota.
+
+    Se a mesma chave aparece mais de uma vez no delta, vale a última linha.
+    Linhas da base com a chave de uma linha do delta são descartadas em
+    qualquer partição (uma nota reemitida com outra data sai do mês antigo)
+    e o delta entra no lugar. Só são lidas e regravadas as partições do delta
+    e as que o índice de chaves aponta; o custo acompanha o tamanho do
+    delta, não o histórico. Retorna quantas linhas foram substituídas e
+    quais partições foram regravadas.
+    """
+    destino = Path(destino)
+    if not destino.is_dir() and ARQUIVO_LEGADO.exists():
+        _migrar_legado(destino)
+
+    esquema = _esquema_particionado(tabela_delta.schema)
+    tabela_delta = adicionar_particao(tabela_delta).cast(esquema)
+    chaves_delta = _chave(tabela_delta)
+    repetidas = pd.Series(chaves_delta.to_numpy(zero_copy_only=False)).duplicated(keep="last").to_numpy()
+    if repetidas.any():
+        tabela_delta = tabela_delta.filter(pa.array(~repetidas))
+        chaves_delta = _chave(tabela_delta)
+
+    particoes = {
+        (p["ano"], p["mes"])
+        for p in tabela_delta.select(COLUNAS_PARTICAO).group_by(COLUNAS_PARTICAO).aggregate([]).to_pylist()
+    }
+    particoes |= {
+        (p["ano"], p["mes"]) for p in _particoes_com_chaves(destino, _hash_chaves(tabela_delta))
+    }
+
+    esquema_dados = pa.schema([f for f in esquema if f.name not in COLUNAS_PARTICAO])
+    substituidas = 0
+    regravadas = []
+    for ano, mes in sorted(particoes, key=lambda p: (p[0] is None, p[0] or 0, p[1] or 0)):
+        novas = tabela_delta.filter(
+            pc.and_(_mesmo_valor(tabela_delta["ano"], ano), _mesmo_valor(tabela_delta["mes"], mes))
+        )
+
+        pasta = _caminho_particao(destino, ano, mes)
+        antigos = _arquivos_particao(pasta) if pasta.is_dir() else []
+        tabelas = []
+        if antigos:
+            existentes = ds.dataset(antigos, format="parquet").to_table()
+            repetidas = pc.is_in(_chave(existentes), value_set=chaves_delta)
+            substituidas += pc.sum(repetidas).as_py() or 0
+            tabelas.append(existentes.filter(pc.invert(repetidas)))
+        tabelas.append(novas.drop_columns(COLUNAS_PARTICAO))
+        mesclada = pa.concat_tables([t.cast(esquema_dados) for t in tabelas])
+
+        # Grava a partição nova antes de remover os arquivos antigos; a que
+        # ficou vazia (todas as linhas mudaram de mês) some da base
+        if mesclada.num_rows:
+            pasta.mkdir(parents=True, exist_ok=True)
+            pq.write_table(mesclada, pasta / f"parte-{uuid.uuid4().hex[:8]}.parquet")
+            _indexar(pasta, mesclada)
+        for arquivo in antigos:
+            arquivo.unlink()
+        if not mesclada.num_rows:
+            shutil.rmtree(pasta, ignore_errors=True)
+        regravadas.append((ano, mes))
+
+    return {"substituidas": substituidas, "particoes": regravadas}
+
+
+def _abrir_dataset(destino=DIRETORIO_DATASET):
+    """Dataset Arrow da base (particionado ou arquivo legado), ou None se não houver base"""
+    destino = resolver(destino)
+    if destino.is_dir():
+        return ds.dataset(destino, format="parquet", partitioning=PARTICIONAMENTO)
+    if ARQUIVO_LEGADO.exists():
+        return ds.dataset(ARQUIVO_LEGADO, format="parquet")
+    return None
+
+
+def limites_datas(destino=DIRETORIO_DATASET):
+    """Primeira e última data de emissão da base.
+
+    Lidas das estatísticas dos row groups do Parquet, sem ler as linhas; só
+    arquivos sem estatística têm a coluna lida. Retorna (None, None) se não
+    houver datas.
+    """
+    dataset = _abrir_dataset(destino)
+    if dataset is None:
+        return None, None
+
+    minimos, maximos = [], []
+    for fragmento in dataset.get_fragments():
+        metadados = fragmento.metadata
+        indice = metadados.schema.to_arrow_schema().get_field_index("dt_emis_nf")
+        estatisticas = [
+            metadados.row_group(i).column(indice).statistics
+            for i in range(metadados.num_row_groups)
+        ]
+        if all(e is not None and e.has_min_max for e in estatisticas):
+            minimos += [pd.Timestamp(e.min) for e in estatisticas]
+            maximos += [pd.Timestamp(e.max) for e in estatisticas]
+        else:
+            extremos = pc.min_max(fragmento.to_table(columns=["dt_emis_nf"])["dt_emis_nf"])
+            if extremos["min"].is_valid:
+                minimos.append(pd.Timestamp(extremos["min"].as_py()))
+                maximos.append(pd.Timestamp(extremos["max"].as_py()))
+
+    if not minimos:
+        return None, None
+    return min(minimos), max(maximos)
+
+
+def base_particionada(destino=DIRETORIO_DATASET):
+    """Indica se a base está no dataset particionado (e não no arquivo legado)"""
+    return resolver(destino).is_dir()
+
+
+def esquema_base(destino=DIRETORIO_DATASET):
+    """Esquema gravado da base (sem as colunas de partição), ou None se não houver base"""
+    dataset = _abrir_dataset(destino)
+    if dataset is None:
+        return None
+    return pa.schema([campo for campo in dataset.schema if campo.name not in COLUNAS_PARTICAO])
+
+
+def colunas_base(destino=DIRETORIO_DATASET):
+    """Colunas gravadas na base (sem as de partição), ou [] se não houver base"""
+    dataset = _abrir_dataset(destino)
+    if dataset is None:
+        return []
+    return [c for c in dataset.schema.names if c not in COLUNAS_PARTICAO]
+
+
+def ler_tabela(destino=DIRETORIO_DATASET, colunas=None, filtro=None):
+    """Lê a base como tabela Arrow (sem as colunas de partição), ou None se não houver base.
+
+    `colunas` restringe as colunas decodificadas e `filtro` (expressão do
+    `pyarrow.dataset`) é aplicado pelo leitor, descartando partições e row
+    groups fora dele.
+    """
+    dataset = _abrir_dataset(destino)
+    if dataset is None:
+        return None
+
+    if colunas is None:
+        colunas = [c for c in dataset.schema.names if c not in COLUNAS_PARTICAO]
+    return dataset.to_table(columns=list(colunas), filter=filtro)
+
+
+def carregar_dataset(destino=DIRETORIO_DATASET, colunas=None, filtro=None):
+    """Lê a base como DataFrame (sem as colunas de partição); ver `ler_tabela`"""
+    tabela = ler_tabela(destino, colunas, filtro)
+    return pd.DataFrame() if tabela is None else tabela.to_pandas()
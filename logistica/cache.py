@@ -0,0 +1,83 @@
+"""Cache em memória dos recortes da base, compartilhado pelas páginas.
+
+As entradas são chaveadas pela versão da base (assinatura de caminho, tamanho
+e mtime dos arquivos Parquet) e pela `Consulta`. Como o módulo é importado uma
+vez por processo, `Faturamento.py` e `pages/devoluções.py` usam o mesmo cache.
+Um upload muda a versão: a próxima leitura é um miss. Logo depois de uma
+publicação, sessões fixadas na geração anterior e na nova convivem; o descarte
+é só LRU, sem olhar a versão, para as duas não derrubarem as entradas uma da
+outra. As entradas das versões antigas saem quando deixam de ser lidas.
+"""
+
+import threading
+from collections import OrderedDict
+
+from logistica.armazenamento import DIRETORIO_DATASET, versao_dataset
+from logistica.consulta import carregar
+
+# Limite de recortes guardados, de todas as versões (períodos diferentes etc.)
+MAX_ENTRADAS = 32
+
+
+class CacheDataset:
+    """Recortes da base em memória, por (versão, destino, consulta), com descarte LRU"""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._versao = None
+        self._trava = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.descartes = 0
+
+    def carregar(self, consulta, destino=DIRETORIO_DATASET):
+        """Recorte da consulta na versão da base lida em `destino`.
+
+        O DataFrame devolvido é uma cópia rasa: as páginas podem alterar
+        colunas sem afetar o que está no cache.
+        """
+        versao = versao_dataset(destino)
+        chave = (versao, str(destino), consulta)
+        with self._trava:
+            self._versao = versao
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                self.hits += 1
+                return self._entradas[chave][0].copy(deep=False)
+            self.misses += 1
+
+        df = carregar(consulta, destino)
+        tamanho = int(df.memory_usage(deep=True).sum())
+        with self._trava:
+            self._entradas[chave] = (df, tamanho)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.descartes += 1
+        return df.copy(deep=False)
+
+    def limpar(self):
+        """Esvazia o cache (as estatísticas são mantidas)"""
+        with self._trava:
+            self.descartes += len(self._entradas)
+            self._entradas.clear()
+
+    def estatisticas(self):
+        """Última versão lida, hits, misses, descartes, entradas e bytes ocupados"""
+        with self._trava:
+            return {
+                "versao": self._versao,
+                "hits": self.hits,
+                "misses": self.misses,
+                "descartes": self.descartes,
+                "entradas": len(self._entradas),
+                "bytes": sum(tamanho for _, tamanho in self._entradas.values()),
+            }
+
+
+CACHE = CacheDataset()
+
+
+def carregar_em_cache(consulta, destino=DIRETORIO_DATASET):
+    """Recorte da consulta pelo cache compartilhado do processo"""
+    return CACHE.carregar(consulta, destino)
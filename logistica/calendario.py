@@ -0,0 +1,116 @@
+"""Calendário de dias úteis com os feriados nacionais e de São Paulo.
+
+Os feriados vêm de uma tabela local de regras (datas fixas e datas móveis em
+relação à Páscoa), sem consulta externa. O calendário marca cada dia de um
+intervalo fixo de anos como útil ou não e guarda a contagem acumulada de dias
+úteis: quantos dias úteis há entre duas datas é a diferença de duas posições
+desse array, O(1) por consulta e vetorizado para muitos períodos de uma vez.
+"""
+
+import numpy as np
+import pandas as pd
+
+ANO_INICIAL = 2000
+ANO_FINAL = 2050
+
+# (mês, dia, nome, abrangência)
+FERIADOS_FIXOS = [
+    (1, 1, "Confraternização Universal", "nacional"),
+    (1, 25, "Aniversário de São Paulo", "municipal"),
+    (4, 21, "Tiradentes", "nacional"),
+    (5, 1, "Dia do Trabalho", "nacional"),
+    (7, 9, "Revolução Constitucionalista", "estadual"),
+    (9, 7, "Independência do Brasil", "nacional"),
+    (10, 12, "Nossa Senhora Aparecida", "nacional"),
+    (11, 2, "Finados", "nacional"),
+    (11, 15, "Proclamação da República", "nacional"),
+    (11, 20, "Dia da Consciência Negra", "municipal"),  # nacional a partir de 2024
+    (12, 25, "Natal", "nacional"),
+]
+
+# (dias em relação ao domingo de Páscoa, nome, abrangência)
+FERIADOS_MOVEIS = [
+    (-48, "Carnaval (segunda-feira)", "facultativo"),
+    (-47, "Carnaval (terça-feira)", "facultativo"),
+    (-2, "Sexta-feira Santa", "nacional"),
+    (60, "Corpus Christi", "municipal"),
+]
+
+# Feriados considerados por padrão (pontos facultativos ficam de fora)
+ABRANGENCIAS_PADRAO = ("nacional", "estadual", "municipal")
+
+
+def pascoa(anos):
+    """Domingo de Páscoa de cada ano (calendário gregoriano, algoritmo de Meeus)"""
+    anos = np.asarray(anos, dtype=np.int64)
+    a, b, c = anos % 19, anos // 100, anos % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes = (h + l - 7 * m + 114) // 31
+    dia = (h + l - 7 * m + 114) % 31 + 1
+    return pd.to_datetime(pd.DataFrame({"year": anos, "month": mes, "day": dia})).to_numpy(
+        "datetime64[D]"
+    )
+
+
+def tabela_feriados(ano_inicial=ANO_INICIAL, ano_final=ANO_FINAL):
+    """Feriados de cada ano do intervalo: data, nome e abrangência, em ordem de data"""
+    anos = np.arange(ano_inicial, ano_final + 1)
+    partes = []
+    for mes, dia, nome, abrangencia in FERIADOS_FIXOS:
+        datas = pd.to_datetime(pd.DataFrame({"year": anos, "month": mes, "day": dia}))
+        partes.append(pd.DataFrame({"data": datas, "nome": nome, "abrangencia": abrangencia}))
+    domingos = pascoa(anos)
+    for deslocamento, nome, abrangencia in FERIADOS_MOVEIS:
+        datas = pd.to_datetime(domingos + np.timedelta64(deslocamento, "D"))
+        partes.append(pd.DataFrame({"data": datas, "nome": nome, "abrangencia": abrangencia}))
+    return pd.concat(partes, ignore_index=True).sort_values("data", kind="stable").reset_index(drop=True)
+
+
+def _dias(datas):
+    """Datas como datetime64[D] (escalar ou array)"""
+    if np.ndim(datas) == 0:
+        data = pd.Timestamp(datas)
+        return np.datetime64("NaT", "D") if pd.isna(data) else np.datetime64(data, "D")
+    return np.asarray(pd.to_datetime(datas), dtype="datetime64[D]")
+
+
+class Calendario:
+    """Dias úteis (segunda a sexta, fora os feriados) de um intervalo de anos, com contagem acumulada"""
+
+    def __init__(self, ano_inicial=ANO_INICIAL, ano_final=ANO_FINAL, abrangencias=ABRANGENCIAS_PADRAO):
+        feriados = tabela_feriados(ano_inicial, ano_final)
+        self.feriados = feriados[feriados["abrangencia"].isin(abrangencias)].reset_index(drop=True)
+
+        self.inicio = np.datetime64(f"{ano_inicial}-01-01", "D")
+        self.dias = np.arange(self.inicio, np.datetime64(f"{ano_final + 1}-01-01", "D"))
+        self.uteis = np.is_busday(self.dias, holidays=self.feriados["data"].to_numpy("datetime64[D]"))
+        # acumulado[i] = dias úteis antes do dia i da grade
+        self.acumulado = np.concatenate([[0], np.cumsum(self.uteis)])
+
+    def posicao(self, datas):
+        """Posição das datas na grade de dias (datas fora do intervalo são trazidas para a borda)"""
+        dias = _dias(datas)
+        posicoes = (dias - self.inicio).astype(np.int64)
+        return np.clip(posicoes, -1, len(self.dias))
+
+    def dias_uteis(self, data_inicial, data_final):
+        """Dias úteis entre as datas, inclusive as duas; escalares ou arrays de períodos"""
+        inicio = np.clip(self.posicao(data_inicial), 0, len(self.dias))
+        fim = np.clip(self.posicao(data_final) + 1, 0, len(self.dias))
+        contagem = np.maximum(self.acumulado[fim] - self.acumulado[inicio], 0)
+        return int(contagem) if np.ndim(contagem) == 0 else contagem
+
+    def eh_util(self, datas):
+        """Indica, para cada data, se é dia útil (datas vazias ou fora do intervalo não são)"""
+        dias = _dias(datas)
+        posicoes = (dias - self.inicio).astype(np.int64)
+        validas = ~np.isnat(dias) & (posicoes >= 0) & (posicoes < len(self.dias))
+        return np.where(validas, self.uteis[np.clip(posicoes, 0, len(self.dias) - 1)], False)
+
+
+CALENDARIO = Calendario()
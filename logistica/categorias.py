@@ -0,0 +1,42 @@
+"""Colunas de baixa cardinalidade guardadas como categorias.
+
+Marcas, tipos de operação, canais etc. têm poucos valores distintos. Como
+`category` no pandas e colunas de dicionário no Parquet, ocupam um código
+inteiro por linha e os groupbys/filtros trabalham sobre esses códigos.
+"""
+
+import pandas as pd
+
+COLUNAS_CATEGORICAS = [
+    "marca",
+    "tipo_oper",
+    "canal_venda_cliente",
+    "estado",
+    "cidade",
+    "deposito",
+    "situacao_ped",
+]
+
+
+def converter_categorias(df):
+    """Converte as colunas de baixa cardinalidade presentes para `category`"""
+    for col in COLUNAS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def maiusculas(serie):
+    """Coloca os valores em maiúsculas.
+
+    Em colunas categóricas só as categorias são alteradas, sem percorrer as
+    linhas; se duas categorias colidirem ("Papaiz" e "PAPAIZ"), converte
+    linha a linha e recategoriza.
+    """
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.str.upper()
+
+    categorias = serie.cat.categories.str.upper()
+    if categorias.is_unique:
+        return serie.cat.rename_categories(categorias)
+    return serie.str.upper().astype("category")
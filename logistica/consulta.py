@@ -0,0 +1,137 @@
+"""Leitura tipada de recortes da base do ESFT0100.
+
+Cada página descreve numa `Consulta` o recorte de que precisa (colunas, tipos
+de operação, marcas e período). O recorte vira projeção de colunas e filtro do
+`pyarrow.dataset`: partições fora do período nem são abertas, colunas não
+pedidas não são decodificadas e as linhas são filtradas antes do pandas.
+"""
+
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from logistica.armazenamento import (
+    DIRETORIO_DATASET,
+    base_particionada,
+    colunas_base,
+    dataset_existe,
+    ler_tabela,
+)
+from logistica.cubo import DIMENSOES_CUBO, MEDIDAS_CUBO, agregar, cubo_atualizado
+from logistica.itens import anexar_itens, colunas_leitura
+
+TIPO_DEVOLUCAO = "5 - Dev Venda"
+
+
+def _tupla(valores):
+    return None if valores is None else tuple(valores)
+
+
+def _timestamp(data):
+    return None if data is None else pd.Timestamp(data)
+
+
+@dataclass(frozen=True)
+class Consulta:
+    """Recorte da base: colunas, tipos de operação, marcas e período (datas inclusivas).
+
+    Campos `None` não restringem nada. As marcas são comparadas em maiúsculas,
+    como as páginas normalizam a coluna. Com `cubo=True` o recorte é lido do
+    cubo diário (somas por dia × marca × canal × operação × receita) em vez
+    das linhas de nota.
+    """
+
+    colunas: tuple[str, ...] | None = None
+    tipos_oper: tuple[str, ...] | None = None
+    marcas: tuple[str, ...] | None = None
+    marcas_excluidas: tuple[str, ...] | None = None
+    data_inicial: pd.Timestamp | None = None
+    data_final: pd.Timestamp | None = None
+    cubo: bool = False
+
+    def __post_init__(self):
+        # Listas viram tuplas e datas viram Timestamp: a consulta fica imutável
+        # e pode ser chave de cache
+        for campo in ("colunas", "tipos_oper", "marcas", "marcas_excluidas"):
+            object.__setattr__(self, campo, _tupla(getattr(self, campo)))
+        for campo in ("data_inicial", "data_final"):
+            object.__setattr__(self, campo, _timestamp(getattr(self, campo)))
+
+    def filtro(self, particionado=True):
+        """Expressão de filtro do recorte, ou None se não houver restrição.
+
+        No dataset particionado o período também restringe ano/mês, e as
+        partições fora dele são descartadas sem abrir os arquivos.
+        """
+        filtros = []
+        datas = ds.field("dt_emis_nf")
+        ano, mes = ds.field("ano"), ds.field("mes")
+        if self.data_inicial is not None:
+            inicio = self.data_inicial
+            filtros.append(datas >= pa.scalar(inicio, pa.timestamp("ns")))
+            if particionado:
+                filtros.append((ano > inicio.year) | ((ano == inicio.year) & (mes >= inicio.month)))
+        if self.data_final is not None:
+            fim = self.data_final
+            filtros.append(datas <= pa.scalar(fim, pa.timestamp("ns")))
+            if particionado:
+                filtros.append((ano < fim.year) | ((ano == fim.year) & (mes <= fim.month)))
+
+        if self.tipos_oper is not None:
+            filtros.append(ds.field("tipo_oper").isin(list(self.tipos_oper)))
+
+        marca = pc.utf8_upper(ds.field("marca").cast(pa.string()))
+        if self.marcas is not None:
+            filtros.append(marca.isin([m.upper() for m in self.marcas]))
+        if self.marcas_excluidas:
+            filtros.append(~marca.isin([m.upper() for m in self.marcas_excluidas]))
+
+        filtro = None
+        for expressao in filtros:
+            filtro = expressao if filtro is None else filtro & expressao
+        return filtro
+
+
+def _ordenada_por_data(tabela):
+    """Ordena pela data de emissão (datas vazias no fim), para o recorte por busca binária"""
+    if "dt_emis_nf" not in tabela.column_names:
+        return tabela
+    # Nulos já vão para o fim por padrão; o `null_placement` global está
+    # obsoleto no pyarrow 25 e a forma por chave não existe antes dele
+    return tabela.sort_by([("dt_emis_nf", "ascending")])
+
+
+def carregar(consulta=Consulta(), destino=DIRETORIO_DATASET):
+    """Lê o recorte descrito pela consulta como DataFrame ordenado por dt_emis_nf"""
+    if consulta.cubo:
+        if not dataset_existe(destino):
+            return pd.DataFrame()
+        arquivo = cubo_atualizado(destino)
+        if arquivo is not None:
+            cubo = ds.dataset(arquivo, format="parquet")
+            colunas = list(consulta.colunas or cubo.schema.names)
+            tabela = cubo.to_table(columns=colunas, filter=consulta.filtro(particionado=False))
+        else:
+            # Cubo ausente ou defasado: soma as linhas do recorte (a leitura não grava)
+            tabela = agregar(
+                ler_tabela(
+                    destino,
+                    colunas=DIMENSOES_CUBO + MEDIDAS_CUBO,
+                    filtro=consulta.filtro(base_particionada(destino)),
+                )
+            )
+            tabela = tabela.select(list(consulta.colunas or tabela.column_names))
+    else:
+        # item/desc_item são lidos pela chave da dimensão de itens
+        tabela = ler_tabela(
+            destino,
+            colunas=colunas_leitura(consulta.colunas, colunas_base(destino)),
+            filtro=consulta.filtro(base_particionada(destino)),
+        )
+        if tabela is None:
+            return pd.DataFrame()
+
+    return anexar_itens(_ordenada_por_data(tabela), consulta.colunas, destino).to_pandas()
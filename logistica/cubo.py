@@ -0,0 +1,162 @@
+"""Cubo diário pré-agregado da base do ESFT0100.
+
+Quase todos os cards e gráficos do faturamento são somas sobre data de
+emissão × marca × canal × tipo de operação. O cubo guarda essas somas
+(`vl_net_livro`, `quantidade` e o número de linhas) por dia e combinação de
+dimensões, mais o indicador `receita`. É montado na ingestão e gravado ao lado
+da base (`ESFT0100_cubo.parquet`, na pasta da geração); as páginas leem milhares de
+linhas em vez das linhas de nota.
+
+O arquivo registra nos metadados a versão da base de que foi derivado. A
+leitura nunca grava: se o cubo não corresponder à base (ou não existir), as
+páginas somam as linhas do recorte (`cubo_atualizado` devolve None), e a
+publicação da próxima geração o reconstrói (`garantir_cubo`).
+"""
+
+import uuid
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from logistica.armazenamento import (
+    ARQUIVO_LEGADO,
+    DIRETORIO_DATASET,
+    PARTICIONAMENTO,
+    base_particionada,
+    resolver,
+    versao_dataset,
+)
+
+DIMENSOES_CUBO = ["dt_emis_nf", "marca", "canal_venda_cliente", "tipo_oper", "receita"]
+MEDIDAS_CUBO = ["vl_net_livro", "quantidade"]
+
+# Número de linhas de nota somadas em cada célula do cubo
+COLUNA_LINHAS = "linhas"
+
+_SOMA = pc.ScalarAggregateOptions(min_count=0)
+
+
+def caminho_cubo(destino=DIRETORIO_DATASET):
+    """Arquivo do cubo ao lado da base (`<base>_cubo.parquet`), na geração lida"""
+    destino = resolver(destino)
+    return destino.with_name(f"{destino.name}_cubo.parquet")
+
+
+def agregar(tabela):
+    """Cubo de uma tabela de linhas de nota (ou de blocos dela)"""
+    agregada = tabela.select(DIMENSOES_CUBO + MEDIDAS_CUBO).group_by(DIMENSOES_CUBO).aggregate(
+        [(col, "sum", _SOMA) for col in MEDIDAS_CUBO]
+        + [(MEDIDAS_CUBO[0], "count", pc.CountOptions("all"))]
+    )
+    return agregada.rename_columns(DIMENSOES_CUBO + MEDIDAS_CUBO + [COLUNA_LINHAS])
+
+
+def combinar(cubos):
+    """Soma cubos parciais (de blocos ou partições) num cubo só"""
+    cubos = list(cubos)
+    if len(cubos) == 1:
+        return cubos[0]
+    juntos = pa.concat_tables(cubos, promote_options="permissive")
+    combinado = juntos.group_by(DIMENSOES_CUBO).aggregate(
+        [(col, "sum", _SOMA) for col in MEDIDAS_CUBO + [COLUNA_LINHAS]]
+    )
+    return combinado.rename_columns(DIMENSOES_CUBO + MEDIDAS_CUBO + [COLUNA_LINHAS])
+
+
+def gravar_cubo(cubo, destino=DIRETORIO_DATASET):
+    """Grava o cubo com a versão atual da base nos metadados (arquivo temporário + rename)"""
+    arquivo = caminho_cubo(destino)
+    metadados = dict(cubo.schema.metadata or {})
+    metadados[b"versao_base"] = (versao_dataset(destino) or "").encode()
+    cubo = cubo.replace_schema_metadata(metadados)
+
+    temporario = arquivo.with_name(f"{arquivo.name}.tmp-{uuid.uuid4().hex[:8]}")
+    try:
+        pq.write_table(cubo, temporario)
+        temporario.replace(arquivo)
+    finally:
+        temporario.unlink(missing_ok=True)
+
+
+def versao_cubo(destino=DIRETORIO_DATASET):
+    """Versão da base registrada no cubo, ou None se o cubo não existir"""
+    arquivo = caminho_cubo(destino)
+    if not arquivo.exists():
+        return None
+    metadados = pq.read_schema(arquivo).metadata or {}
+    return metadados.get(b"versao_base", b"").decode() or None
+
+
+def _dataset_base(destino):
+    if base_particionada(destino):
+        return ds.dataset(resolver(destino), format="parquet", partitioning=PARTICIONAMENTO)
+    return ds.dataset(ARQUIVO_LEGADO, format="parquet")
+
+
+def reconstruir_cubo(destino=DIRETORIO_DATASET):
+    """Monta o cubo lendo da base só as colunas de dimensões e medidas, lote a lote"""
+    base = _dataset_base(destino)
+    colunas = DIMENSOES_CUBO + MEDIDAS_CUBO
+    cubos = [agregar(pa.Table.from_batches([lote])) for lote in base.to_batches(columns=colunas)]
+    if not cubos:
+        cubos = [agregar(base.to_table(columns=colunas))]
+    gravar_cubo(combinar(cubos), destino)
+
+
+def atualizar_meses(particoes, destino=DIRETORIO_DATASET, versao_anterior=None):
+    """Recalcula no cubo só os meses (ano, mês) regravados por uma mesclagem incremental.
+
+    `versao_anterior` é a versão da base antes da mesclagem: se o cubo não
+    corresponder a ela, o cubo inteiro é reconstruído.
+    """
+    if versao_anterior is None or versao_cubo(destino) != versao_anterior:
+        reconstruir_cubo(destino)
+        return
+
+    ano, mes = ds.field("ano"), ds.field("mes")
+    filtro = None
+    for a, m in particoes:
+        if a is None:
+            expressao = ano.is_null() & mes.is_null()
+        else:
+            expressao = (ano == a) & (mes == m)
+        filtro = expressao if filtro is None else filtro | expressao
+
+    base = _dataset_base(destino)
+    novos = agregar(base.to_table(columns=DIMENSOES_CUBO + MEDIDAS_CUBO, filter=filtro))
+
+    # Remove do cubo atual os meses recalculados e junta os novos
+    cubo = pq.read_table(caminho_cubo(destino))
+    datas = cubo.column("dt_emis_nf")
+    chave_mes = pc.add(pc.multiply(pc.year(datas), 100), pc.month(datas))
+    meses = [a * 100 + m for a, m in particoes if a is not None]
+    remover = pc.is_in(chave_mes, value_set=pa.array(meses, chave_mes.type))
+    if any(a is None for a, _ in particoes):
+        remover = pc.or_kleene(remover, pc.is_null(datas))
+    mantidos = cubo.filter(pc.invert(remover))
+    gravar_cubo(
+        pa.concat_tables([mantidos.replace_schema_metadata(None), novos], promote_options="permissive"),
+        destino,
+    )
+
+
+def garantir_cubo(destino=DIRETORIO_DATASET):
+    """Reconstrói o cubo se ele não existir ou não corresponder à versão atual da base.
+
+    Grava: só para a geração em preparo, antes da publicação.
+    """
+    versao = versao_dataset(destino)
+    if versao is not None and versao_cubo(destino) != versao:
+        reconstruir_cubo(destino)
+    return caminho_cubo(destino)
+
+
+def cubo_atualizado(destino=DIRETORIO_DATASET):
+    """Arquivo do cubo se ele corresponder à versão da base, ou None (ausente ou defasado)"""
+    versao = versao_dataset(destino)
+    if versao is None or versao_cubo(destino) != versao:
+        return None
+    return caminho_cubo(destino)
+
@@ -0,0 +1,64 @@
+"""Detecção do formato das colunas de data do ESFT0100.
+
+Em vez de tentar cada formato sobre a coluna inteira, o formato é escolhido
+numa amostra pequena e a coluna é convertida uma única vez. Os formatos
+detectados ficam gravados por fonte (nome do export), e os próximos uploads
+da mesma fonte pulam a detecção.
+"""
+
+from pathlib import Path
+
+import pandas as pd
+
+from logistica.gravacao import gravar_json, ler_json, travado
+
+FORMATOS_DATA = ["%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y"]
+
+# Valores não nulos usados para escolher o formato
+TAMANHO_AMOSTRA = 500
+
+ARQUIVO_FORMATOS = Path("Datasets/ESFT/formatos_datas.json")
+
+
+def detectar_formato(serie, formatos=FORMATOS_DATA, tamanho_amostra=TAMANHO_AMOSTRA):
+    """Escolhe o formato que converte mais valores de uma amostra da coluna.
+
+    Retorna None se nenhum formato converter ao menos um valor.
+    """
+    valores = serie.dropna()
+    if valores.empty:
+        return None
+
+    # Amostra espalhada pela coluna, não só as primeiras linhas
+    passo = max(1, len(valores) // tamanho_amostra)
+    amostra = valores.iloc[::passo].iloc[:tamanho_amostra]
+
+    melhor_formato, melhor_total = None, 0
+    for fmt in formatos:
+        total = pd.to_datetime(amostra, format=fmt, errors="coerce").notna().sum()
+        if total > melhor_total:
+            melhor_formato, melhor_total = fmt, total
+    return melhor_formato
+
+
+def converter_coluna(serie, formato):
+    """Converte a coluna uma única vez e devolve também a máscara das linhas que falharam"""
+    if formato is None:
+        convertida = pd.to_datetime(serie, errors="coerce", dayfirst=True)
+    else:
+        convertida = pd.to_datetime(serie, format=formato, errors="coerce")
+    falhas = serie.notna() & convertida.isna()
+    return convertida, falhas
+
+
+def carregar_formatos(fonte):
+    """Formatos já detectados para a fonte, ou dicionário vazio"""
+    return dict(ler_json(ARQUIVO_FORMATOS, {}).get(fonte, {}))
+
+
+def salvar_formatos(fonte, formatos):
+    """Grava os formatos detectados da fonte, mantendo os das demais fontes"""
+    with travado(ARQUIVO_FORMATOS):
+        todos = ler_json(ARQUIVO_FORMATOS, {})
+        todos[fonte] = formatos
+        gravar_json(ARQUIVO_FORMATOS, todos)
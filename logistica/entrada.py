@@ -0,0 +1,76 @@
+"""Pasta de entrada do serviço de ingestão e o estado que ele publica.
+
+Só o necessário para as páginas conversarem com o serviço
+(`logistica.servico_ingestao`) sem importar o `watchdog`: entregar um
+arquivo enviado na pasta de entrada e ler o estado gravado pelo serviço
+(batimento, arquivo em processamento e última publicação).
+"""
+
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from logistica.gravacao import ler_json
+
+PASTA_ENTRADA = Path("Datasets/ESFT/entrada")
+SUBPASTA_INCREMENTAL = "incremental"
+ARQUIVO_ESTADO = Path("Datasets/ESFT/servico_ingestao.json")
+
+# Segundos entre batimentos; sem batimento por 3 intervalos o serviço é dado como parado
+INTERVALO_BATIMENTO = 5
+
+# Separa o nome original do sufixo único dado na entrega (`ESFT0100__1a2b3c4d.csv`)
+SEPARADOR_SUFIXO = "__"
+
+SUFIXOS_IGNORADOS = (".tmp", ".part", ".crdownload", "~")
+
+
+def estado_servico(arquivo=ARQUIVO_ESTADO):
+    """Estado gravado pelo serviço, ou None se ele nunca rodou"""
+    return ler_json(arquivo)
+
+
+def servico_ativo(estado=None):
+    """Se o serviço deu sinal de vida nos últimos três batimentos"""
+    estado = estado_servico() if estado is None else estado
+    if not estado or estado.get("parado"):
+        return False
+    return time.time() - estado.get("batimento", 0) < 3 * INTERVALO_BATIMENTO
+
+
+def ignorado(caminho):
+    """Arquivos ocultos, temporários ou que não são CSV"""
+    nome = Path(caminho).name
+    return (
+        nome.startswith(".")
+        or nome.lower().endswith(SUFIXOS_IGNORADOS)
+        or not nome.lower().endswith(".csv")
+    )
+
+
+def fonte_do_arquivo(caminho):
+    """Nome do export sem o sufixo da entrega (chave dos formatos de data)"""
+    return Path(caminho).stem.split(SEPARADOR_SUFIXO)[0]
+
+
+def entregar(arquivo, nome, incremental=False, pasta=PASTA_ENTRADA):
+    """Copia um arquivo enviado (objeto de arquivo) para a pasta de entrada do serviço.
+
+    Grava com nome oculto e renomeia no fim, para o serviço só ver o arquivo
+    completo. Devolve o caminho entregue.
+    """
+    pasta = Path(pasta) / SUBPASTA_INCREMENTAL if incremental else Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    nome = Path(nome)
+    final = pasta / f"{nome.stem}{SEPARADOR_SUFIXO}{uuid.uuid4().hex[:8]}{nome.suffix}"
+    temporario = pasta / f".{final.name}.tmp"
+    arquivo.seek(0)
+    try:
+        with open(temporario, "wb") as f:
+            shutil.copyfileobj(arquivo, f)
+        temporario.replace(final)
+    finally:
+        temporario.unlink(missing_ok=True)
+        arquivo.seek(0)
+    return final
@@ -0,0 +1,120 @@
+"""Definições do faturamento usadas pelo dashboard e pelo relatório em lote.
+
+Quais operações contam como faturamento, quais marcas ficam de fora, o
+cutoff editável por marca (`cutoff_marcas.json`) e a conta do faturamento
+líquido ficam aqui, sem Streamlit, para as páginas e a linha de comando
+chegarem aos mesmos números.
+"""
+
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from logistica.consulta import TIPO_DEVOLUCAO, Consulta
+from logistica.gravacao import gravar_json
+
+OPERACOES_FATURAMENTO = [
+    "1 - Receita",
+    "20 - Receita Revenda",
+    "2 - Receita Export",
+    "3 - Receita Rem Vend Futura",
+    "18 - Venda a ordem",
+]
+
+MARCAS_EXCLUIDAS = ["PORTO FELIZ", "METALIKA", "YALE"]
+
+# Marcas das seções de produtividade, Top itens e curva ABC
+MARCAS_DESEJADAS = ["PAPAIZ", "LA FONTE", "SILVANA", "VAULT"]
+
+# Colunas das linhas de nota usadas nas métricas de faturamento
+COLUNAS_NOTAS = [
+    "dt_emis_nf",
+    "tipo_oper",
+    "marca",
+    "canal_venda_cliente",
+    "nota_fiscal",
+    "item",
+    "quantidade",
+    "vl_net_livro",
+]
+
+ARQUIVO_CUTOFF = Path("cutoff_marcas.json")
+
+CUTOFF_PADRAO = {
+    "LA FONTE": {"cutoff_inicial": 0.0, "cutoff_final": 0.0},
+    "PAPAIZ": {"cutoff_inicial": 0.0, "cutoff_final": 0.0},
+    "SILVANA": {"cutoff_inicial": 0.0, "cutoff_final": 0.0},
+    "VAULT": {"cutoff_inicial": 0.0, "cutoff_final": 0.0},
+}
+
+
+def notas_faturamento(data_inicial=None, data_final=None):
+    """Linhas de nota das operações de faturamento no período"""
+    return Consulta(
+        colunas=COLUNAS_NOTAS,
+        tipos_oper=OPERACOES_FATURAMENTO,
+        marcas_excluidas=MARCAS_EXCLUIDAS,
+        data_inicial=data_inicial,
+        data_final=data_final,
+    )
+
+
+def cubo_faturamento(data_inicial=None, data_final=None):
+    """Somas diárias do cubo das operações de faturamento no período"""
+    return Consulta(
+        cubo=True,
+        tipos_oper=OPERACOES_FATURAMENTO,
+        marcas_excluidas=MARCAS_EXCLUIDAS,
+        data_inicial=data_inicial,
+        data_final=data_final,
+    )
+
+
+def cubo_devolucao(data_inicial=None, data_final=None):
+    """Somas diárias do cubo das devoluções no período"""
+    return Consulta(
+        cubo=True,
+        tipos_oper=[TIPO_DEVOLUCAO],
+        marcas_excluidas=MARCAS_EXCLUIDAS,
+        data_inicial=data_inicial,
+        data_final=data_final,
+    )
+
+
+def ler_cutoff(arquivo=ARQUIVO_CUTOFF):
+    """Cutoff por marca gravado ({marca: {cutoff_inicial, cutoff_final}}), ou o padrão"""
+    arquivo = Path(arquivo)
+    if not arquivo.exists():
+        return {marca: dict(valores) for marca, valores in CUTOFF_PADRAO.items()}
+    with open(arquivo, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def gravar_cutoff(cutoff, arquivo=ARQUIVO_CUTOFF):
+    """Grava o cutoff por marca (temporário + rename: quem lê vê o anterior ou o novo inteiro)"""
+    gravar_json(arquivo, cutoff)
+
+
+def cutoff_por_marca(marcas, cutoff):
+    """Cutoff inicial e final de cada marca (SILVANA CDSP usa o de SILVANA; sem cutoff = 0)"""
+    normalizadas = pd.Index(marcas).str.replace("SILVANA CDSP", "SILVANA", regex=False)
+    return pd.DataFrame(
+        {
+            coluna: [float(cutoff.get(marca, {}).get(coluna) or 0.0) for marca in normalizadas]
+            for coluna in ["cutoff_inicial", "cutoff_final"]
+        },
+        index=pd.Index(marcas, name="marca"),
+    )
+
+
+def calcular_faturamento_liquido(faturamento_marca, devolucao_marca, cutoff):
+    """Faturamento bruto + cutoff inicial - devoluções - cutoff final, por marca"""
+    devolucao_marca = devolucao_marca.reindex(faturamento_marca.index, fill_value=0)
+    valores = cutoff_por_marca(faturamento_marca.index, cutoff)
+    return (
+        faturamento_marca
+        + valores["cutoff_inicial"].to_numpy()
+        - devolucao_marca
+        - valores["cutoff_final"].to_numpy()
+    ).fillna(0)
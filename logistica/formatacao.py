@@ -0,0 +1,89 @@
+"""Formatação vetorizada de valores no padrão brasileiro ("R$ 1.234,56", "1.234").
+
+Os rótulos de gráficos são gerados para a coluna inteira de uma vez: o valor
+é arredondado em centavos com numpy e o texto (separador de milhar, vírgula
+decimal, prefixo) é montado com `pyarrow.compute`, sem formatar elemento a
+elemento em Python. As tabelas continuam numéricas e só são formatadas na
+exibição.
+
+O resultado é o mesmo de `f"{valor:,.2f}"` com os separadores trocados,
+inclusive no arredondamento; valores vazios viram "R$ 0,00" / "0".
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+def _como_array(valores):
+    """Valores como array float (vazios = NaN) e como devolver o resultado"""
+    if isinstance(valores, pd.Series):
+        return valores.to_numpy(dtype=float, na_value=np.nan), valores.index
+    if np.ndim(valores) == 0:
+        return np.array([np.nan if valores is None else valores], dtype=float), None
+    return pd.Series(valores).to_numpy(dtype=float, na_value=np.nan), False
+
+
+def _resultado(textos, indice):
+    """Texto único, array ou Series (de strings Arrow, sem criar objetos Python por linha)"""
+    if indice is None:
+        return textos[0].as_py()
+    if indice is False:
+        return textos.to_numpy(zero_copy_only=False)
+    return textos.to_pandas().set_axis(indice)
+
+
+def _agrupar_milhar(inteiros):
+    """Separador de milhar em inteiros não negativos ("1234567" -> "1.234.567").
+
+    Os números são completados com zeros até a mesma largura, cortados em
+    grupos de 3 dígitos nas mesmas posições e unidos por ponto; os zeros e
+    pontos à esquerda saem depois.
+    """
+    inteiros = np.asarray(inteiros, dtype=np.int64)
+    maior = int(inteiros.max()) if len(inteiros) else 0
+    quantidade_grupos = max(1, (len(str(maior)) + 2) // 3)
+
+    texto = pc.utf8_lpad(pc.cast(pa.array(inteiros), pa.string()), 3 * quantidade_grupos, "0")
+    grupos = [pc.utf8_slice_codeunits(texto, 3 * g, 3 * g + 3) for g in range(quantidade_grupos)]
+    agrupado = pc.utf8_ltrim(pc.binary_join_element_wise(*grupos, "."), characters="0.")
+    return pc.if_else(pa.array(inteiros == 0), "0", agrupado)
+
+
+def _centavos(valores):
+    """Valor absoluto em centavos, arredondado como o `format` do Python.
+
+    `x * 100` pode cair do lado errado de um empate ,5; só esses poucos casos
+    são conferidos com a formatação do Python.
+    """
+    escalado = np.abs(valores) * 100
+    centavos = np.rint(escalado)
+    duvidosos = np.flatnonzero(np.abs(escalado - np.floor(escalado) - 0.5) < 1e-6)
+    for i in duvidosos:
+        centavos[i] = int(f"{abs(valores[i]):.2f}".replace(".", ""))
+    return centavos.astype(np.int64)
+
+
+def formatar_moeda(valores, prefixo="R$ "):
+    """Valores em reais ("R$ 1.234,56"); aceita um número, uma lista/array ou uma Series"""
+    valores, indice = _como_array(valores)
+    valores = np.where(np.isnan(valores), 0.0, valores)
+    centavos = _centavos(valores)
+
+    sinal = pc.if_else(pa.array(np.signbit(valores)), "-", "")
+    fracao = pc.utf8_lpad(pc.cast(pa.array(centavos % 100), pa.string()), 2, "0")
+    textos = pc.binary_join_element_wise(
+        prefixo, sinal, _agrupar_milhar(centavos // 100), ",", fracao, ""
+    )
+    return _resultado(textos, indice)
+
+
+def formatar_inteiro(valores):
+    """Valores inteiros com separador de milhar ("1.234"), truncando as casas decimais"""
+    valores, indice = _como_array(valores)
+    inteiros = np.trunc(np.where(np.isnan(valores), 0.0, valores)).astype(np.int64)
+
+    sinal = pc.if_else(pa.array(inteiros < 0), "-", "")
+    textos = pc.binary_join_element_wise(sinal, _agrupar_milhar(np.abs(inteiros)), "")
+    return _resultado(textos, indice)
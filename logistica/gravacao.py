@@ -0,0 +1,60 @@
+"""Gravação atômica dos arquivos de controle (JSON) e trava entre gravadores.
+
+Os arquivos pequenos que as páginas e o serviço de ingestão leem e gravam
+(manifesto das ingestões, formatos de data, cutoff, versão publicada da base)
+nunca são reescritos no lugar: `gravar_json` grava um temporário na mesma
+pasta e renomeia por cima, e quem lê vê o arquivo antigo ou o novo inteiro.
+
+Quem lê, altera e grava de volta (o manifesto acrescenta uma entrada, os
+formatos uma fonte) faz isso dentro de `travado(arquivo)`, uma trava de
+arquivo (`flock`) que vale entre threads e entre processos. Só gravadores
+esperam por ela: a leitura nunca trava.
+"""
+
+import json
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre gravadores, só a gravação atômica
+    fcntl = None
+
+
+def gravar_json(arquivo, dados):
+    """Grava o JSON num temporário e renomeia (leitores nunca veem o arquivo pela metade)"""
+    arquivo = Path(arquivo)
+    arquivo.parent.mkdir(parents=True, exist_ok=True)
+    temporario = arquivo.with_name(f"{arquivo.name}.tmp-{uuid.uuid4().hex[:8]}")
+    try:
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False, indent=2)
+        temporario.replace(arquivo)
+    finally:
+        temporario.unlink(missing_ok=True)
+
+
+def ler_json(arquivo, padrao=None):
+    """Conteúdo do JSON, ou `padrao` se o arquivo não existir ou estiver inválido"""
+    try:
+        with open(arquivo, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return padrao
+
+
+@contextmanager
+def travado(arquivo):
+    """Trava exclusiva de gravação do arquivo (`<arquivo>.trava`), entre threads e processos"""
+    trava = Path(arquivo)
+    trava = trava.with_name(f"{trava.name}.trava")
+    trava.parent.mkdir(parents=True, exist_ok=True)
+    with open(trava, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,514 @@
+"""Leitura e tratamento do arquivo ESFT0100.csv exportado do Datasul."""
+
+import csv
+import io
+import itertools
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from logistica.armazenamento import (
+    DIRETORIO_DATASET,
+    esquema_base,
+    gravar_dataset,
+    ler_tabela,
+    mesclar_delta,
+    versao_dataset,
+)
+from logistica.categorias import COLUNAS_CATEGORICAS, converter_categorias
+from logistica.cubo import agregar, atualizar_meses, combinar, gravar_cubo
+from logistica.datas import (
+    FORMATOS_DATA,
+    carregar_formatos,
+    converter_coluna,
+    detectar_formato,
+    salvar_formatos,
+)
+from logistica.itens import COLUNA_CHAVE, gravar_itens, ler_itens, separar_base, separar_itens
+from logistica.manifesto import registrar_ingestao
+from logistica.numeros import converter_numeros_br
+from logistica.publicacao import nova_versao
+
+# Colunas esperadas no export
+COLUNAS_FAT = [
+    "Cod Estab", "Razao Social", "Cidade", "Estado", "Canal Venda Cliente",
+    "Dt Implant Ped", "Ped Cliente", "Ped Datasul", "Tipo Oper", "Serie",
+    "Nota Fiscal", "Natureza", "Dt Emis NF", "Dt Embarque", "Dt Aprov. Credito",
+    "Receita", "Item", "Desc Item", "Deposito", "Quantidade", "Vl Net Livro",
+    "Nro Embarque", "Marca", "Dt Entrega", "Situacao Ped"
+]
+
+COLUNAS_DATAS = [
+    "dt_implant_ped",
+    "dt_embarque",
+    "dt_aprov_credito",
+    "dt_emis_nf",
+    "dt_entrega",
+]
+
+COLUNAS_NUMERICAS = ["vl_net_livro", "quantidade"]
+
+# Formato do CSV exportado
+OPCOES_CSV = {"sep": ";", "encoding": "ISO-8859-1", "quotechar": '"'}
+
+# Motores de leitura do CSV
+MOTOR_PANDAS = "pandas"
+MOTOR_ARROW = "pyarrow"
+MOTORES_CSV = [MOTOR_PANDAS, MOTOR_ARROW]
+
+# Linhas lidas por bloco no modo streaming (motor pandas)
+TAMANHO_CHUNK = 200_000
+
+# Bytes lidos por bloco no modo streaming (motor pyarrow)
+TAMANHO_BLOCO_ARROW = 64 * 1024 * 1024
+
+# Valores inválidos guardados como exemplo no relatório de falhas
+EXEMPLOS_FALHA = 5
+
+
+# ==================== TRATAMENTOS ====================
+
+def normalizar_colunas(colunas):
+    """Converte nomes do export ("Dt Aprov. Credito") para o padrão interno ("dt_aprov_credito")"""
+    return (
+        pd.Index(colunas).str.lower()
+        .str.replace(" ", "_")
+        .str.replace(".", "", regex=False)
+    )
+
+def tentar_converter_datas(df, colunas_data, formatos=None):
+    """Converte colunas de data para datetime, uma única passada por coluna.
+
+    O formato de cada coluna vem de `formatos` (já detectado para a fonte) ou
+    é detectado numa amostra; o dicionário é atualizado com os formatos usados.
+    Retorna, por coluna, a máscara das linhas que não puderam ser convertidas.
+    """
+    if formatos is None:
+        formatos = {}
+    falhas = {}
+    for col in colunas_data:
+        # Motor pyarrow já entrega a coluna tipada
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            continue
+
+        formato = formatos.get(col)
+        if formato is None:
+            formato = detectar_formato(df[col])
+        convertida, mascara = converter_coluna(df[col], formato)
+
+        # Formato memorizado não converteu nada: o export mudou, detecta de novo
+        if col in formatos and convertida.isna().all() and mascara.any():
+            formato = detectar_formato(df[col])
+            convertida, mascara = converter_coluna(df[col], formato)
+
+        if formato is not None:
+            formatos[col] = formato
+        falhas[col] = mascara
+        df[col] = convertida
+    return falhas
+
+def preencher_domino(df, destino, fontes):
+    """Preenche valores nulos em cascata"""
+    for fonte in fontes:
+        if fonte in df.columns:
+            df[destino] = df[destino].combine_first(df[fonte])
+    return df
+
+def _registrar_falhas(falhas, originais, mascaras):
+    """Acumula contagem e exemplos dos valores que não puderam ser convertidos"""
+    for col, mascara in mascaras.items():
+        total = int(mascara.sum())
+        if not total:
+            continue
+        registro = falhas.setdefault(col, {"linhas": 0, "exemplos": []})
+        registro["linhas"] += total
+        faltam = EXEMPLOS_FALHA - len(registro["exemplos"])
+        if faltam > 0:
+            registro["exemplos"] += originais[col][mascara].head(faltam).tolist()
+
+def processar_dados_upload(df, formatos_datas=None, falhas=None):
+    """Aplica todos os tratamentos necessários nos dados.
+
+    `formatos_datas` recebe/atualiza os formatos de data por coluna e
+    `falhas`, se informado, acumula as datas e valores que falharam na conversão.
+    """
+
+    # Normalizar nomes das colunas
+    df.columns = normalizar_colunas(df.columns)
+
+    # Converter série para string
+    if "serie" in df.columns:
+        df["serie"] = df["serie"].astype(str).str.strip()
+
+    # Converter datas
+    colunas_presentes = [col for col in COLUNAS_DATAS if col in df.columns]
+    originais = df[colunas_presentes].copy() if falhas is not None else None
+    mascaras = tentar_converter_datas(df, colunas_presentes, formatos_datas)
+    if falhas is not None:
+        _registrar_falhas(falhas, originais, mascaras)
+
+    # Preenchimento em cascata das datas
+    if set(["dt_aprov_credito", "dt_implant_ped"]).issubset(df.columns):
+        preencher_domino(df, "dt_aprov_credito", ["dt_implant_ped"])
+
+    if set(["dt_entrega", "dt_aprov_credito", "dt_implant_ped"]).intersection(df.columns):
+        preencher_domino(df, "dt_entrega", ["dt_aprov_credito", "dt_implant_ped"])
+
+    if set(["dt_emis_nf", "dt_embarque"]).issubset(df.columns):
+        preencher_domino(df, "dt_emis_nf", ["dt_embarque"])
+
+    # Preencher valores nulos
+    df.fillna({
+        "canal_venda_cliente": "Desconhecido",
+        "ped_cliente": "Sem Pedido",
+        "deposito": "Não Informado",
+        "nro_embarque": "Sem Embarque",
+    }, inplace=True)
+
+    # Converter receita para boolean
+    if "receita" in df.columns:
+        df["receita"] = (
+            df["receita"]
+            .astype(str)
+            .str.strip()
+            .str.lower()
+            .map({"sim": True, "não": False})
+            .astype(bool)
+        )
+
+    # Converter valores numéricos (formato brasileiro, células inválidas viram NaN)
+    for col in COLUNAS_NUMERICAS:
+        if col in df.columns:
+            valores, invalidos = converter_numeros_br(df[col])
+            if falhas is not None:
+                _registrar_falhas(falhas, {col: df[col]}, {col: invalidos})
+            df[col] = valores.abs()
+
+    # Limpar marcas
+    if "marca" in df.columns:
+        indesejadas = {"?", "METALIKA", "MTK CD SP", "PAPAIZ SOR", "YALE"}
+        df = df[~df["marca"].isin(indesejadas)].copy()
+        df["marca"] = df["marca"].replace("SILVANA CDSP", "SILVANA")
+
+    # Colunas de poucos valores distintos viram categorias (dicionário no Parquet)
+    converter_categorias(df)
+
+    return df
+
+
+# ==================== LEITURA E GRAVAÇÃO ====================
+
+def _rebobinar(arquivo):
+    """Volta o arquivo para o início (uploads do Streamlit são file-like)"""
+    if hasattr(arquivo, "seek"):
+        arquivo.seek(0)
+
+def _ler_csv_pandas(arquivo, **kwargs):
+    """Lê o CSV mantendo só as colunas esperadas, todas como texto.
+
+    Os tipos são definidos por `processar_dados_upload`; ler tudo como texto
+    evita que a inferência do pandas varie de um bloco para outro. Nota,
+    pedido, item e os demais identificadores ficam como texto, como no motor
+    pyarrow; bases gravadas com os tipos inferidos são convertidas por
+    `migrar_tipos` na primeira mesclagem.
+    """
+    return pd.read_csv(
+        arquivo,
+        usecols=lambda col: col in COLUNAS_FAT,
+        dtype=str,
+        **OPCOES_CSV,
+        **kwargs,
+    )
+
+def _colunas_cabecalho(arquivo):
+    """Lê só a linha de cabeçalho do CSV"""
+    if hasattr(arquivo, "read"):
+        _rebobinar(arquivo)
+        linha = arquivo.readline()
+        _rebobinar(arquivo)
+    else:
+        with open(arquivo, "rb") as f:
+            linha = f.readline()
+    texto = linha.decode(OPCOES_CSV["encoding"]) if isinstance(linha, bytes) else linha
+    leitor = csv.reader(
+        io.StringIO(texto), delimiter=OPCOES_CSV["sep"], quotechar=OPCOES_CSV["quotechar"]
+    )
+    return next(leitor, [])
+
+def esquema_csv(colunas, tipado=True):
+    """Tipos declarados das colunas do CSV para o motor pyarrow.
+
+    Com `tipado=True` datas e valores já saem convertidos do parser; caso
+    contrário tudo é lido como texto e convertido por `processar_dados_upload`.
+    """
+    tipos = {}
+    for col, nome in zip(colunas, normalizar_colunas(colunas)):
+        if tipado and nome in COLUNAS_DATAS:
+            tipos[col] = pa.timestamp("ns")
+        elif tipado and nome in COLUNAS_NUMERICAS:
+            tipos[col] = pa.float64()
+        else:
+            tipos[col] = pa.string()
+    return tipos
+
+def _opcoes_arrow(arquivo, tipado, tamanho_bloco=None):
+    """Monta as opções de leitura, parse e conversão do pyarrow.csv"""
+    cabecalho = _colunas_cabecalho(arquivo)
+    colunas = [col for col in COLUNAS_FAT if col in cabecalho]
+    if not colunas:
+        raise ValueError("Nenhuma coluna válida encontrada no arquivo!")
+
+    leitura = pacsv.ReadOptions(encoding=OPCOES_CSV["encoding"], use_threads=True)
+    if tamanho_bloco:
+        leitura.block_size = tamanho_bloco
+    parse = pacsv.ParseOptions(
+        delimiter=OPCOES_CSV["sep"], quote_char=OPCOES_CSV["quotechar"]
+    )
+    conversao = pacsv.ConvertOptions(
+        column_types=esquema_csv(colunas, tipado),
+        include_columns=colunas,
+        timestamp_parsers=FORMATOS_DATA,
+        decimal_point=",",
+        strings_can_be_null=True,
+    )
+    return {"read_options": leitura, "parse_options": parse, "convert_options": conversao}
+
+def _ler_csv_arrow(arquivo, tipado=True):
+    """Lê o CSV inteiro com o parser multi-thread do pyarrow"""
+    opcoes = _opcoes_arrow(arquivo, tipado)
+    return pacsv.read_csv(arquivo, **opcoes).to_pandas()
+
+def ler_csv(arquivo, motor=MOTOR_PANDAS):
+    """Lê o CSV inteiro com o motor escolhido.
+
+    No motor pyarrow, se alguma data ou valor não bater com o esquema
+    declarado, a leitura é refeita com essas colunas como texto.
+    """
+    if motor == MOTOR_ARROW:
+        try:
+            df = _ler_csv_arrow(arquivo, tipado=True)
+        except pa.ArrowInvalid:
+            _rebobinar(arquivo)
+            df = _ler_csv_arrow(arquivo, tipado=False)
+    else:
+        df = _ler_csv_pandas(arquivo)
+    return _ordenar_colunas(df)
+
+def blocos_csv(arquivo, motor=MOTOR_PANDAS, tamanho_chunk=TAMANHO_CHUNK, tipado=True):
+    """Gera o CSV em blocos de DataFrame com o motor escolhido"""
+    if motor == MOTOR_ARROW:
+        opcoes = _opcoes_arrow(arquivo, tipado, TAMANHO_BLOCO_ARROW)
+        for lote in pacsv.open_csv(arquivo, **opcoes):
+            yield _ordenar_colunas(lote.to_pandas())
+    else:
+        for chunk in _ler_csv_pandas(arquivo, chunksize=tamanho_chunk):
+            yield _ordenar_colunas(chunk)
+
+def _ordenar_colunas(df):
+    """Mantém as colunas esperadas na ordem de COLUNAS_FAT"""
+    colunas_validas = [col for col in COLUNAS_FAT if col in df.columns]
+    if not colunas_validas:
+        raise ValueError("Nenhuma coluna válida encontrada no arquivo!")
+    return df[colunas_validas]
+
+def esquema_processado(colunas):
+    """Esquema Arrow dos dados tratados, fixo para todas as gravações"""
+    campos = []
+    for col in colunas:
+        if col in COLUNAS_DATAS:
+            tipo = pa.timestamp("ns")
+        elif col in COLUNAS_NUMERICAS:
+            tipo = pa.float64()
+        elif col == "receita":
+            tipo = pa.bool_()
+        elif col in COLUNAS_CATEGORICAS:
+            tipo = pa.dictionary(pa.int32(), pa.string())
+        else:
+            tipo = pa.string()
+        campos.append(pa.field(col, tipo))
+    return pa.schema(campos)
+
+def _esquema_fixo(esquema):
+    """Esquema gravado com cada coluna no tipo de `esquema_processado` (a chave do item fica como está)"""
+    return pa.schema(
+        campo if campo.name == COLUNA_CHAVE else esquema_processado([campo.name]).field(0)
+        for campo in esquema
+    )
+
+def migrar_tipos(destino=DIRETORIO_DATASET):
+    """Regrava uma base cujas colunas fogem do esquema fixo da ingestão (uma vez).
+
+    Bases gravadas antes da leitura como texto guardam nota, pedido, natureza
+    etc. com o tipo inferido pelo pandas (inteiro ou float), e as gravadas
+    depois guardam texto. Uma mesclagem sobre elas deixaria partições de tipos
+    diferentes no mesmo dataset, então a base inteira é convertida antes.
+    """
+    esquema = esquema_base(destino)
+    if esquema is None:
+        return
+    fixo = _esquema_fixo(esquema)
+    if esquema.equals(fixo):
+        return
+    tabela = ler_tabela(destino).cast(fixo)
+    gravar_dataset([tabela], fixo, destino)
+
+def _para_tabela(df, esquema=None):
+    """Converte o DataFrame tratado para uma tabela Arrow com esquema fixo"""
+    if esquema is None:
+        esquema = esquema_processado(df.columns)
+    return pa.Table.from_pandas(df, schema=esquema, preserve_index=False)
+
+def _ultima_data(df):
+    if "dt_emis_nf" not in df.columns:
+        return pd.NaT
+    return df["dt_emis_nf"].max()
+
+def _ao_publicar(ingestao, resumo, destino):
+    """Registro da ingestão no manifesto, feito dentro da trava da publicação (None sem `ingestao`)"""
+    if ingestao is None:
+        return None
+    return lambda publicado: registrar_ingestao(
+        resumo=resumo, versao=publicado["versao"], destino=destino, **ingestao
+    )
+
+def processar_csv(
+    arquivo, destino=DIRETORIO_DATASET, motor=MOTOR_PANDAS, fonte=None, ingestao=None
+):
+    """Lê o CSV inteiro em memória, trata e publica uma geração nova com a base substituída.
+
+    Retorna um dicionário com o total de registros, a última data de emissão,
+    os formatos de data usados e as datas/valores que falharam na conversão.
+    Com `ingestao` (impressão digital, modo e nome do arquivo), a ingestão
+    entra no manifesto junto com a publicação.
+    """
+    formatos = carregar_formatos(fonte) if fonte else {}
+    falhas = {}
+    df = processar_dados_upload(ler_csv(arquivo, motor), formatos, falhas)
+    resumo = {
+        "registros": len(df),
+        "ultima_data": _ultima_data(df),
+        "formatos_datas": formatos,
+        "falhas": falhas,
+    }
+    ao_publicar = _ao_publicar(ingestao, resumo, destino)
+    with nova_versao(destino, copiar_base=False, ao_publicar=ao_publicar) as preparado:
+        tabela, dimensao = separar_itens(_para_tabela(df), ler_itens(preparado))
+        if dimensao is not None:
+            gravar_itens(dimensao, preparado)
+        gravar_dataset([tabela], tabela.schema, preparado)
+        gravar_cubo(agregar(tabela), preparado)
+    if fonte:
+        salvar_formatos(fonte, formatos)
+    return resumo
+
+def _gravar_blocos(blocos, destino, formatos):
+    """Trata cada bloco e grava na base à medida que é lido.
+
+    O cubo diário é somado e a dimensão de itens é estendida bloco a bloco;
+    os dois são gravados no final.
+    """
+    cubos = []
+    dimensao = ler_itens(destino)
+    resumo = {
+        "registros": 0,
+        "ultima_data": pd.NaT,
+        "formatos_datas": formatos,
+        "falhas": {},
+    }
+
+    def tabelas():
+        nonlocal dimensao
+        for bloco in blocos:
+            # Formatos detectados no primeiro bloco valem para os seguintes
+            df = processar_dados_upload(bloco, formatos, resumo["falhas"])
+            resumo["registros"] += len(df)
+            resumo["ultima_data"] = max(
+                (d for d in [resumo["ultima_data"], _ultima_data(df)] if pd.notna(d)),
+                default=pd.NaT,
+            )
+            tabela, dimensao = separar_itens(_para_tabela(df), dimensao)
+            cubos.append(agregar(tabela))
+            yield tabela
+
+    # O esquema da base vem do primeiro bloco tratado
+    iterador = tabelas()
+    primeira = next(iterador, None)
+    if primeira is None:
+        raise ValueError("Nenhuma coluna válida encontrada no arquivo!")
+    gravar_dataset(itertools.chain([primeira], iterador), primeira.schema, destino)
+    if dimensao is not None:
+        gravar_itens(dimensao, destino)
+    gravar_cubo(combinar(cubos), destino)
+    return resumo
+
+def processar_csv_em_chunks(
+    arquivo,
+    destino=DIRETORIO_DATASET,
+    tamanho_chunk=TAMANHO_CHUNK,
+    motor=MOTOR_PANDAS,
+    fonte=None,
+    ingestao=None,
+):
+    """Lê o CSV em blocos, trata cada bloco e grava aos poucos numa geração nova da base.
+
+    O pico de memória fica limitado ao tamanho do bloco, independente do
+    tamanho do arquivo. O resultado é o mesmo de `processar_csv`.
+    """
+    formatos = carregar_formatos(fonte) if fonte else {}
+    resumo = {}
+    ao_publicar = _ao_publicar(ingestao, resumo, destino)
+    with nova_versao(destino, copiar_base=False, ao_publicar=ao_publicar) as preparado:
+        try:
+            resumo.update(
+                _gravar_blocos(blocos_csv(arquivo, motor, tamanho_chunk), preparado, formatos)
+            )
+        except pa.ArrowInvalid:
+            # Esquema tipado não bateu em algum bloco: refaz lendo datas e valores como texto
+            _rebobinar(arquivo)
+            resumo.update(
+                _gravar_blocos(
+                    blocos_csv(arquivo, motor, tamanho_chunk, tipado=False), preparado, formatos
+                )
+            )
+    if fonte:
+        salvar_formatos(fonte, formatos)
+    return resumo
+
+def processar_csv_incremental(
+    arquivo, destino=DIRETORIO_DATASET, motor=MOTOR_PANDAS, fonte=None, ingestao=None
+):
+    """Mescla um CSV só com os dias recentes na base existente.
+
+    Linhas com a mesma chave de nota (nota, série, item, tipo de operação)
+    são substituídas, mesmo em outro mês; as demais são acrescentadas. Só os
+    meses presentes no arquivo e os que já tinham alguma das chaves dele são
+    regravados, na base e no cubo diário.
+    """
+    formatos = carregar_formatos(fonte) if fonte else {}
+    falhas = {}
+    df = processar_dados_upload(ler_csv(arquivo, motor), formatos, falhas)
+    resumo = {
+        "registros": len(df),
+        "ultima_data": _ultima_data(df),
+        "formatos_datas": formatos,
+        "falhas": falhas,
+    }
+
+    # Geração nova com hard links da vigente: só os meses tocados pelo delta são regravados
+    with nova_versao(destino, ao_publicar=_ao_publicar(ingestao, resumo, destino)) as preparado:
+        # Bases de tipos inferidos passam ao esquema fixo, e as com o texto do
+        # item nas linhas, à chave item_id
+        migrar_tipos(preparado)
+        separar_base(preparado)
+        tabela, dimensao = separar_itens(_para_tabela(df), ler_itens(preparado))
+        if dimensao is not None:
+            gravar_itens(dimensao, preparado)
+
+        versao_anterior = versao_dataset(preparado)
+        mesclagem = mesclar_delta(tabela, preparado)
+        atualizar_meses(mesclagem["particoes"], preparado, versao_anterior)
+        resumo.update(mesclagem)
+    if fonte:
+        salvar_formatos(fonte, formatos)
+    return resumo
@@ -0,0 +1,236 @@
+"""Medição por etapa de cada execução das páginas (tempo, linhas e memória).
+
+Cada rerun de uma página abre uma `Execucao`; cada etapa (upload, leitura,
+recortes, blocos de agregação, gráficos) é um bloco `with etapa(nome,
+entrada) as medicao`, com `medicao.saida(objeto)` para as linhas de saída, e
+registra o tempo de parede, as linhas de entrada e saída e a variação da
+memória residente do processo. O bloco encerra a etapa mesmo com exceção ou
+`st.stop`, e o aninhamento continua certo. Os registros da execução aparecem
+no painel de administração da barra lateral e vão para um log rotativo
+(`logs/instrumentacao.log`).
+
+Desligada, `etapa` devolve sempre o mesmo objeto vazio, sem medir nada: o
+custo é uma consulta a uma variável da thread por etapa. A execução atual é
+guardada por thread porque cada sessão do Streamlit roda o script na sua.
+Um fragmento reexecutado sozinho roda numa thread nova, sem o começo da
+página; `retomar_execucao` no início dele abre uma execução só para o
+fragmento (no rerun completo, continua a da página) e a guarda no estado da
+sessão, de onde o painel a mostra (`execucao_fragmento`).
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+import pandas as pd
+
+ARQUIVO_LOG = Path("logs/instrumentacao.log")
+TAMANHO_LOG = 1024 * 1024
+ARQUIVOS_LOG = 5
+
+# Variável de ambiente que liga a medição para todos os usuários
+VARIAVEL_AMBIENTE = "DASHBOARD_INSTRUMENTACAO"
+
+TAMANHO_PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+logger = logging.getLogger(__name__)
+
+_ATUAL = threading.local()
+_TRAVA_LOG = threading.Lock()
+
+
+def memoria_residente():
+    """Memória residente do processo em bytes (lida de /proc, no Linux), ou None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * TAMANHO_PAGINA
+    except OSError:
+        return None
+
+
+def linhas(objeto):
+    """Linhas de um DataFrame/Series/tabela Arrow, ou uma contagem já pronta (int)"""
+    if isinstance(objeto, int) and not isinstance(objeto, bool):
+        return objeto
+    if objeto is None or not hasattr(objeto, "__len__") or isinstance(objeto, (str, dict)):
+        return None
+    return len(objeto)
+
+
+def ligada_por_ambiente():
+    """Se a variável de ambiente liga a medição para todos"""
+    return os.environ.get(VARIAVEL_AMBIENTE, "").lower() in ("1", "sim", "true")
+
+
+def _configurar_log(arquivo=ARQUIVO_LOG):
+    """Acrescenta o handler rotativo ao logger do módulo (uma vez por processo)"""
+    with _TRAVA_LOG:
+        if any(isinstance(h, RotatingFileHandler) for h in logger.handlers):
+            return
+        Path(arquivo).parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            arquivo, maxBytes=TAMANHO_LOG, backupCount=ARQUIVOS_LOG, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+class Execucao:
+    """Registros das etapas de um rerun de uma página"""
+
+    def __init__(self, pagina):
+        self.pagina = pagina
+        self.id = uuid.uuid4().hex[:8]
+        self.inicio = time.perf_counter()
+        self.termino = None
+        self.registros = []
+        self.nivel = 0
+
+    def registrar(self, registro):
+        self.registros.append(registro)
+        self.termino = time.perf_counter()
+        logger.info(
+            "pagina=%s execucao=%s etapa=%r segundos=%.4f entrada=%s saida=%s memoria_mb=%s",
+            self.pagina,
+            self.id,
+            registro["etapa"],
+            registro["segundos"],
+            registro["linhas_entrada"],
+            registro["linhas_saida"],
+            registro["memoria_mb"],
+        )
+
+    @property
+    def segundos(self):
+        """Tempo do início do rerun até a última etapa registrada"""
+        return (self.termino or time.perf_counter()) - self.inicio
+
+    def tabela(self):
+        """Registros em ordem de término, com a etapa recuada pelo aninhamento"""
+        tabela = pd.DataFrame(
+            self.registros,
+            columns=["etapa", "nivel", "segundos", "linhas_entrada", "linhas_saida", "memoria_mb"],
+        )
+        tabela["etapa"] = [
+            " " * 4 * nivel + nome for nivel, nome in zip(tabela["nivel"], tabela["etapa"])
+        ]
+        return tabela.drop(columns="nivel")
+
+
+class Etapa:
+    """Uma etapa medida: começa ao ser criada e termina na saída do `with` (`fim`)"""
+
+    def __init__(self, execucao, nome, entrada=None):
+        self.execucao = execucao
+        self.nome = nome
+        self.linhas_entrada = linhas(entrada)
+        self.linhas_saida = None
+        self.nivel = execucao.nivel
+        execucao.nivel += 1
+        self._memoria = memoria_residente()
+        self._inicio = time.perf_counter()
+        self._encerrada = False
+
+    def saida(self, objeto):
+        """Guarda as linhas de saída e devolve o próprio objeto"""
+        self.linhas_saida = linhas(objeto)
+        return objeto
+
+    def fim(self, saida=None):
+        """Encerra a etapa (uma vez só) e registra a medição"""
+        if self._encerrada:
+            return
+        segundos = time.perf_counter() - self._inicio
+        if saida is not None:
+            self.saida(saida)
+        memoria = memoria_residente()
+        self._encerrada = True
+        self.execucao.nivel -= 1
+        self.execucao.registrar(
+            {
+                "etapa": self.nome,
+                "nivel": self.nivel,
+                "segundos": round(segundos, 4),
+                "linhas_entrada": self.linhas_entrada,
+                "linhas_saida": self.linhas_saida,
+                "memoria_mb": (
+                    None
+                    if memoria is None or self._memoria is None
+                    else round((memoria - self._memoria) / 1024**2, 1)
+                ),
+            }
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fim()
+        return False
+
+
+class _EtapaDesligada:
+    """Etapa que não mede nada (medição desligada)"""
+
+    def saida(self, objeto):
+        return objeto
+
+    def fim(self, saida=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+
+_DESLIGADA = _EtapaDesligada()
+
+
+def iniciar_execucao(pagina, ligada):
+    """Abre a execução do rerun atual (ou desliga a medição nele); devolve a Execucao ou None"""
+    if not ligada:
+        _ATUAL.execucao = None
+        return None
+    _configurar_log()
+    _ATUAL.execucao = Execucao(pagina)
+    return _ATUAL.execucao
+
+
+def _chave_fragmento(pagina):
+    return f"instrumentacao_fragmento_{pagina}"
+
+
+def retomar_execucao(pagina, ligada, estado=None):
+    """Execução para o início de um fragmento; devolve a Execucao ou None.
+
+    No rerun completo a thread já tem a execução da página, que continua; um
+    fragmento reexecutado sozinho roda numa thread nova e abre a sua, que
+    fica em `estado` (o `st.session_state`) para o painel mostrar.
+    """
+    if hasattr(_ATUAL, "execucao"):
+        return _ATUAL.execucao
+    execucao = iniciar_execucao(pagina, ligada)
+    if estado is not None:
+        estado[_chave_fragmento(pagina)] = execucao
+    return execucao
+
+
+def execucao_fragmento(estado, pagina):
+    """Última execução de um fragmento da página reexecutado sozinho, ou None"""
+    return estado.get(_chave_fragmento(pagina))
+
+
+def etapa(nome, entrada=None):
+    """Etapa medida na execução atual; sem execução ligada, um objeto que não faz nada"""
+    execucao = getattr(_ATUAL, "execucao", None)
+    if execucao is None:
+        return _DESLIGADA
+    return Etapa(execucao, nome, entrada)
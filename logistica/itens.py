@@ -0,0 +1,254 @@
+"""Dimensão de itens da base do ESFT0100.
+
+Código e descrição do item se repetiam como texto em todas as linhas de nota.
+Na ingestão eles vão para uma tabela de itens gravada ao lado da base
+(`ESFT0100_itens.parquet`, na pasta da geração: chave `item_id`, código,
+descrição e marca) e a base guarda só a chave inteira.
+
+As chaves são estáveis: cada ingestão reaproveita as chaves dos itens já
+conhecidos e acrescenta os novos no fim (descrição e marca ficam as mais
+recentes), de modo que a chave de uma linha gravada nunca muda de item. Na
+leitura, `item` volta como coluna de dicionário sobre a própria chave — no
+pandas, uma categoria cujos códigos são o `item_id`, sem texto por linha, e
+os groupbys por item trabalham nesses inteiros. A descrição só é juntada às
+linhas finais exibidas (Top N, curva ABC) por `descricoes_itens`.
+
+Bases gravadas antes da dimensão (com o texto nas linhas) continuam legíveis:
+a leitura deriva a tabela de itens em memória, sem gravar, e a próxima
+ingestão a grava na geração que publicar.
+"""
+
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from logistica.armazenamento import (
+    DIRETORIO_DATASET,
+    colunas_base,
+    gravar_dataset,
+    ler_tabela,
+    resolver,
+    versao_dataset,
+)
+
+COLUNA_CHAVE = "item_id"
+
+# Colunas de texto que saem das linhas de nota e ficam só na dimensão
+COLUNAS_TEXTO = ["item", "desc_item"]
+
+ESQUEMA_ITENS = pa.schema(
+    [
+        pa.field(COLUNA_CHAVE, pa.int32()),
+        pa.field("item", pa.string()),
+        pa.field("desc_item", pa.string()),
+        pa.field("marca", pa.string()),
+    ]
+)
+
+
+def caminho_itens(destino=DIRETORIO_DATASET):
+    """Arquivo da dimensão de itens ao lado da base (`<base>_itens.parquet`), na geração lida"""
+    destino = resolver(destino)
+    return destino.with_name(f"{destino.name}_itens.parquet")
+
+
+def _como_texto(tabela, coluna):
+    """Coluna como texto, ou nulos se a tabela não a tiver"""
+    if coluna not in tabela.column_names:
+        return pa.nulls(len(tabela), pa.string())
+    return pc.cast(tabela[coluna], pa.string())
+
+
+def atualizar_dimensao(tabela, dimensao=None):
+    """Dimensão com os itens da tabela de notas: novos no fim, descrição e marca atualizadas"""
+    recentes = (
+        pa.table({col: _como_texto(tabela, col) for col in ["item", "desc_item", "marca"]})
+        .filter(pc.is_valid(_como_texto(tabela, "item")))
+        .group_by("item", use_threads=False)
+        .aggregate([("desc_item", "last"), ("marca", "last")])
+        .rename_columns(["item", "desc_item", "marca"])
+        .to_pandas()
+        .set_index("item")
+    )
+
+    atual = (dimensao if dimensao is not None else ESQUEMA_ITENS.empty_table()).to_pandas()
+    atual = atual.set_index("item")[["desc_item", "marca"]]
+    novos = recentes.index.difference(atual.index, sort=False)
+    atual = pd.concat([atual, recentes.loc[novos]]) if len(novos) else atual
+    atual.update(recentes)
+
+    atual = atual.reset_index()
+    atual.insert(0, COLUNA_CHAVE, np.arange(len(atual), dtype=np.int32))
+    return pa.Table.from_pandas(atual, schema=ESQUEMA_ITENS, preserve_index=False)
+
+
+def separar_itens(tabela, dimensao=None):
+    """Troca `item`/`desc_item` da tabela de notas pela chave `item_id`.
+
+    Devolve a tabela de notas com a chave (na posição da coluna `item`) e a
+    dimensão atualizada com os itens da tabela.
+    """
+    if "item" not in tabela.column_names:
+        return tabela, dimensao
+    dimensao = atualizar_dimensao(tabela, dimensao)
+    chaves = pc.cast(
+        pc.index_in(_como_texto(tabela, "item"), value_set=dimensao["item"]), pa.int32()
+    )
+    tabela = tabela.set_column(tabela.column_names.index("item"), COLUNA_CHAVE, chaves)
+    if "desc_item" in tabela.column_names:
+        tabela = tabela.drop_columns(["desc_item"])
+    return tabela, dimensao
+
+
+def gravar_itens(dimensao, destino=DIRETORIO_DATASET):
+    """Grava a dimensão de itens (arquivo temporário + rename)"""
+    arquivo = caminho_itens(destino)
+    arquivo.parent.mkdir(parents=True, exist_ok=True)
+    temporario = arquivo.with_name(f"{arquivo.name}.tmp-{uuid.uuid4().hex[:8]}")
+    try:
+        pq.write_table(dimensao.cast(ESQUEMA_ITENS), temporario)
+        temporario.replace(arquivo)
+    finally:
+        temporario.unlink(missing_ok=True)
+
+
+# Dimensão lida e descrições por arquivo, valendo enquanto tamanho e mtime não mudarem
+_LIDAS = {}
+_TRAVA = threading.Lock()
+
+
+def _lida(destino):
+    """(tabela, descrições) da dimensão gravada, ou None se não houver arquivo"""
+    arquivo = caminho_itens(destino)
+    try:
+        info = arquivo.stat()
+    except FileNotFoundError:
+        return None
+    assinatura = (info.st_size, info.st_mtime_ns)
+    with _TRAVA:
+        guardada = _LIDAS.get(str(arquivo))
+    if guardada is not None and guardada[0] == assinatura:
+        return guardada[1]
+
+    tabela = pq.read_table(arquivo)
+    lida = (tabela, _descricoes(tabela))
+    with _TRAVA:
+        _LIDAS[str(arquivo)] = (assinatura, lida)
+    return lida
+
+
+def _descricoes(tabela):
+    """Descrição de cada item da dimensão, indexada pelo código"""
+    return pd.Series(
+        tabela["desc_item"].to_numpy(),
+        index=tabela["item"].to_numpy(),
+        name="desc_item",
+    )
+
+
+def _derivada(destino):
+    """(tabela, descrições) derivadas em memória das linhas de uma base sem dimensão, por versão"""
+    chave = f"{resolver(destino)}#derivada"
+    versao = versao_dataset(destino)
+    with _TRAVA:
+        guardada = _LIDAS.get(chave)
+    if guardada is not None and guardada[0] == versao:
+        return guardada[1]
+
+    tabela = atualizar_dimensao(ler_tabela(destino, colunas=["item", "desc_item", "marca"]))
+    lida = (tabela, _descricoes(tabela))
+    with _TRAVA:
+        _LIDAS[chave] = (versao, lida)
+    return lida
+
+
+def ler_itens(destino=DIRETORIO_DATASET):
+    """Dimensão de itens gravada (tabela Arrow), ou None se não houver"""
+    lida = _lida(destino)
+    return None if lida is None else lida[0]
+
+
+def garantir_itens(destino=DIRETORIO_DATASET):
+    """Grava a dimensão de itens derivada da base se ela ainda guardar o texto do item nas linhas.
+
+    Grava: só para a geração em preparo, antes da publicação.
+    """
+    if ler_itens(destino) is None and "item" in colunas_base(destino):
+        gravar_itens(atualizar_dimensao(ler_tabela(destino, colunas=["item", "desc_item", "marca"])), destino)
+
+
+def separar_base(destino=DIRETORIO_DATASET):
+    """Regrava uma base com o texto do item nas linhas usando a chave `item_id` (uma vez)"""
+    colunas = colunas_base(destino)
+    if "item" not in colunas or COLUNA_CHAVE in colunas:
+        return
+    tabela, dimensao = separar_itens(ler_tabela(destino), ler_itens(destino))
+    gravar_itens(dimensao, destino)
+    gravar_dataset([tabela], tabela.schema, destino)
+
+
+def colunas_leitura(colunas, gravadas):
+    """Colunas a ler da base para entregar `colunas`: `item`/`desc_item` saem de `item_id`"""
+    if colunas is None or COLUNA_CHAVE not in gravadas:
+        return colunas
+    lidas = [col for col in colunas if col not in COLUNAS_TEXTO]
+    if len(lidas) < len(colunas) and COLUNA_CHAVE not in lidas:
+        lidas.append(COLUNA_CHAVE)
+    return lidas
+
+
+def anexar_itens(tabela, colunas=None, destino=DIRETORIO_DATASET):
+    """Troca a chave `item_id` pelas colunas `item`/`desc_item` pedidas.
+
+    `item` vira uma coluna de dicionário sobre a chave (sem copiar texto);
+    `desc_item`, que pode repetir entre itens, é decodificada. Chaves ainda
+    ausentes da dimensão (gravação em andamento) ficam nulas.
+    """
+    if COLUNA_CHAVE not in tabela.column_names:
+        return tabela
+    if colunas is None:
+        colunas = []
+        for col in tabela.column_names:
+            colunas += COLUNAS_TEXTO if col == COLUNA_CHAVE else [col]
+
+    dimensao = ler_itens(destino)
+    if dimensao is None:
+        dimensao = ESQUEMA_ITENS.empty_table()
+    chaves = tabela[COLUNA_CHAVE].combine_chunks()
+    chaves = pc.if_else(pc.less(chaves, len(dimensao)), chaves, None)
+
+    for col in COLUNAS_TEXTO:
+        if col not in colunas:
+            continue
+        valores = dimensao[col].combine_chunks()
+        if col == "item":
+            coluna = pa.DictionaryArray.from_arrays(chaves, valores)
+        else:
+            coluna = pc.take(valores, chaves)
+        tabela = tabela.append_column(col, coluna)
+    return tabela.select(list(colunas))
+
+
+def descricoes_itens(destino=DIRETORIO_DATASET):
+    """Descrição de cada item indexada pelo código, para juntar às linhas exibidas.
+
+    Sem dimensão gravada, numa base com o texto do item nas linhas, as
+    descrições são derivadas delas em memória (a leitura não grava).
+    """
+    lida = _lida(destino)
+    if lida is None and "item" in colunas_base(destino):
+        lida = _derivada(destino)
+    if lida is None:
+        return pd.Series(dtype=object, name="desc_item")
+    return lida[1]
+
+
+def itens_com_descricao(texto, destino=DIRETORIO_DATASET):
+    """Códigos dos itens cuja descrição contém `texto` (sem diferenciar maiúsculas)"""
+    descricoes = descricoes_itens(destino)
+    return descricoes.index[descricoes.str.contains(texto, case=False, na=False)]
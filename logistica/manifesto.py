@@ -0,0 +1,78 @@
+"""Manifesto das ingestões já processadas.
+
+Cada upload é identificado pela impressão digital do conteúdo (hash do
+arquivo). O manifesto guarda, por impressão, o modo de atualização, a base
+(sempre o caminho lógico, nunca o de uma geração) e a versão publicada pela
+ingestão. Um arquivo já processado no mesmo modo não é processado de novo,
+mesmo que outra ingestão tenha publicado depois: os reruns do Streamlit com o
+arquivo ainda no uploader não trazem de volta um export antigo, e o upload e
+o serviço de ingestão reconhecem os arquivos um do outro.
+
+A entrada é gravada pela própria ingestão, dentro da trava que publica a
+geração (`nova_versao(..., ao_publicar=...)`), com a versão que ela publicou.
+"""
+
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from logistica.armazenamento import DIRETORIO_DATASET
+from logistica.gravacao import gravar_json, ler_json, travado
+
+ARQUIVO_MANIFESTO = Path("Datasets/ESFT/manifesto_ingestao.json")
+
+TAMANHO_BLOCO_HASH = 1024 * 1024
+
+
+def impressao_digital(arquivo):
+    """Hash do conteúdo do arquivo (caminho ou objeto de arquivo, que volta ao início)"""
+    assinatura = hashlib.blake2b(digest_size=16)
+    if isinstance(arquivo, (str, Path)):
+        with open(arquivo, "rb") as f:
+            for bloco in iter(lambda: f.read(TAMANHO_BLOCO_HASH), b""):
+                assinatura.update(bloco)
+        return assinatura.hexdigest()
+
+    arquivo.seek(0)
+    for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_HASH), b""):
+        assinatura.update(bloco)
+    arquivo.seek(0)
+    return assinatura.hexdigest()
+
+
+def carregar_manifesto():
+    """Entradas do manifesto por impressão digital, ou dicionário vazio"""
+    return ler_json(ARQUIVO_MANIFESTO, {})
+
+
+def ingestao_vigente(impressao, modo, destino=DIRETORIO_DATASET):
+    """Entrada da ingestão se o arquivo já foi processado no mesmo modo nessa base"""
+    entrada = carregar_manifesto().get(impressao)
+    if entrada is None:
+        return None
+    if entrada["modo"] != modo or entrada["destino"] != str(destino):
+        return None
+    return entrada
+
+
+def registrar_ingestao(impressao, modo, resumo, versao, nome=None, destino=DIRETORIO_DATASET):
+    """Grava no manifesto a ingestão recém-publicada, com a versão que ela publicou"""
+    ultima_data = resumo.get("ultima_data")
+    entrada = {
+        "nome": nome,
+        "modo": modo,
+        "destino": str(destino),
+        "versao": versao,
+        "processado_em": datetime.now().isoformat(timespec="seconds"),
+        "registros": int(resumo["registros"]),
+        "ultima_data": None if pd.isna(ultima_data) else str(ultima_data.date()),
+    }
+
+    # Duas ingestões terminando juntas não perdem a entrada uma da outra
+    with travado(ARQUIVO_MANIFESTO):
+        manifesto = carregar_manifesto()
+        manifesto[impressao] = entrada
+        gravar_json(ARQUIVO_MANIFESTO, manifesto)
+    return entrada
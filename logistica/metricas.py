@@ -0,0 +1,120 @@
+"""Camada de métricas nomeadas, calculadas uma vez e compartilhadas.
+
+Cada métrica (soma por marca, total, série diária, curva ABC...) é uma
+função sobre o recorte de uma `Consulta`. O resultado fica guardado por (versão da base,
+métrica, consulta): os vários cards e gráficos que usam a mesma métrica, nas
+duas páginas, recebem o mesmo resultado em vez de refazer o groupby. Como no
+cache de recortes, o descarte é só pela ordem de uso, de qualquer versão.
+"""
+
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from logistica.abc import CurvaABC
+from logistica.armazenamento import DIRETORIO_DATASET, versao_dataset
+from logistica.cache import carregar_em_cache
+from logistica.categorias import maiusculas
+from logistica.faturamento import MARCAS_DESEJADAS
+
+
+def _soma_por_marca(df):
+    return df.groupby("marca", observed=True)["vl_net_livro"].sum()
+
+
+def _soma_total(df):
+    return df["vl_net_livro"].sum()
+
+
+def _soma_diaria(df):
+    return df.groupby("dt_emis_nf", as_index=False)["vl_net_livro"].sum()
+
+
+def _soma_diaria_marca(df):
+    return df.groupby(["dt_emis_nf", "marca"], as_index=False, observed=True)["vl_net_livro"].sum()
+
+
+def _soma_canal_marca(df):
+    return (
+        df.groupby(["canal_venda_cliente", "marca"], observed=True)["vl_net_livro"]
+        .sum()
+        .reset_index()
+    )
+
+
+def _soma_por_canal(df):
+    return df.groupby("canal_venda_cliente", observed=True)["vl_net_livro"].sum().reset_index()
+
+
+def _curva_abc(df):
+    # Sem descrições: a curva é compartilhada; quem exibe usa `com_descricoes`
+    return CurvaABC(df[df["marca"].isin(MARCAS_DESEJADAS)])
+
+
+METRICAS = {
+    "soma_por_marca": _soma_por_marca,
+    "soma_total": _soma_total,
+    "soma_diaria": _soma_diaria,
+    "soma_diaria_marca": _soma_diaria_marca,
+    "soma_canal_marca": _soma_canal_marca,
+    "soma_por_canal": _soma_por_canal,
+    "curva_abc": _curva_abc,
+}
+
+# Limite de resultados guardados, de todas as versões (os usados há mais tempo saem primeiro)
+MAX_RESULTADOS = 512
+
+
+class CacheMetricas:
+    """Resultados das métricas por (versão, destino, métrica, consulta), com contadores"""
+
+    def __init__(self):
+        self._resultados = OrderedDict()
+        self._trava = threading.Lock()
+        self.calculos = 0
+        self.reaproveitados = 0
+
+    def obter(self, nome, consulta, destino=DIRETORIO_DATASET):
+        """Valor da métrica `nome` sobre o recorte da consulta"""
+        versao = versao_dataset(destino)
+        chave = (versao, str(destino), nome, consulta)
+        with self._trava:
+            if chave in self._resultados:
+                self._resultados.move_to_end(chave)
+                self.reaproveitados += 1
+                return _copia(self._resultados[chave])
+            self.calculos += 1
+
+        df = carregar_em_cache(consulta, destino)
+        df["marca"] = maiusculas(df["marca"])
+        resultado = METRICAS[nome](df)
+        with self._trava:
+            self._resultados[chave] = resultado
+            while len(self._resultados) > MAX_RESULTADOS:
+                self._resultados.popitem(last=False)
+        return _copia(resultado)
+
+    def estatisticas(self):
+        """Cálculos feitos, cálculos evitados e resultados guardados"""
+        with self._trava:
+            return {
+                "calculos": self.calculos,
+                "reaproveitados": self.reaproveitados,
+                "resultados": len(self._resultados),
+            }
+
+
+def _copia(resultado):
+    """Cópia rasa de Series/DataFrame, para quem recebe poder acrescentar colunas"""
+    if isinstance(resultado, (pd.Series, pd.DataFrame)):
+        return resultado.copy(deep=False)
+    return resultado
+
+
+METRICAS_CACHE = CacheMetricas()
+
+
+def metrica(nome, consulta, destino=DIRETORIO_DATASET):
+    """Valor da métrica `nome` sobre a consulta, pelo cache compartilhado do processo"""
+    return METRICAS_CACHE.obter(nome, consulta, destino)
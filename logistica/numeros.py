@@ -0,0 +1,95 @@
+"""Conversão vetorizada de números no formato brasileiro ("1.234,56").
+
+Toda a limpeza é feita com `pyarrow.compute` sobre a coluna inteira, sem
+trabalho de string por elemento em Python. Células que não representam um
+número são devolvidas como NaN e marcadas numa máscara, em vez de derrubar
+o upload.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Formato padrão do export: "1.234,56", "1234,56", "-0,5", "1234"
+_RE_PADRAO = r"^-?(\d{1,3}(\.\d{3})+|\d+)(,\d+)?$"
+# Só milhar, sem vírgula: "1.234", "12.345.678"
+_RE_MILHAR = r"^-?\d{1,3}(\.\d{3})+$"
+# Ponto decimal: "12.5"
+_RE_PONTO_DECIMAL = r"^-?\d+\.\d+$"
+
+
+def _converter_padrao(texto):
+    """Converte as células no formato padrão; as demais ficam nulas.
+
+    Com vírgula ou em grupos de 3 dígitos, os pontos são milhar e saem.
+    """
+    valido = pc.match_substring_regex(texto, _RE_PADRAO)
+    normalizado = pc.replace_substring(pc.replace_substring(texto, ".", ""), ",", ".")
+    valores = pc.cast(pc.if_else(valido, normalizado, None), pa.float64())
+    return (
+        valores.to_numpy(zero_copy_only=False, writable=True),
+        pc.fill_null(valido, False).to_numpy(zero_copy_only=False, writable=True),
+    )
+
+
+def _converter_especiais(texto):
+    """Trata as poucas células fora do padrão: "R$", espaços, sinal no fim e ponto decimal"""
+    limpo = pc.utf8_trim_whitespace(pc.replace_substring_regex(texto, r"R\$|\s", ""))
+
+    # Sinal depois do número ("1.234,56-")
+    negativo = pc.ends_with(limpo, "-")
+    limpo = pc.utf8_rtrim(limpo, "-")
+    sinal, vazio = pa.scalar("-", limpo.type), pa.scalar("", limpo.type)
+    limpo = pc.if_else(negativo, pc.binary_join_element_wise(sinal, limpo, vazio), limpo)
+
+    valores, valido = _converter_padrao(limpo)
+
+    # "12.5" (sem vírgula e fora dos grupos de milhar) é ponto decimal
+    ponto_decimal = pc.and_(
+        pc.match_substring_regex(limpo, _RE_PONTO_DECIMAL),
+        pc.invert(pc.match_substring_regex(limpo, _RE_MILHAR)),
+    )
+    ponto_decimal = pc.fill_null(ponto_decimal, False).to_numpy(zero_copy_only=False)
+    if ponto_decimal.any():
+        decimais = pc.cast(pc.filter(limpo, ponto_decimal), pa.float64())
+        valores[ponto_decimal] = decimais.to_numpy(zero_copy_only=False)
+        valido = valido | ponto_decimal
+
+    return valores, valido
+
+
+def converter_numeros_br(serie):
+    """Converte uma coluna de texto pt-BR para float.
+
+    Regras: com vírgula, os pontos são separadores de milhar; sem vírgula, os
+    pontos só são milhar se formarem grupos de 3 dígitos ("1.234"), senão são
+    decimais ("12.5"). Aceita "R$", espaços e sinal antes ou depois do número.
+
+    Retorna a série convertida e a máscara das células inválidas.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float), pd.Series(False, index=serie.index)
+
+    texto = pa.array(serie, from_pandas=True)
+    if isinstance(texto, pa.ChunkedArray):
+        texto = texto.combine_chunks()
+    if not pa.types.is_string(texto.type) and not pa.types.is_large_string(texto.type):
+        texto = pc.cast(texto, pa.string())
+
+    valores, valido = _converter_padrao(texto)
+
+    # Segunda passada só nas células não nulas que ficaram fora do padrão
+    invalido = pc.is_valid(texto).to_numpy(zero_copy_only=False, writable=True) & ~valido
+    pendentes = np.flatnonzero(invalido)
+    if len(pendentes):
+        especiais = texto.take(pendentes)
+        valores[pendentes], especiais_validos = _converter_especiais(especiais)
+        # Célula só com espaços conta como vazia, não como inválida
+        vazio = pc.equal(pc.utf8_trim_whitespace(especiais), "").to_numpy(zero_copy_only=False)
+        invalido[pendentes] = ~especiais_validos & ~vazio
+
+    return (
+        pd.Series(valores, index=serie.index, name=serie.name),
+        pd.Series(invalido, index=serie.index),
+    )
@@ -0,0 +1,38 @@
+"""Recorte por período sobre tabelas ordenadas pela data de emissão.
+
+As tabelas carregadas ficam ordenadas por `dt_emis_nf` (datas vazias no fim).
+Os limites do período são achados por busca binária e o recorte é uma fatia
+contígua (`iloc`), sem máscara booleana sobre a tabela inteira: mudar o
+período custa O(log n) mais o tamanho da fatia.
+
+As páginas leem da base janelas de meses inteiros (as partições) e fatiam o
+período exato; mudar os dias dentro dos mesmos meses não relê nada.
+"""
+
+import numpy as np
+import pandas as pd
+
+COLUNA_DATA = "dt_emis_nf"
+
+
+def fatiar_periodo(df, data_inicial=None, data_final=None, coluna=COLUNA_DATA):
+    """Linhas com data entre `data_inicial` e `data_final` (inclusivas).
+
+    `df` precisa estar ordenado pela coluna de data, com as datas vazias no
+    fim, como as tabelas devolvidas por `consulta.carregar`.
+    """
+    datas = df[coluna].to_numpy()
+    inicio = 0
+    fim = np.searchsorted(datas, np.datetime64("NaT"), side="left")
+    if data_inicial is not None:
+        inicio = np.searchsorted(datas[:fim], np.datetime64(pd.Timestamp(data_inicial)), side="left")
+    if data_final is not None:
+        fim = np.searchsorted(datas[:fim], np.datetime64(pd.Timestamp(data_final)), side="right")
+    return df.iloc[inicio:fim]
+
+
+def janela_mensal(data_inicial, data_final):
+    """Período estendido para meses inteiros: do dia 1 do mês inicial ao último dia do mês final"""
+    inicio = pd.Timestamp(data_inicial).to_period("M").start_time
+    fim = pd.Timestamp(data_final).to_period("M").end_time.normalize()
+    return inicio, fim
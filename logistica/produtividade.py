@@ -0,0 +1,87 @@
+"""Séries diárias de produtividade por marca sobre o calendário de dias úteis.
+
+Por dia e marca: embarques (notas fiscais únicas), peças e SKUs únicos,
+num groupby só. Para comparar equipes em vários períodos, embarques e peças
+de cada marca são acumulados na grade de dias do calendário: o total de
+qualquer período é a diferença de duas posições, e todos os períodos são
+calculados de uma vez com aritmética de arrays, sem reagrupar as notas.
+"""
+
+import numpy as np
+import pandas as pd
+
+from logistica.calendario import CALENDARIO
+
+METRICAS_DIARIAS = ["embarques", "pecas", "skus"]
+
+# Métricas que podem ser somadas entre dias (SKUs únicos não podem)
+METRICAS_ADITIVAS = ["embarques", "pecas"]
+
+
+def produtividade_diaria(df, calendario=CALENDARIO):
+    """Embarques, peças e SKUs por dia e marca, com o indicador `dia_util`"""
+    diaria = (
+        df.assign(dia=df["dt_emis_nf"].dt.normalize())
+        .groupby(["marca", "dia"], observed=True)
+        .agg(
+            embarques=("nota_fiscal", "nunique"),
+            pecas=("quantidade", "sum"),
+            skus=("item", "nunique"),
+        )
+        .reset_index()
+    )
+    diaria["dia_util"] = calendario.eh_util(diaria["dia"])
+    return diaria
+
+
+def por_funcionario(diaria, num_funcionarios):
+    """Série dos dias úteis com as métricas divididas pelo número de funcionários"""
+    uteis = diaria[diaria["dia_util"]].copy()
+    uteis[METRICAS_DIARIAS] = uteis[METRICAS_DIARIAS] / num_funcionarios
+    return uteis
+
+
+def comparar_periodos(diaria, periodos, num_funcionarios, calendario=CALENDARIO):
+    """Embarques e peças por funcionário por dia útil de cada marca em cada período.
+
+    `periodos` é uma lista de (data inicial, data final), inclusivas, e
+    `num_funcionarios` um número só ou um por período. Os totais incluem o
+    que foi faturado fora dos dias úteis, como nas médias do período. Dias
+    vazios ou fora da grade do calendário não entram em nenhum período.
+    """
+    marcas = pd.Index(diaria["marca"].unique()).sort_values()
+    codigos = marcas.get_indexer(diaria["marca"])
+    posicoes = calendario.posicao(diaria["dia"])
+    # `posicao` leva essas datas à borda (-1 ou len); somadas, inflariam o primeiro ou o último dia
+    na_grade = (posicoes >= 0) & (posicoes < len(calendario.dias)) & (codigos >= 0)
+    codigos, posicoes = codigos[na_grade], posicoes[na_grade]
+
+    inicios = np.array([inicio for inicio, _ in periodos], dtype="datetime64[D]")
+    fins = np.array([fim for _, fim in periodos], dtype="datetime64[D]")
+    primeiro = np.clip(calendario.posicao(inicios), 0, len(calendario.dias))
+    ultimo = np.clip(calendario.posicao(fins) + 1, 0, len(calendario.dias))
+    dias_uteis = calendario.dias_uteis(inicios, fins)
+    funcionarios = np.broadcast_to(np.asarray(num_funcionarios, dtype=float), len(periodos))
+
+    resultado = pd.DataFrame(
+        {
+            "data_inicial": np.repeat(inicios, len(marcas)),
+            "data_final": np.repeat(fins, len(marcas)),
+            "marca": np.tile(marcas.to_numpy(), len(periodos)),
+            "dias_uteis": np.repeat(dias_uteis, len(marcas)),
+            "funcionarios": np.repeat(funcionarios, len(marcas)),
+        }
+    )
+    divisor = np.maximum(resultado["dias_uteis"].to_numpy(), 1) * resultado["funcionarios"].to_numpy()
+    for metrica in METRICAS_ADITIVAS:
+        # Soma por marca × dia da grade e acumulado ao longo dos dias
+        grade = np.bincount(
+            codigos * len(calendario.dias) + posicoes,
+            weights=diaria[metrica].to_numpy(dtype=float)[na_grade],
+            minlength=len(marcas) * len(calendario.dias),
+        ).reshape(len(marcas), len(calendario.dias))
+        acumulado = np.concatenate([np.zeros((len(marcas), 1)), np.cumsum(grade, axis=1)], axis=1)
+        totais = (acumulado[:, ultimo] - acumulado[:, primeiro]).T.ravel()
+        resultado[metrica] = totais
+        resultado[f"{metrica}_por_funcionario"] = totais / divisor
+    return resultado
@@ -0,0 +1,140 @@
+"""Gerações da base: cada ingestão grava uma nova e a publica de uma vez.
+
+Nenhuma ingestão grava na base que as páginas estão lendo. `nova_versao`
+trava os gravadores (uma ingestão por vez, também entre processos),
+`preparar` cria uma geração em `ESFT0100_geracoes/` com hard links dos
+arquivos da vigente — base, dimensão de itens e cubo —, a ingestão grava
+nela como gravaria na base, e `publicar` troca o arquivo de versão
+(`ESFT0100_versao.json`, temporário + rename) para apontar a geração nova.
+Quem lê nunca espera pelo gravador: até o rename vê a geração anterior
+inteira, depois a nova inteira. Antes do rename, o cubo e a dimensão de itens
+que não correspondam à base são refeitos na geração, para a leitura nunca
+precisar gravar. Quem precisa registrar a publicação (o manifesto das
+ingestões) passa `ao_publicar`, chamado ainda dentro da trava, com a versão
+que acabou de ser publicada.
+
+Os gravadores da base nunca reescrevem um arquivo existente no lugar (gravam
+um arquivo novo e renomeiam ou apagam o antigo), então os hard links não
+alteram os arquivos da geração vigente. As gerações substituídas continuam no
+disco por `CARENCIA` segundos, para os reruns que as fixaram terminarem de
+ler, e são apagadas nas publicações seguintes, junto com as gerações de
+ingestões interrompidas.
+"""
+
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from logistica.armazenamento import (
+    DIRETORIO_DATASET,
+    arquivo_versao,
+    base_publicada,
+    pasta_geracoes,
+    versao_dataset,
+    versao_publicada,
+)
+from logistica.cubo import caminho_cubo, garantir_cubo
+from logistica.gravacao import gravar_json, travado
+from logistica.itens import caminho_itens, garantir_itens
+
+# Segundos que uma geração substituída fica no disco antes de ser apagada
+CARENCIA = 10 * 60
+
+
+def _vinculos(base):
+    """Arquivos avulsos que acompanham a base (dimensão de itens e cubo)"""
+    return [caminho_itens(base), caminho_cubo(base)]
+
+
+def preparar(destino=DIRETORIO_DATASET, copiar_base=True):
+    """Cria a geração nova, ainda não publicada; devolve o destino a passar para a ingestão.
+
+    Com `copiar_base` a geração começa com a base vigente (para mesclagens
+    incrementais); sem, só com a dimensão de itens e o cubo, para as chaves
+    dos itens continuarem as mesmas numa substituição completa.
+    """
+    destino = Path(destino)
+    atual = base_publicada(destino)
+    geracao = pasta_geracoes(destino) / f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    preparado = geracao / destino.name
+    geracao.mkdir(parents=True)
+    if copiar_base and atual.is_dir():
+        shutil.copytree(atual, preparado, copy_function=os.link)
+    for arquivo, copia in zip(_vinculos(atual), _vinculos(preparado)):
+        if arquivo.exists():
+            os.link(arquivo, copia)
+    return preparado
+
+
+def descartar(preparado):
+    """Remove uma geração não publicada (ingestão com erro)"""
+    shutil.rmtree(Path(preparado).parent, ignore_errors=True)
+
+
+def _remover(destino, geracao):
+    """Apaga uma geração substituída (None: a base de antes das gerações, no caminho lógico)"""
+    if geracao is not None:
+        shutil.rmtree(pasta_geracoes(destino) / geracao, ignore_errors=True)
+        return
+    shutil.rmtree(destino, ignore_errors=True)
+    for sufixo in ("_itens.parquet", "_cubo.parquet"):
+        destino.with_name(f"{destino.name}{sufixo}").unlink(missing_ok=True)
+
+
+def publicar(preparado, destino=DIRETORIO_DATASET):
+    """Aponta o arquivo de versão para a geração preparada e apaga as vencidas; devolve o registro"""
+    preparado, destino = Path(preparado), Path(destino)
+    agora = time.time()
+    anterior = versao_publicada(destino)
+    substituidas = [] if anterior is None else anterior["substituidas"]
+    if anterior is not None:
+        substituidas.append({"geracao": anterior["geracao"], "substituida_em": agora})
+    elif destino.exists():
+        substituidas.append({"geracao": None, "substituida_em": agora})
+
+    vencidas = [s for s in substituidas if agora - s["substituida_em"] > CARENCIA]
+    registro = {
+        "geracao": preparado.parent.name,
+        "versao": versao_dataset(preparado),
+        "publicada_em": datetime.now().isoformat(timespec="seconds"),
+        "substituidas": [s for s in substituidas if s not in vencidas],
+    }
+    gravar_json(arquivo_versao(destino), registro)
+
+    for substituida in vencidas:
+        _remover(destino, substituida["geracao"])
+    # Gerações de ingestões interrompidas (nunca publicadas)
+    conhecidas = {registro["geracao"]} | {s["geracao"] for s in registro["substituidas"]}
+    for pasta in pasta_geracoes(destino).iterdir():
+        if pasta.name not in conhecidas and agora - pasta.stat().st_mtime > CARENCIA:
+            shutil.rmtree(pasta, ignore_errors=True)
+    return registro
+
+
+@contextmanager
+def nova_versao(destino=DIRETORIO_DATASET, copiar_base=True, ao_publicar=None):
+    """Geração nova para uma ingestão gravar: preparada na entrada do bloco e publicada no fim.
+
+    Os gravadores esperam uns pelos outros, para cada ingestão partir da
+    geração publicada pela anterior. No fim do bloco, o cubo e a dimensão de
+    itens são completados na geração. Se o bloco levantar exceção, a geração
+    é descartada e a vigente continua valendo. `ao_publicar` recebe o
+    registro da publicação antes de a trava ser liberada.
+    """
+    destino = Path(destino)
+    with travado(arquivo_versao(destino)):
+        preparado = preparar(destino, copiar_base)
+        try:
+            yield preparado
+            garantir_itens(preparado)
+            garantir_cubo(preparado)
+        except BaseException:
+            descartar(preparado)
+            raise
+        registro = publicar(preparado, destino)
+        if ao_publicar is not None:
+            ao_publicar(registro)
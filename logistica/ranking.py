@@ -0,0 +1,55 @@
+"""Top-K de itens para qualquer agrupamento (geral, por marca, por canal...).
+
+Os totais por item são somados num groupby só, com cada grupo num bloco
+contíguo; em cada bloco os K maiores saem por seleção parcial
+(`np.partition`), sem ordenar todos os itens do grupo. Empates ficam na ordem
+em que o groupby devolve os itens, como `nlargest(keep="first")`.
+
+A descrição só é juntada aos itens escolhidos, pela tabela item -> desc_item
+da dimensão de itens (`itens.descricoes_itens`), sem merge com as linhas.
+"""
+
+import numpy as np
+
+
+def _maiores(valores, k):
+    """Posições dos `k` maiores valores, do maior para o menor (empates pela posição)"""
+    if k >= len(valores):
+        return np.argsort(-valores, kind="stable")
+    limiar = np.partition(valores, len(valores) - k)[len(valores) - k]
+    acima = np.flatnonzero(valores > limiar)
+    empatados = np.flatnonzero(valores == limiar)[: k - len(acima)]
+    escolhidos = np.sort(np.concatenate([acima, empatados]))
+    return escolhidos[np.argsort(-valores[escolhidos], kind="stable")]
+
+
+def top_itens(df, k, por=None, coluna="quantidade", descricoes=None):
+    """Os `k` itens de maior total de `coluna`, no geral ou em cada grupo de `por`.
+
+    Devolve as colunas de `por`, `item` (como texto) e `coluna`, com os grupos
+    em ordem e os itens do maior para o menor; com `descricoes` (de
+    `itens.descricoes_itens`) acrescenta `desc_item`.
+    """
+    por = [] if por is None else [por] if isinstance(por, str) else list(por)
+    totais = df.groupby([*por, "item"], observed=True)[coluna].sum().reset_index()
+
+    # Início de cada grupo (o groupby devolve os grupos ordenados e contíguos)
+    if por and len(totais):
+        mudou = np.zeros(len(totais), dtype=bool)
+        mudou[0] = True
+        for chave in por:
+            valores_chave = totais[chave].to_numpy()
+            mudou[1:] |= valores_chave[1:] != valores_chave[:-1]
+        inicios = np.flatnonzero(mudou)
+    else:
+        inicios = np.zeros(1 if len(totais) else 0, dtype=np.int64)
+    fins = np.append(inicios[1:], len(totais))
+
+    valores = totais[coluna].to_numpy(dtype=float)
+    posicoes = [inicio + _maiores(valores[inicio:fim], k) for inicio, fim in zip(inicios, fins)]
+    top = totais.iloc[np.concatenate(posicoes) if posicoes else []].reset_index(drop=True)
+
+    top["item"] = top["item"].astype(str)
+    if descricoes is not None:
+        top["desc_item"] = top["item"].map(descricoes)
+    return top
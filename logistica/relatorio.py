@@ -0,0 +1,308 @@
+"""Relatório em lote de vários períodos, sem Streamlit.
+
+Uso:
+    python -m logistica.relatorio --meses 2025-01:2025-12 --saida relatorios/2025
+    python -m logistica.relatorio --csv ESFT0100.csv --periodo 2025-06-01:2025-06-15
+
+Calcula para cada período as mesmas métricas do dashboard — faturamento
+bruto, devoluções, cutoff e faturamento líquido por marca, notas/SKUs/peças,
+indicadores per capita, Top itens e curva ABC — com as definições de
+`logistica.faturamento` e as camadas de métricas, ranking e ABC das páginas.
+Com `--csv` o arquivo passa antes pela mesma ingestão do upload
+(`processar_dados_upload`, em blocos).
+
+Os períodos são independentes e rodam em processos separados (um por núcleo,
+por padrão). Cada tabela sai num Parquet com as colunas `data_inicial` e
+`data_final` e os números gerais de cada período em `resumo.json`.
+"""
+
+import argparse
+import json
+import os
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from logistica.abc import CurvaABC
+from logistica.armazenamento import DIRETORIO_DATASET, limites_datas, resolver
+from logistica.calendario import CALENDARIO
+from logistica.categorias import maiusculas
+from logistica.consulta import carregar
+from logistica.faturamento import (
+    ARQUIVO_CUTOFF,
+    MARCAS_DESEJADAS,
+    calcular_faturamento_liquido,
+    cubo_devolucao,
+    cubo_faturamento,
+    cutoff_por_marca,
+    ler_cutoff,
+    notas_faturamento,
+)
+from logistica.ingestao import (
+    MOTOR_PANDAS,
+    MOTORES_CSV,
+    processar_csv_em_chunks,
+    processar_csv_incremental,
+)
+from logistica.itens import descricoes_itens
+from logistica.metricas import metrica
+from logistica.ranking import top_itens
+
+NUM_FUNCIONARIOS = 5
+TOP_N = 10
+LIMITE_A = 0.8
+LIMITE_B = 0.95
+
+ARQUIVO_RESUMO = "resumo.json"
+
+
+def periodos_mensais(mes_inicial, mes_final):
+    """(primeiro dia, último dia) de cada mês de `mes_inicial` a `mes_final`, inclusive"""
+    meses = pd.period_range(pd.Period(mes_inicial, "M"), pd.Period(mes_final, "M"), freq="M")
+    return [(mes.start_time, mes.end_time.normalize()) for mes in meses]
+
+
+def _intervalo(texto):
+    """Par (início, fim) de um texto "inicio:fim"; um valor só vale para os dois"""
+    inicio, _, fim = texto.partition(":")
+    return inicio, fim or inicio
+
+
+def _ceil(valor):
+    """Arredondamento para cima dos indicadores per capita (vazio = None no JSON)"""
+    return None if pd.isna(valor) else float(np.ceil(valor))
+
+
+def _indice_texto(serie):
+    """Series indexada por marca com o índice como texto (cubo e linhas juntam pela marca)"""
+    return serie.set_axis(serie.index.astype(str).rename("marca"))
+
+
+def calcular_periodo(
+    data_inicial,
+    data_final,
+    cutoff,
+    num_funcionarios=NUM_FUNCIONARIOS,
+    top_n=TOP_N,
+    limite_a=LIMITE_A,
+    limite_b=LIMITE_B,
+    destino=DIRETORIO_DATASET,
+):
+    """Métricas do período: (resumo geral, {nome da tabela: DataFrame})"""
+    data_inicial, data_final = pd.Timestamp(data_inicial), pd.Timestamp(data_final)
+    dias_uteis = max(CALENDARIO.dias_uteis(data_inicial, data_final), 1)
+
+    # 💰 Faturamento líquido por marca (cubo diário + cutoff editável)
+    faturamento_marca = _indice_texto(
+        metrica("soma_por_marca", cubo_faturamento(data_inicial, data_final), destino)
+    )
+    devolucao_marca = _indice_texto(
+        metrica("soma_por_marca", cubo_devolucao(data_inicial, data_final), destino)
+    )
+    cutoffs = cutoff_por_marca(faturamento_marca.index, cutoff)
+    marcas = pd.DataFrame(
+        {
+            "faturamento_bruto": faturamento_marca,
+            "devolucao": devolucao_marca.reindex(faturamento_marca.index, fill_value=0),
+            "cutoff_inicial": cutoffs["cutoff_inicial"],
+            "cutoff_final": cutoffs["cutoff_final"],
+            "faturamento_liquido": calcular_faturamento_liquido(
+                faturamento_marca, devolucao_marca, cutoff
+            ),
+        }
+    )
+
+    # 🛒 Notas, SKUs e peças por marca e indicadores per capita
+    notas = carregar(notas_faturamento(data_inicial, data_final), destino)
+    notas["marca"] = maiusculas(notas["marca"])
+    por_marca = notas.groupby("marca", observed=True).agg(
+        notas=("nota_fiscal", "nunique"),
+        skus=("item", "nunique"),
+        pecas=("quantidade", "sum"),
+    )
+    por_marca["embarques_por_funcionario_dia"] = np.ceil(
+        por_marca["notas"] / dias_uteis / num_funcionarios
+    )
+    por_marca["skus_per_capta"] = np.ceil(por_marca["skus"] / num_funcionarios)
+    por_marca["pecas_per_capta"] = np.ceil(por_marca["pecas"] / num_funcionarios)
+    por_marca.index = por_marca.index.astype(str).rename("marca")
+    marcas = marcas.join(por_marca, how="outer").reset_index()
+
+    # Totais per capita, Top itens e curva ABC só das marcas acompanhadas
+    desejadas = notas[notas["marca"].isin(MARCAS_DESEJADAS)]
+    descricoes = descricoes_itens(destino)
+    skus_por_embarque = desejadas.groupby("nota_fiscal", observed=True)["item"].nunique()
+
+    resumo = {
+        "data_inicial": data_inicial.date().isoformat(),
+        "data_final": data_final.date().isoformat(),
+        "dias_uteis": int(dias_uteis),
+        "funcionarios": num_funcionarios,
+        "faturamento_bruto": float(marcas["faturamento_bruto"].sum()),
+        "devolucao": float(marcas["devolucao"].sum()),
+        "cutoff_inicial": float(marcas["cutoff_inicial"].sum()),
+        "cutoff_final": float(marcas["cutoff_final"].sum()),
+        "faturamento_liquido": float(marcas["faturamento_liquido"].sum()),
+        "notas": int(marcas["notas"].sum()),
+        "pecas": float(desejadas["quantidade"].sum()),
+        "skus": int(desejadas["item"].nunique()),
+        "pecas_per_capta": _ceil(desejadas["quantidade"].sum() / num_funcionarios),
+        "skus_per_capta": _ceil(desejadas["item"].nunique() / num_funcionarios),
+        "media_skus_por_embarque": _ceil(skus_por_embarque.mean()),
+        "embarques_por_funcionario_dia": _ceil(
+            notas["nota_fiscal"].nunique() / dias_uteis / num_funcionarios
+        ),
+    }
+    tabelas = {
+        "marcas": marcas,
+        "top_itens": top_itens(desejadas, top_n, descricoes=descricoes),
+        "top_itens_marca": top_itens(desejadas, top_n, por="marca", descricoes=descricoes),
+        "curva_abc": CurvaABC(desejadas, descricoes=descricoes).tabela(limite_a, limite_b),
+    }
+    for tabela in tabelas.values():
+        tabela.insert(0, "data_inicial", data_inicial)
+        tabela.insert(1, "data_final", data_final)
+        if "marca" in tabela.columns:
+            tabela["marca"] = tabela["marca"].astype(str)
+    return resumo, tabelas
+
+
+def _calcular(argumentos):
+    """`calcular_periodo` com os argumentos numa tupla (para o pool de processos)"""
+    return calcular_periodo(*argumentos)
+
+
+def _gravar(arquivo, escrever):
+    """Grava pelo arquivo temporário + rename, para quem lê não ver arquivo pela metade"""
+    temporario = arquivo.with_name(f"{arquivo.name}.tmp-{uuid.uuid4().hex[:8]}")
+    try:
+        escrever(temporario)
+        temporario.replace(arquivo)
+    finally:
+        temporario.unlink(missing_ok=True)
+
+
+def gerar_relatorio(
+    periodos,
+    saida,
+    cutoff=None,
+    num_funcionarios=NUM_FUNCIONARIOS,
+    top_n=TOP_N,
+    limite_a=LIMITE_A,
+    limite_b=LIMITE_B,
+    destino=DIRETORIO_DATASET,
+    processos=None,
+):
+    """Calcula os períodos em paralelo e grava um Parquet por tabela e o `resumo.json`.
+
+    Devolve a lista de arquivos gravados.
+    """
+    cutoff = ler_cutoff() if cutoff is None else cutoff
+    # Todos os períodos (e processos) leem a mesma geração da base
+    destino = resolver(destino)
+    argumentos = [
+        (inicio, fim, cutoff, num_funcionarios, top_n, limite_a, limite_b, destino)
+        for inicio, fim in periodos
+    ]
+    processos = min(processos or os.cpu_count() or 1, max(len(argumentos), 1))
+    if processos == 1:
+        resultados = [_calcular(a) for a in argumentos]
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            resultados = list(executor.map(_calcular, argumentos))
+
+    saida = Path(saida)
+    saida.mkdir(parents=True, exist_ok=True)
+    gravados = []
+    for nome in ["marcas", "top_itens", "top_itens_marca", "curva_abc"]:
+        tabela = pd.concat([tabelas[nome] for _, tabelas in resultados], ignore_index=True)
+        arquivo = saida / f"{nome}.parquet"
+        _gravar(arquivo, lambda caminho: tabela.to_parquet(caminho, index=False))
+        gravados.append(arquivo)
+
+    arquivo = saida / ARQUIVO_RESUMO
+    resumos = [resumo for resumo, _ in resultados]
+    _gravar(
+        arquivo,
+        lambda caminho: caminho.write_text(
+            json.dumps(resumos, ensure_ascii=False, indent=2), encoding="utf-8"
+        ),
+    )
+    gravados.append(arquivo)
+    return gravados
+
+
+def _periodos_argumentos(args, destino):
+    """Períodos pedidos na linha de comando, ou todos os meses da base"""
+    periodos = []
+    for texto in args.meses or []:
+        periodos += periodos_mensais(*_intervalo(texto))
+    for texto in args.periodo or []:
+        inicio, fim = _intervalo(texto)
+        periodos.append((pd.Timestamp(inicio), pd.Timestamp(fim)))
+    if not periodos:
+        data_min, data_max = limites_datas(destino)
+        if data_min is None:
+            return []
+        periodos = periodos_mensais(data_min, data_max)
+    return periodos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--meses",
+        action="append",
+        help="mês (AAAA-MM) ou intervalo de meses (AAAA-MM:AAAA-MM); pode repetir",
+    )
+    parser.add_argument(
+        "--periodo",
+        action="append",
+        help="período exato (AAAA-MM-DD:AAAA-MM-DD); pode repetir",
+    )
+    parser.add_argument("--saida", type=Path, default=Path("relatorios"))
+    parser.add_argument("--destino", type=Path, default=DIRETORIO_DATASET)
+    parser.add_argument("--cutoff", type=Path, default=ARQUIVO_CUTOFF)
+    parser.add_argument("--funcionarios", type=int, default=NUM_FUNCIONARIOS)
+    parser.add_argument("--top", type=int, default=TOP_N)
+    parser.add_argument("--limite-a", type=float, default=LIMITE_A)
+    parser.add_argument("--limite-b", type=float, default=LIMITE_B)
+    parser.add_argument("--processos", type=int, default=None, help="padrão: um por núcleo")
+    parser.add_argument("--csv", type=Path, help="export ESFT0100 a ingerir antes do relatório")
+    parser.add_argument("--incremental", action="store_true", help="mescla o CSV na base existente")
+    parser.add_argument("--motor", choices=MOTORES_CSV, default=MOTOR_PANDAS)
+    args = parser.parse_args(argv)
+
+    if args.csv is not None:
+        ingerir = processar_csv_incremental if args.incremental else processar_csv_em_chunks
+        resumo = ingerir(args.csv, destino=args.destino, motor=args.motor, fonte=args.csv.stem)
+        print(f"{resumo['registros']} registros ingeridos de {args.csv}")
+
+    periodos = _periodos_argumentos(args, args.destino)
+    if not periodos:
+        print("Nenhum período para calcular: a base está vazia.", file=sys.stderr)
+        return 1
+
+    gravados = gerar_relatorio(
+        periodos,
+        args.saida,
+        cutoff=ler_cutoff(args.cutoff),
+        num_funcionarios=args.funcionarios,
+        top_n=args.top,
+        limite_a=args.limite_a,
+        limite_b=args.limite_b,
+        destino=args.destino,
+        processos=args.processos,
+    )
+    print(f"{len(periodos)} períodos calculados")
+    for arquivo in gravados:
+        print(f"  {arquivo}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
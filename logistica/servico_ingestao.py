@@ -0,0 +1,274 @@
+"""Serviço de ingestão em segundo plano: vigia uma pasta de entrada de exports.
+
+Uso:
+    python -m logistica.servico_ingestao [--pasta Datasets/ESFT/entrada] [--motor pyarrow]
+    python -m logistica.servico_ingestao --uma-vez
+
+Um export ESFT0100 colocado em `entrada/` substitui a base; em
+`entrada/incremental/`, é mesclado nela. O serviço (um processo só, fora do
+Streamlit) detecta o arquivo com o `watchdog`, espera o tamanho parar de
+mudar, ingere numa geração nova da base (`logistica.publicacao`) e a
+publica. As sessões abertas do dashboard continuam lendo a geração anterior
+sem esperar a ingestão e passam para a nova no próximo rerun. O arquivo vai
+depois para `processados/` (ou `erros/`, com o motivo ao lado) e a ingestão
+entra no manifesto, como as do upload.
+
+O estado do serviço (batimento, arquivo em processamento e última
+publicação) fica em `Datasets/ESFT/servico_ingestao.json`: com o serviço
+ativo, o upload da página só entrega o arquivo na pasta
+(`logistica.entrada`). Arquivos ocultos ou temporários (`.nome`, `*.tmp`,
+`*.part`) são ignorados: quem copia um export para a pasta deve gravá-lo com
+outro nome e renomear no fim.
+"""
+
+import argparse
+import queue
+import shutil
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from logistica.armazenamento import DIRETORIO_DATASET, versao_dataset
+from logistica.entrada import (
+    ARQUIVO_ESTADO,
+    INTERVALO_BATIMENTO,
+    PASTA_ENTRADA,
+    SUBPASTA_INCREMENTAL,
+    fonte_do_arquivo,
+    ignorado,
+)
+from logistica.gravacao import gravar_json
+from logistica.ingestao import (
+    MOTOR_PANDAS,
+    MOTORES_CSV,
+    processar_csv_em_chunks,
+    processar_csv_incremental,
+)
+from logistica.manifesto import impressao_digital, ingestao_vigente
+
+PASTA_PROCESSADOS = Path("Datasets/ESFT/processados")
+PASTA_ERROS = Path("Datasets/ESFT/erros")
+
+# Mesmos modos do upload da página (chave do manifesto)
+MODO_SUBSTITUIR = "Substituir base"
+MODO_INCREMENTAL = "Incremental (mesclar)"
+
+# Segundos com tamanho e mtime parados para o arquivo ser considerado completo
+ESTABILIDADE = 2.0
+
+
+def _esperar_estabilidade(caminho, estabilidade=ESTABILIDADE, intervalo=0.25):
+    """Espera tamanho e mtime pararem de mudar; False se o arquivo sumiu"""
+    anterior, parado_desde = None, time.monotonic()
+    while True:
+        try:
+            info = Path(caminho).stat()
+        except FileNotFoundError:
+            return False
+        atual = (info.st_size, info.st_mtime_ns)
+        if atual != anterior:
+            anterior, parado_desde = atual, time.monotonic()
+        elif time.monotonic() - parado_desde >= estabilidade:
+            return True
+        time.sleep(intervalo)
+
+
+def _mover(caminho, pasta):
+    """Move o arquivo para a pasta, com a data e hora na frente do nome"""
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    novo = pasta / f"{datetime.now():%Y%m%d-%H%M%S}_{Path(caminho).name}"
+    shutil.move(str(caminho), novo)
+    return novo
+
+
+class _Eventos(FileSystemEventHandler):
+    """Põe na fila os CSVs criados, movidos para a pasta ou fechados após escrita"""
+
+    def __init__(self, fila):
+        self.fila = fila
+
+    def _enfileirar(self, caminho):
+        if not ignorado(caminho):
+            self.fila.put(Path(caminho))
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._enfileirar(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._enfileirar(event.dest_path)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self._enfileirar(event.src_path)
+
+
+class ServicoIngestao:
+    """Ingere, um por vez, os exports que chegam na pasta de entrada"""
+
+    def __init__(
+        self,
+        pasta=PASTA_ENTRADA,
+        destino=DIRETORIO_DATASET,
+        motor=MOTOR_PANDAS,
+        estabilidade=ESTABILIDADE,
+    ):
+        self.pasta = Path(pasta)
+        self.destino = Path(destino)
+        self.motor = motor
+        self.estabilidade = estabilidade
+        self.fila = queue.Queue()
+        self._parar = threading.Event()
+        self._trava_estado = threading.Lock()
+        self._estado = {"processando": None, "ultima": None, "parado": False}
+
+    def _gravar_estado(self, **mudancas):
+        with self._trava_estado:
+            self._estado.update(mudancas)
+            self._estado["batimento"] = time.time()
+            gravar_json(ARQUIVO_ESTADO, self._estado)
+
+    def _batimentos(self):
+        while not self._parar.wait(INTERVALO_BATIMENTO):
+            self._gravar_estado()
+
+    def pendentes(self):
+        """CSVs já na pasta de entrada (chegados com o serviço parado), mais antigos primeiro"""
+        arquivos = [
+            caminho
+            for caminho in self.pasta.rglob("*")
+            if caminho.is_file() and not ignorado(caminho)
+        ]
+        return sorted(arquivos, key=lambda caminho: caminho.stat().st_mtime)
+
+    def modo(self, caminho):
+        """Incremental para arquivos da subpasta `incremental/`, substituição nos demais"""
+        relativo = Path(caminho).relative_to(self.pasta)
+        return MODO_INCREMENTAL if relativo.parts[0] == SUBPASTA_INCREMENTAL else MODO_SUBSTITUIR
+
+    def processar(self, caminho):
+        """Ingere e publica um arquivo; devolve o registro da ingestão (ou None se sumiu)"""
+        caminho = Path(caminho)
+        if not _esperar_estabilidade(caminho, self.estabilidade):
+            return None
+        modo = self.modo(caminho)
+        impressao = impressao_digital(caminho)
+        inicio = time.perf_counter()
+        self._gravar_estado(
+            processando={
+                "arquivo": caminho.name,
+                "modo": modo,
+                "desde": datetime.now().isoformat(timespec="seconds"),
+            }
+        )
+        try:
+            registro = ingestao_vigente(impressao, modo, self.destino)
+            if registro is None:
+                # A ingestão grava numa geração nova da base e a publica no
+                # fim, já com a entrada no manifesto
+                ingerir = (
+                    processar_csv_incremental
+                    if modo == MODO_INCREMENTAL
+                    else processar_csv_em_chunks
+                )
+                ingerir(
+                    caminho,
+                    destino=self.destino,
+                    motor=self.motor,
+                    fonte=fonte_do_arquivo(caminho),
+                    ingestao={
+                        "impressao": impressao,
+                        "modo": modo,
+                        "nome": fonte_do_arquivo(caminho) + ".csv",
+                    },
+                )
+                registro = ingestao_vigente(impressao, modo, self.destino)
+            _mover(caminho, PASTA_PROCESSADOS)
+        except Exception as erro:
+            destino_erro = _mover(caminho, PASTA_ERROS)
+            destino_erro.with_name(destino_erro.name + ".erro.txt").write_text(
+                f"{type(erro).__name__}: {erro}\n", encoding="utf-8"
+            )
+            self._gravar_estado(processando=None)
+            print(f"Erro ao ingerir {caminho.name}: {erro}", file=sys.stderr, flush=True)
+            return None
+
+        self._gravar_estado(
+            processando=None,
+            ultima={
+                "arquivo": caminho.name,
+                "modo": modo,
+                "registros": registro["registros"],
+                "versao": versao_dataset(self.destino),
+                "publicado_em": datetime.now().isoformat(timespec="seconds"),
+                "segundos": round(time.perf_counter() - inicio, 2),
+            },
+        )
+        print(f"{caminho.name}: {registro['registros']} registros publicados", flush=True)
+        return registro
+
+    def _consumir(self):
+        """Processa a fila até o serviço parar, ignorando eventos repetidos do mesmo arquivo"""
+        while not self._parar.is_set():
+            try:
+                caminho = self.fila.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if caminho.exists():
+                self.processar(caminho)
+
+    def executar(self, uma_vez=False):
+        """Processa o que já está na pasta e, sem `uma_vez`, vigia a pasta até Ctrl+C"""
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        (self.pasta / SUBPASTA_INCREMENTAL).mkdir(exist_ok=True)
+        if uma_vez:
+            for caminho in self.pendentes():
+                self.processar(caminho)
+            return
+
+        # SIGTERM (systemd, kill) encerra como o Ctrl+C, depois do arquivo em andamento
+        signal.signal(signal.SIGTERM, lambda *_: self._parar.set())
+        self._gravar_estado(parado=False)
+        batimentos = threading.Thread(target=self._batimentos, daemon=True)
+        batimentos.start()
+        observador = Observer()
+        observador.schedule(_Eventos(self.fila), str(self.pasta), recursive=True)
+        observador.start()
+        for caminho in self.pendentes():
+            self.fila.put(caminho)
+        print(f"Vigiando {self.pasta} (Ctrl+C para parar)", flush=True)
+        try:
+            self._consumir()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._parar.set()
+            observador.stop()
+            observador.join()
+            self._gravar_estado(parado=True, processando=None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pasta", type=Path, default=PASTA_ENTRADA)
+    parser.add_argument("--destino", type=Path, default=DIRETORIO_DATASET)
+    parser.add_argument("--motor", choices=MOTORES_CSV, default=MOTOR_PANDAS)
+    parser.add_argument("--estabilidade", type=float, default=ESTABILIDADE)
+    parser.add_argument(
+        "--uma-vez", action="store_true", help="processa o que está na pasta e termina"
+    )
+    args = parser.parse_args(argv)
+    ServicoIngestao(args.pasta, args.destino, args.motor, args.estabilidade).executar(args.uma_vez)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
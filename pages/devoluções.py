@@ -1,19 +1,4 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from babel.numbers import (
-    format_currency,
-)  # <-- coloca isso antes de usar format_currency
-import plotly.express as px
-from datetime import datetime, date
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
-import os
-import time
-from plyer import notification
-import plotly.graph_objects as go
-from pathlib import Path
 
 # ==================== VERIFICAÇÃO DE AUTENTICAÇÃO ====================
 
@@ -39,6 +24,28 @@ if not st.session_state.get('logado', False):
     
     st.stop()
 
+# 📦 Bibliotecas pesadas (pandas, pyarrow, Plotly) só com o usuário logado
+import pandas as pd
+import plotly.express as px
+
+from logistica.armazenamento import base_publicada, dataset_existe, limites_datas
+from logistica.cache import carregar_em_cache
+from logistica.categorias import maiusculas
+from logistica.consulta import TIPO_DEVOLUCAO, Consulta
+from logistica.faturamento import MARCAS_EXCLUIDAS
+from logistica.formatacao import formatar_moeda
+from logistica.instrumentacao import (
+    etapa,
+    execucao_fragmento,
+    iniciar_execucao,
+    ligada_por_ambiente,
+    retomar_execucao,
+)
+from logistica.itens import descricoes_itens, itens_com_descricao
+from logistica.metricas import metrica
+from logistica.periodo import fatiar_periodo, janela_mensal
+from logistica.ranking import top_itens
+
 # 🎯 Configuração inicial da página (após verificação de login)
 st.set_page_config(page_title="Logística Assa Abloy - Devoluções", page_icon="🎯", layout="wide")
 
@@ -58,6 +65,19 @@ with col_header2:
     if st.button("🏠 Página Principal", type="secondary", use_container_width=True):
         st.switch_page("Faturamento.py")
 
+# ⏱️ Medição por etapa deste rerun (o mesmo interruptor do dashboard principal)
+usuario_admin = st.session_state.get("usuario") == "admin"
+medicao_ligada = ligada_por_ambiente() or (
+    usuario_admin and st.session_state.get("instrumentacao_ligada", False)
+)
+execucao = iniciar_execucao("Devoluções", medicao_ligada)
+
+# 📌 Uma geração da base por rerun, guardada na sessão e passada como destino a
+# todas as leituras (e aos fragmentos, que reexecutam sozinhos): uma ingestão
+# publicada no meio do rerun só aparece no próximo
+st.session_state["base_fixada"] = base_publicada()
+base = st.session_state["base_fixada"]
+
 # ==================== FUNÇÕES DE TRATAMENTO DE DADOS ====================
 
 def processar_dados_devolucao(df):
@@ -84,25 +104,14 @@ def processar_dados_devolucao(df):
 
 # ==================== CARREGAMENTO DE DADOS ====================
 
-@st.cache_data
-def carregar_faturamento():
-    arquivo_parquet = Path("Datasets/ESFT/ESFT0100_atual.parquet")
-    if arquivo_parquet.exists():
-        return pd.read_parquet(arquivo_parquet)
-    else:
-        st.warning("⚠️ Nenhum arquivo de dados encontrado. Faça upload de um arquivo CSV no dashboard principal.")
-        return pd.DataFrame()
-
-df_devolucao = carregar_faturamento()
+# Obter datas mínima e máxima (estatísticas do Parquet, sem ler a base)
+data_min, data_max = limites_datas(base) if dataset_existe(base) else (None, None)
 
-if df_devolucao.empty:
+if data_min is None:
     st.warning("📁 **Nenhum dado disponível**")
     st.info("👆 Faça upload de um arquivo CSV no dashboard principal para começar")
     st.stop()
 
-# Aplicar tratamentos nos dados
-df_devolucao = processar_dados_devolucao(df_devolucao)
-
 # Tentar carregar cutoff (opcional)
 try:
     df_cutoff = pd.read_excel("Datasets/ESFT/Cuttoff.xlsx", skiprows=1)
@@ -110,27 +119,10 @@ except:
     df_cutoff = pd.DataFrame()
     st.sidebar.warning("⚠️ Arquivo de cutoff não encontrado")
 
-# Devolução
-df_devolucao = df_devolucao[df_devolucao["tipo_oper"] == "5 - Dev Venda"]
-
-# 🎯 Limpeza de Marcas
-marcas_excluidas = ["PORTO FELIZ", "METALIKA", "YALE"]
-
-# Normalize o nome das marcas para upper case
-df_devolucao["marca"] = df_devolucao["marca"].str.upper()
-
-# Remover marcas indesejadas
-df_devolucao = df_devolucao[~df_devolucao["marca"].isin(marcas_excluidas)]
-
 # 📅 Configuração de Datas
 st.sidebar.subheader("📅 Selecione um Período para Análise")
 
-# Garantir formato datetime nas datas
-df_devolucao["dt_emis_nf"] = pd.to_datetime(df_devolucao["dt_emis_nf"], errors="coerce")
-
-# Obter datas mínima e máxima
-data_min = df_devolucao["dt_emis_nf"].min().date()
-data_max = df_devolucao["dt_emis_nf"].max().date()
+data_min, data_max = data_min.date(), data_max.date()
 
 # Inputs do usuário para seleção de data
 data_inicial = st.sidebar.date_input(
@@ -144,26 +136,70 @@ data_final = st.sidebar.date_input(
 data_inicial = pd.to_datetime(data_inicial)
 data_final = pd.to_datetime(data_final)
 
-# 🔎 Filtragem por período
-df_filtrado = df_devolucao[
-    (df_devolucao["dt_emis_nf"] >= data_inicial)
-    & (df_devolucao["dt_emis_nf"] <= data_final)
-]
+# Linhas lidas em meses inteiros (ordenadas por data); o período exato é
+# recortado depois por busca binária
+inicio_janela, fim_janela = janela_mensal(data_inicial, data_final)
+
+# Devolução: só as devoluções do período, sem as marcas excluídas
+with etapa("leitura: devoluções") as medicao:
+    df_devolucao = carregar_em_cache(
+        Consulta(
+            colunas=[
+                "dt_emis_nf",
+                "marca",
+                "canal_venda_cliente",
+                "razao_social",
+                "receita",
+                "item",
+                "quantidade",
+                "vl_net_livro",
+            ],
+            tipos_oper=[TIPO_DEVOLUCAO],
+            marcas_excluidas=MARCAS_EXCLUIDAS,
+            data_inicial=inicio_janela,
+            data_final=fim_janela,
+        ),
+        base,
+    )
+    medicao.saida(df_devolucao)
 
-df_devolucao_filtrado = df_devolucao[
-    (df_devolucao["dt_emis_nf"] >= data_inicial)
-    & (df_devolucao["dt_emis_nf"] <= data_final)
-]
+# 🧊 Mesmo recorte do cubo usado no dashboard principal: as métricas de
+# devolução por marca/canal são compartilhadas entre as páginas
+consulta_cubo_devolucao = Consulta(
+    cubo=True,
+    tipos_oper=[TIPO_DEVOLUCAO],
+    marcas_excluidas=MARCAS_EXCLUIDAS,
+    data_inicial=data_inicial,
+    data_final=data_final,
+)
+
+# Aplicar tratamentos nos dados
+with etapa("tratamento: receita e marcas", df_devolucao) as medicao:
+    df_devolucao = processar_dados_devolucao(df_devolucao)
+
+    # Normalize o nome das marcas para upper case
+    df_devolucao["marca"] = maiusculas(df_devolucao["marca"])
+    medicao.saida(df_devolucao)
+
+# 🔎 Filtragem por período: uma fatia só (busca binária na tabela ordenada),
+# usada pelos gráficos e, depois do filtro de receita, pelos cards
+with etapa("recorte: período", df_devolucao) as medicao:
+    df_devolucao_filtrado = medicao.saida(
+        fatiar_periodo(df_devolucao, data_inicial, data_final)
+    )
+df_filtrado = df_devolucao_filtrado
 
 # 🎯 Filtro Receita - CORRIGIDO
 
 opcoes_receita = ["RECEITA SIM", "RECEITA NÃO", "AMBOS"]
 filtro_receita = st.sidebar.radio("Escolha o filtro de Receita", opcoes_receita)
 
-if filtro_receita == "RECEITA SIM":
-    df_filtrado = df_filtrado[df_filtrado["receita"] == True]
-elif filtro_receita == "RECEITA NÃO":
-    df_filtrado = df_filtrado[df_filtrado["receita"] == False]
+with etapa("recorte: receita", df_filtrado) as medicao:
+    if filtro_receita == "RECEITA SIM":
+        df_filtrado = df_filtrado[df_filtrado["receita"] == True]
+    elif filtro_receita == "RECEITA NÃO":
+        df_filtrado = df_filtrado[df_filtrado["receita"] == False]
+    medicao.saida(df_filtrado)
 # Se for "AMBOS", mantém o df_filtrado como está, sem alterações
 
 # 🔵 Cores por marca
@@ -181,39 +217,41 @@ cores_marca = {
 
 # --- Gráfico de Barras ---
 # Criar DataFrames agregados para devoluções por marca e canal
-devolucao_marca = df_devolucao_filtrado["marca"].value_counts().reset_index()
-devolucao_marca.columns = ["Marca", "Quantidade"]
+# Categorias sem devolução no período ficam de fora da contagem
+with etapa("agregação: devoluções por marca", df_devolucao_filtrado) as medicao:
+    devolucao_marca = (
+        df_devolucao_filtrado["marca"].value_counts().loc[lambda x: x > 0].reset_index()
+    )
+    devolucao_marca.columns = ["Marca", "Quantidade"]
 
 
-# Agrupar por marca e somar os valores das devoluções
-valor_devolucao_marca = (
-    df_devolucao_filtrado.groupby("marca")["vl_net_livro"].sum().reset_index()
-)
-valor_devolucao_marca.columns = ["Marca", "Valor Total"]
+    # Agrupar por marca e somar os valores das devoluções
+    valor_devolucao_marca = metrica("soma_por_marca", consulta_cubo_devolucao, base).reset_index()
+    valor_devolucao_marca.columns = ["Marca", "Valor Total"]
 
-# Ordenar para melhor visualização
-valor_devolucao_marca = valor_devolucao_marca.sort_values(
-    by="Valor Total", ascending=False
-)
+    # Ordenar para melhor visualização
+    valor_devolucao_marca = valor_devolucao_marca.sort_values(
+        by="Valor Total", ascending=False
+    )
 
-# Formatar os valores com símbolo de moeda
-valor_devolucao_marca["Valor Formatado"] = valor_devolucao_marca["Valor Total"].apply(
-    lambda x: format_currency(x, "BRL", locale="pt_BR")
-)
+    # Formatar os valores com símbolo de moeda
+    valor_devolucao_marca["Valor Formatado"] = formatar_moeda(valor_devolucao_marca["Valor Total"])
+    medicao.saida(valor_devolucao_marca)
 
 # Gráfico de barras com Plotly
-fig_valor = px.bar(
-    valor_devolucao_marca,
-    x="Marca",
-    y="Valor Total",
-    color="Marca",
-    text="Valor Formatado",
-    title="💸 Valor Total em Devoluções por Marca",
-    color_discrete_map=cores_marca,
-)
+with etapa("gráfico: valor por marca", valor_devolucao_marca):
+    fig_valor = px.bar(
+        valor_devolucao_marca,
+        x="Marca",
+        y="Valor Total",
+        color="Marca",
+        text="Valor Formatado",
+        title="💸 Valor Total em Devoluções por Marca",
+        color_discrete_map=cores_marca,
+    )
 
-fig_valor.update_traces(textposition="outside")
-fig_valor.update_layout(xaxis_title="Marca", yaxis_title="Valor (R$)", showlegend=False)
+    fig_valor.update_traces(textposition="outside")
+    fig_valor.update_layout(xaxis_title="Marca", yaxis_title="Valor (R$)", showlegend=False)
 
 # Exibir no Streamlit
 
@@ -231,292 +269,150 @@ valor_devolucao_marca["% Formatado"] = valor_devolucao_marca["Percentual"].apply
 )
 
 # 🍩 Gráfico de pizza com Plotly
-fig_pct = px.pie(
-    valor_devolucao_marca,
-    names="Marca",
-    values="Percentual",
-    title="📊 Percentual de Devolução por Marca (R$)",
-    color="Marca",
-    color_discrete_map=cores_marca,
-    hole=0.4,
-)
+with etapa("gráfico: percentual por marca", valor_devolucao_marca):
+    fig_pct = px.pie(
+        valor_devolucao_marca,
+        names="Marca",
+        values="Percentual",
+        title="📊 Percentual de Devolução por Marca (R$)",
+        color="Marca",
+        color_discrete_map=cores_marca,
+        hole=0.4,
+    )
 
-fig_pct.update_traces(textinfo="percent+label")
+    fig_pct.update_traces(textinfo="percent+label")
 
 # Mostrar no Streamlit
 
 
-graf1, graf2 = st.columns(2)
-with graf1:
-    st.subheader("💸 Valor Total em Devoluções por Marca")
-    st.plotly_chart(fig_valor, use_container_width=True)
-with graf2:
-    st.subheader("📊 Percentual de Devolução por Marca (R$)")
-    st.plotly_chart(fig_pct, use_container_width=True)
+with etapa("gráfico: exibição valor e percentual por marca"):
+    graf1, graf2 = st.columns(2)
+    with graf1:
+        st.subheader("💸 Valor Total em Devoluções por Marca")
+        st.plotly_chart(fig_valor, use_container_width=True)
+    with graf2:
+        st.subheader("📊 Percentual de Devolução por Marca (R$)")
+        st.plotly_chart(fig_pct, use_container_width=True)
 
 # Agrupar por canal de venda e somar os valores devolvidos
-devolucao_canal = (
-    df_devolucao_filtrado.groupby("canal_venda_cliente")["vl_net_livro"]
-    .sum()
-    .reset_index()
-)
+devolucao_canal = metrica("soma_por_canal", consulta_cubo_devolucao, base)
 devolucao_canal.columns = ["Canal de Venda", "Valor Total"]
 
 # Formatar valor com moeda (opcional, só pra tabela, se quiser)
-devolucao_canal["Valor Formatado"] = devolucao_canal["Valor Total"].apply(
-    lambda x: format_currency(x, "BRL", locale="pt_BR")
-)
+devolucao_canal["Valor Formatado"] = formatar_moeda(devolucao_canal["Valor Total"])
 
 # Gráfico de barras
-fig_canal = px.bar(
-    devolucao_canal,
-    x="Canal de Venda",
-    y="Valor Total",
-    text="Valor Formatado",
-    title="📦 Valor Total em Devoluções por Canal de Venda",
-    color="Canal de Venda",
-)
-
-fig_canal.update_traces(textposition="outside")
-fig_canal.update_layout(
-    xaxis_title="Canal de Venda", yaxis_title="Valor (R$)", showlegend=False
-)
-
-# Exibir no Streamlit
-st.subheader("📦 Devoluções por Canal de Venda")
-st.plotly_chart(fig_canal, use_container_width=True)
-
-
-#############
-
-# Criar coluna 'Ano-Mês' no DataFrame
-df_devolucao["Ano-Mês"] = df_devolucao["dt_emis_nf"].dt.to_period("M").astype(str)
-
-# Agrupar por marca e mês
-evolucao_mensal = (
-    df_devolucao.groupby(["Ano-Mês", "marca"])["vl_net_livro"].sum().reset_index()
-)
-
-# Gráfico de linha com Plotly
-fig_mensal = px.line(
-    evolucao_mensal,
-    x="Ano-Mês",
-    y="vl_net_livro",
-    color="marca",
-    title="📆 Evolução Mensal de Devoluções por Marca",
-    markers=True,
-    color_discrete_map=cores_marca,
-)
+with etapa("gráfico: valor por canal", devolucao_canal):
+    fig_canal = px.bar(
+        devolucao_canal,
+        x="Canal de Venda",
+        y="Valor Total",
+        text="Valor Formatado",
+        title="📦 Valor Total em Devoluções por Canal de Venda",
+        color="Canal de Venda",
+    )
 
-fig_mensal.update_layout(xaxis_title="Mês", yaxis_title="Valor Devolvido (R$)")
+    fig_canal.update_traces(textposition="outside")
+    fig_canal.update_layout(
+        xaxis_title="Canal de Venda", yaxis_title="Valor (R$)", showlegend=False
+    )
 
-# Mostrar no Streamlit
+    # Exibir no Streamlit
+    st.subheader("📦 Devoluções por Canal de Venda")
+    st.plotly_chart(fig_canal, use_container_width=True)
 
 
 #############
 
-# Agrupar por marca e data
-evolucao_dia = (
-    df_devolucao_filtrado.groupby(["dt_emis_nf", "marca"])["vl_net_livro"]
-    .sum()
-    .reset_index()
-)
-
-# Gráfico de linha com Plotly
-fig_diaria = px.line(
-    evolucao_dia,
-    x="dt_emis_nf",
-    y="vl_net_livro",
-    color="marca",
-    title="📅 Evolução Diária de Devoluções por Marca",
-    markers=True,
-    color_discrete_map=cores_marca,
-)
-
-fig_diaria.update_layout(xaxis_title="Data", yaxis_title="Valor Devolvido (R$)")
-
+def carregar_evolucao_mensal(destino):
+    """Devoluções por mês e marca em todo o histórico, a partir do cubo diário"""
+    df = carregar_em_cache(
+        Consulta(
+            cubo=True,
+            colunas=["dt_emis_nf", "marca", "vl_net_livro"],
+            tipos_oper=[TIPO_DEVOLUCAO],
+            marcas_excluidas=MARCAS_EXCLUIDAS,
+        ),
+        destino,
+    )
+    df["marca"] = maiusculas(df["marca"])
+
+    # Criar coluna 'Ano-Mês' no DataFrame
+    df["Ano-Mês"] = df["dt_emis_nf"].dt.to_period("M").astype(str)
+
+    # Agrupar por marca e mês
+    return df.groupby(["Ano-Mês", "marca"], observed=True)["vl_net_livro"].sum().reset_index()
+
+# 🧩 Abas em fragmento: trocar de aba reexecuta só esta seção (com medição
+# própria, aberta por `retomar_execucao`), e a evolução mensal (todo o
+# histórico) só é lida e montada com a aba aberta
+@st.fragment
+def secao_evolucao(df_devolucao_filtrado, destino):
+    """Abas de evolução diária (período) e mensal (histórico) das devoluções por marca"""
+    retomar_execucao("Devoluções", medicao_ligada, st.session_state)
+    tab1, tab2 = st.tabs(
+        [
+            "📅 Evolução Diária de Devoluções por Marca",
+            "📆 Evolução Mensal de Devoluções por Marca",
+        ],
+        key="abas_evolucao",
+        on_change="rerun",
+    )
+    if tab1.open:
+        with tab1:
+            # Agrupar por marca e data
+            evolucao_dia = (
+                df_devolucao_filtrado.groupby(["dt_emis_nf", "marca"], observed=True)["vl_net_livro"]
+                .sum()
+                .reset_index()
+            )
 
-tab1, tab2 = st.tabs(
-    [
-        "📅 Evolução Diária de Devoluções por Marca",
-        "📆 Evolução Mensal de Devoluções por Marca",
-    ]
-)
-with tab1:
-    st.subheader("📅 Evolução Diária de Devoluções por Marca")
-    st.plotly_chart(fig_diaria, use_container_width=True)
-with tab2:
-    st.subheader("📆 Evolução Mensal de Devoluções por Marca")
-    st.plotly_chart(fig_mensal, use_container_width=True)
+            # Gráfico de linha com Plotly
+            with etapa("gráfico: evolução diária", evolucao_dia):
+                fig_diaria = px.line(
+                    evolucao_dia,
+                    x="dt_emis_nf",
+                    y="vl_net_livro",
+                    color="marca",
+                    title="📅 Evolução Diária de Devoluções por Marca",
+                    markers=True,
+                    color_discrete_map=cores_marca,
+                )
+
+                fig_diaria.update_layout(xaxis_title="Data", yaxis_title="Valor Devolvido (R$)")
+
+                st.subheader("📅 Evolução Diária de Devoluções por Marca")
+                st.plotly_chart(fig_diaria, use_container_width=True)
+    if tab2.open:
+        with tab2:
+            evolucao_mensal = carregar_evolucao_mensal(destino)
+
+            # Gráfico de linha com Plotly
+            with etapa("gráfico: evolução mensal", evolucao_mensal):
+                fig_mensal = px.line(
+                    evolucao_mensal,
+                    x="Ano-Mês",
+                    y="vl_net_livro",
+                    color="marca",
+                    title="📆 Evolução Mensal de Devoluções por Marca",
+                    markers=True,
+                    color_discrete_map=cores_marca,
+                )
+
+                fig_mensal.update_layout(xaxis_title="Mês", yaxis_title="Valor Devolvido (R$)")
+
+                st.subheader("📆 Evolução Mensal de Devoluções por Marca")
+                st.plotly_chart(fig_mensal, use_container_width=True)
+
+
+with etapa("seção: evolução"):
+    secao_evolucao(df_devolucao_filtrado, base)
 
 st.subheader("📦 Devoluções por Marca")
 st.write(devolucao_marca)
 
 st.divider()  # Adiciona uma linha separadora
 
-# Criar DataFrames agregados para devoluções por marca e canal
-devolucao_marca = df_devolucao_filtrado["marca"].value_counts().reset_index()
-devolucao_marca.columns = ["Marca", "Quantidade"]
-
-devolucao_canal = (
-    df_devolucao_filtrado["canal_venda_cliente"].value_counts().reset_index()
-)
-devolucao_canal.columns = ["Canal de Venda", "Quantidade"]
-
-# 🥧 Gráfico de devolução por marca (estilo pizza)
-fig_marca_pizza = px.pie(
-    devolucao_marca,
-    names="Marca",
-    values="Quantidade",
-    title="🥧 Distribuição de Devoluções por Marca",
-    color_discrete_map=cores_marca,
-    hole=0.3,  # 👈 opcional: vira uma rosquinha 🍩
-)
-
-# ✨ Rótulos e layout
-fig_marca_pizza.update_traces(textinfo="label+percent+value", textfont_size=14)
-fig_marca_pizza.update_layout(
-    showlegend=True, margin=dict(t=50, b=30), template="plotly_white"
-)
-
-# Mostrar no Streamlit
-
-
-# 📊 Gráfico de devolução por canal de venda
-fig_canal = px.bar(
-    devolucao_canal,
-    x="Canal de Venda",
-    y="Quantidade",
-    title=" Quantidade de Devoluções por Canal de Venda",
-    text_auto=True,  # Mostra os valores nas barras
-    labels={"Quantidade": "Qtd. Devoluções"},
-    color="Canal de Venda",  # Cor individual por canal
-    color_discrete_sequence=px.colors.sequential.Greens_r,
-    height=500,
-)
-
-# ✨ Ajustes finos
-fig_canal.update_traces(textposition="outside")
-fig_canal.update_layout(
-    xaxis_tickangle=45,
-    yaxis_title="Quantidade",
-    xaxis_title=None,
-    showlegend=False,
-    template="plotly_white",
-    margin=dict(t=50, b=30),
-)
-
-# 💸 Agrupar valor total devolvido por marca
-valor_devolucao_marca = (
-    df_devolucao_filtrado.groupby("marca")["vl_net_livro"]
-    .sum()
-    .reset_index()
-    .rename(columns={"marca": "Marca", "vl_net_livro": "Valor Devolvido"})
-)
-# 👑 Formatar os valores em R$
-valor_devolucao_marca["Valor Formatado"] = valor_devolucao_marca[
-    "Valor Devolvido"
-].apply(lambda x: format_currency(x, "BRL", locale="pt_BR"))
-# ✅ Adicionar linha com o total geral
-total_geral = valor_devolucao_marca["Valor Devolvido"].sum()
-linha_total = pd.DataFrame([{"Marca": "TOTAL", "Valor Devolvido": total_geral}])
-# Criar linha total
-total_geral = valor_devolucao_marca["Valor Devolvido"].sum()
-linha_total = pd.DataFrame(
-    [
-        {
-            "Marca": "TOTAL",
-            "Valor Devolvido": total_geral,
-            "Valor Formatado": format_currency(
-                total_geral, "BRL", locale="pt_BR"
-            ),  # 👈 Adiciona aqui também!
-        }
-    ]
-)
-
-
-# Concatenar com o DataFrame original
-valor_devolucao_marca = pd.concat(
-    [valor_devolucao_marca, linha_total], ignore_index=True
-)
-
-# 📊 Gráfico de barras com Plotly Express
-fig_valor = px.bar(
-    valor_devolucao_marca,
-    x="Marca",
-    y="Valor Devolvido",
-    text_auto=True,
-    title="💸 Valor Total em Devoluções por Marca",
-    color="Marca",
-    color_discrete_map=cores_marca,
-    labels={"Valor Devolvido": "Valor (R$)"},
-    height=500,
-)
-
-# 🎨 Plotly com os R$ bonitões no topo
-fig_valor = px.bar(
-    valor_devolucao_marca,
-    x="Marca",
-    y="Valor Devolvido",
-    text="Valor Formatado",  # 👈 Aqui está a estrela!
-    color="Marca",
-    color_discrete_map=cores_marca,
-    title="💸 Valor Total em Devoluções por Marca",
-    labels={"Valor Devolvido": "Valor (R$)"},
-    height=500,
-)
-
-fig_valor.update_traces(textposition="outside", textfont_size=10)
-fig_valor.update_layout(
-    xaxis_title="",
-    yaxis_title="Valor (R$)",
-    xaxis_tickangle=45,
-    uniformtext_minsize=8,
-    uniformtext_mode="hide",
-    template="plotly_white",
-)
-
-# 🌟 Mostrar no Streamlit
-# st.plotly_chart(fig_valor, use_container_width=True)
-
-###########
-
-
-# 📊 Agrupar por data e marca
-devolucao_dia_marca = (
-    df_devolucao_filtrado.groupby(["dt_emis_nf", "marca"])["vl_net_livro"]
-    .sum()
-    .reset_index()
-    .rename(
-        columns={
-            "dt_emis_nf": "Data",
-            "vl_net_livro": "Valor Devolvido",
-            "marca": "Marca",
-        }
-    )
-)
-
-# 🎨 Gráfico de linha com cor por marca
-fig_linha_marca = px.line(
-    devolucao_dia_marca,
-    x="Data",
-    y="Valor Devolvido",
-    color="Marca",
-    markers=True,
-    title="📈 Valor de Devoluções por Dia e por Marca",
-    labels={"Valor Devolvido": "Valor (R$)", "Data": "Data"},
-    color_discrete_map=cores_marca,
-    template="plotly_white",
-)
-
-fig_linha_marca.update_traces(line_width=2)
-fig_linha_marca.update_layout(margin=dict(t=50, b=30))
-
-# Mostrar no Streamlit
-# st.plotly_chart(fig_linha_marca, use_container_width=True)
-
-from babel.dates import format_date
-
 # 📄 Selecionar colunas e renomear
 df_detalhe_devolucao = df_devolucao_filtrado[
     ["razao_social", "item", "quantidade", "vl_net_livro", "marca", "dt_emis_nf"]
@@ -531,71 +427,89 @@ df_detalhe_devolucao = df_devolucao_filtrado[
     }
 )
 
-# 💰 Formatando o valor diretamente na própria coluna "Valor"
-df_detalhe_devolucao["Valor"] = df_detalhe_devolucao["Valor"].apply(
-    lambda x: format_currency(x, "BRL", locale="pt_BR")
-)
-
-# 📅 Limpando a data (só data, sem hora)
-df_detalhe_devolucao["Data da Devolução"] = pd.to_datetime(
-    df_detalhe_devolucao["Data da Devolução"]
-).dt.date  # só a data
-
-# Mostrar no Streamlit
+# Mostrar no Streamlit (valor e data continuam numéricos e só são formatados na exibição)
 st.subheader("📄 Itens Devolvidos por Cliente")
-st.dataframe(df_detalhe_devolucao, use_container_width=True)
-
-# 🔍 Filtro de Seleção de Marca
-marcas_disponiveis = sorted(df_devolucao_filtrado["marca"].dropna().unique())
-marca_selecionada_dev = st.selectbox(
-    "Escolha a Marca para ver os Itens mais Devolvidos", options=marcas_disponiveis
-)
+st.dataframe(
+    df_detalhe_devolucao,
+    use_container_width=True,
+    column_config={
+        "Quantidade": st.column_config.NumberColumn(format="localized", step=1),
+        "Valor": st.column_config.NumberColumn(format="localized", step=0.01),
+        "Data da Devolução": st.column_config.DateColumn(format="DD/MM/YYYY"),
+    },
+)
+
+@st.fragment
+def secao_top_devolucoes(df_devolucao_filtrado, descricoes, destino):
+    """Top 10 itens mais devolvidos da marca escolhida"""
+    retomar_execucao("Devoluções", medicao_ligada, st.session_state)
+    # 🔍 Filtro de Seleção de Marca
+    marcas_disponiveis = sorted(df_devolucao_filtrado["marca"].dropna().unique())
+    marca_selecionada_dev = st.selectbox(
+        "Escolha a Marca para ver os Itens mais Devolvidos", options=marcas_disponiveis
+    )
 
-# 🧼 Filtrar os dados com base na marca selecionada
-df_devolucao_filtrado_marca = df_devolucao_filtrado[
-    df_devolucao_filtrado["marca"] == marca_selecionada_dev
-].copy()
+    # 🧼 Filtrar os dados com base na marca selecionada
+    df_devolucao_filtrado_marca = df_devolucao_filtrado[
+        df_devolucao_filtrado["marca"] == marca_selecionada_dev
+    ]
 
-# ❌ Remover "CADEADO CR" dos dados da marca PAPAIZ, se quiser manter a limpeza
-if marca_selecionada_dev == "PAPAIZ":
-    df_devolucao_filtrado_marca = df_devolucao_filtrado_marca[
-        ~df_devolucao_filtrado_marca["desc_item"].str.contains(
-            "CADEADO CR", case=False, na=False
+    # ❌ Remover "CADEADO CR" dos dados da marca PAPAIZ, se quiser manter a limpeza
+    if marca_selecionada_dev == "PAPAIZ":
+        df_devolucao_filtrado_marca = df_devolucao_filtrado_marca[
+            ~df_devolucao_filtrado_marca["item"].isin(itens_com_descricao("CADEADO CR", destino))
+        ]
+
+    # 🥇 Os 10 itens mais devolvidos da marca (SKU como texto, com descrição)
+    df_top_10_skus_devolucao = top_itens(df_devolucao_filtrado_marca, 10, descricoes=descricoes)
+
+    # 🎨 Gráfico de barras para os Top 10 itens mais devolvidos
+    with etapa("gráfico: top 10 itens devolvidos", df_top_10_skus_devolucao):
+        fig_top_10_devolucao = px.bar(
+            df_top_10_skus_devolucao,
+            x="desc_item",
+            y="quantidade",
+            title=f"🔁 Top 10 Itens mais Devolvidos - Marca: {marca_selecionada_dev}",
+            labels={"quantidade": "Quantidade Devolvida", "desc_item": "Descrição do Item"},
+            color="item",
+            color_discrete_sequence=px.colors.qualitative.Set1,
+            text_auto=True,
         )
-    ]
 
-# 🧠 Converter o código do item pra string
-df_devolucao_filtrado_marca["item"] = df_devolucao_filtrado_marca["item"].astype(str)
+        fig_top_10_devolucao.update_traces(texttemplate="%{y:.0f}")
+        fig_top_10_devolucao.update_layout(xaxis_tickangle=45)
 
-# 📊 Agrupar os dados por SKU e somar as devoluções
-df_top_skus_devolucao = (
-    df_devolucao_filtrado_marca.groupby(["item", "desc_item"])["quantidade"]
-    .sum()
-    .reset_index()
-)
+        # Mostrar no Streamlit
+        st.plotly_chart(fig_top_10_devolucao, use_container_width=True)
 
-# 🔢 Ordenar por quantidade devolvida
-df_top_skus_devolucao = df_top_skus_devolucao.sort_values(
-    by="quantidade", ascending=False
-)
 
-# 🥇 Pegar os Top 10
-df_top_10_skus_devolucao = df_top_skus_devolucao.head(10)
-
-# 🎨 Gráfico de barras para os Top 10 itens mais devolvidos
-fig_top_10_devolucao = px.bar(
-    df_top_10_skus_devolucao,
-    x="desc_item",
-    y="quantidade",
-    title=f"🔁 Top 10 Itens mais Devolvidos - Marca: {marca_selecionada_dev}",
-    labels={"quantidade": "Quantidade Devolvida", "desc_item": "Descrição do Item"},
-    color="item",
-    color_discrete_sequence=px.colors.qualitative.Set1,
-    text_auto=True,
-)
+# 📖 Descrição de cada SKU (dimensão de itens), juntada só às linhas exibidas
+with etapa("seção: top devoluções"):
+    secao_top_devolucoes(df_devolucao_filtrado, descricoes_itens(base), base)
 
-fig_top_10_devolucao.update_traces(texttemplate="%{y:.0f}")
-fig_top_10_devolucao.update_layout(xaxis_tickangle=45)
 
-# Mostrar no Streamlit
-st.plotly_chart(fig_top_10_devolucao, use_container_width=True)
+@st.fragment
+def painel_fragmentos():
+    """Última execução de um fragmento rodado sozinho (atualiza sem rerun da página)"""
+    st.button("🔄 Atualizar", key="atualizar_instrumentacao")
+    fragmento = execucao_fragmento(st.session_state, "Devoluções")
+    if fragmento is not None:
+        st.caption(f"Fragmento: execução {fragmento.id} | {fragmento.segundos:.2f} s no total")
+        st.dataframe(fragmento.tabela(), hide_index=True, use_container_width=True)
+
+
+# ⏱️ Painel de instrumentação (só admin): etapas do rerun que acabou de rodar e,
+# como um fragmento reexecutado sozinho não redesenha a barra lateral, as do
+# último deles num fragmento do painel, com botão para atualizar
+if usuario_admin:
+    with st.sidebar.expander("⏱️ Instrumentação"):
+        st.toggle(
+            "Medir etapas (tempo, linhas e memória)",
+            key="instrumentacao_ligada",
+            help="As medições também vão para logs/instrumentacao.log",
+        )
+        if execucao is not None:
+            st.caption(f"Execução {execucao.id} | {execucao.segundos:.2f} s no total")
+            st.dataframe(execucao.tabela(), hide_index=True, use_container_width=True)
+        if medicao_ligada:
+            painel_fragmentos()